@@ -0,0 +1,472 @@
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import secrets
+import threading
+from http import HTTPStatus
+from datetime import date
+from urllib.parse import parse_qs, unquote
+from concurrent.futures import ThreadPoolExecutor
+import slowlog
+slowlog.install()  # sebelum koneksi pertama, sama seperti main.py
+import business
+import reports
+from auth import login
+from db import get_conn
+from request_archive import request_history
+
+# API JSON headless untuk operasi business layer (submit, approval, quota, laporan) tanpa Streamlit.
+# `app` adalah aplikasi ASGI murni (tanpa framework), jadi bisa dijalankan dengan `uvicorn api_server:app`
+# atau runner asyncio bawaan: python api_server.py [--host 127.0.0.1] [--port 8580].
+# Handler async; semua akses SQLite (get_conn yang sama dengan UI) dijalankan di thread pool berukuran THREADS,
+# jadi event loop tidak pernah terblokir dan jumlah koneksi SQLite bersamaan terbatas.
+# Auth: POST /api/login -> bearer token bertanda tangan HMAC (pola yang sama dengan attachment_server).
+# Untuk beberapa worker/proses, set HRMS_API_SECRET supaya token berlaku di semua worker.
+HOST = os.environ.get("HRMS_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("HRMS_API_PORT", "8580"))
+THREADS = int(os.environ.get("HRMS_API_THREADS", "8"))
+TOKEN_TTL = int(os.environ.get("HRMS_API_TOKEN_TTL", str(8 * 3600)))  # detik
+SECRET = os.environ.get("HRMS_API_SECRET", "").encode() or secrets.token_bytes(32)
+MAX_BODY = 64 * 1024
+KEEPALIVE_TIMEOUT = 15  # detik idle sebelum koneksi keep-alive ditutup (runner bawaan)
+HISTORY_MAX_LIMIT = 200
+LEAVE_REASONS = {"PERSONAL", "CHANGEOFF", "UNPAID_LEAVE"}  # SICK butuh upload surat dokter -> lewat UI
+
+_executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="hrms-api")
+# Write di SQLite toh serial: write API dalam satu proses dijalankan bergantian supaya tidak saling menunggu
+# busy timeout. Keputusan approval sendiri dijaga di database (UPDATE ... AND status = pending di dalam
+# BEGIN IMMEDIATE), jadi tetap aman terhadap proses lain (UI Streamlit, worker API lain).
+_write_lock = threading.Lock()
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Request:
+    def __init__(self, method, path, query_string, headers, body, params):
+        self.method = method
+        self.path = path
+        self.query = {k: v[-1] for k, v in parse_qs(query_string.decode("latin-1")).items()}
+        self.headers = headers
+        self.body = body
+        self.params = params  # grup dari regex route
+        self.user = None
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise ApiError(400, "Body bukan JSON yang valid")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Body JSON harus berupa object")
+        return data
+
+    def int_arg(self, name, default=None):
+        value = self.query.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ApiError(400, f"Parameter '{name}' harus angka")
+
+async def run_db(fn, *args):
+    """Jalankan fungsi blocking (SQLite) di thread pool API"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+def _locked(fn, *args):
+    with _write_lock:
+        return fn(*args)
+
+async def run_write(fn, *args):
+    return await run_db(_locked, fn, *args)
+
+def _records(df):
+    """DataFrame -> list dict yang aman untuk JSON (NaN -> null, tanggal ISO)"""
+    if df is None or df.empty:
+        return []
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ApiError(400, f"'{name}' harus tanggal YYYY-MM-DD")
+
+# ==================== TOKEN ====================
+
+def _signature(user_id: int, expires: int) -> str:
+    return hmac.new(SECRET, f"{user_id}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+def issue_token(user_id: int):
+    expires = int(time.time()) + TOKEN_TTL
+    return f"{user_id}.{expires}.{_signature(user_id, expires)}", expires
+
+def verify_token(token: str):
+    """user_id dari token yang valid dan belum expired, None jika tidak"""
+    try:
+        user_id, expires, signature = token.split(".")
+        user_id, expires = int(user_id), int(expires)
+    except (AttributeError, ValueError):
+        return None
+    if expires < time.time() or not hmac.compare_digest(signature, _signature(user_id, expires)):
+        return None
+    return user_id
+
+def _load_user(user_id):
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT id, email, name, role, manager_id, division, is_active FROM users WHERE id = ?",
+                           (user_id,)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+def _public_user(user):
+    return {key: user[key] for key in ("id", "email", "name", "role", "manager_id", "division")}
+
+async def _authenticate(req: Request, roles):
+    auth = req.headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = auth.partition(" ")
+    user_id = verify_token(token.strip()) if scheme.lower() == "bearer" else None
+    if user_id is None:
+        raise ApiError(401, "Token tidak valid atau sudah expired")
+    user = await run_db(_load_user, user_id)
+    if not user or user["is_active"] == 0:
+        raise ApiError(401, "User tidak aktif")
+    if roles and user["role"] not in roles:
+        raise ApiError(403, "Role Anda tidak punya akses ke endpoint ini")
+    return user
+
+# ==================== HANDLER ====================
+
+async def health(req):
+    def ping():
+        conn = get_conn()
+        try:
+            conn.execute("SELECT 1").fetchone()
+        finally:
+            conn.close()
+    await run_db(ping)
+    return 200, {"status": "ok"}
+
+async def api_login(req):
+    data = req.json()
+    email, password = data.get("email"), data.get("password")
+    if not email or not password:
+        raise ApiError(400, "email dan password wajib diisi")
+    row = await run_db(login, str(email).strip(), str(password))
+    if not row or row["is_active"] == 0:
+        raise ApiError(401, "Email atau password salah")
+    token, expires = issue_token(row["id"])
+    return 200, {"token": token, "expires": expires, "user": _public_user(dict(row))}
+
+async def me(req):
+    return 200, _public_user(req.user)
+
+async def quota(req):
+    user_id = req.int_arg("user_id", req.user["id"])
+    if user_id != req.user["id"] and req.user["role"] != "HR_ADMIN":
+        raise ApiError(403, "Hanya HR yang bisa melihat quota user lain")
+    year = req.int_arg("year", business.current_year())
+    if user_id != req.user["id"] and not await run_db(_load_user, user_id):
+        raise ApiError(404, "User tidak ditemukan")
+    # GET tidak pernah membuat row quota (user_quota -> get_or_create_quota bisa INSERT)
+    return 200, await run_db(business.read_user_quota, user_id, year)
+
+async def submit_leave(req):
+    data = req.json()
+    start = _parse_date(data.get("start_date"), "start_date")
+    end = _parse_date(data.get("end_date"), "end_date")
+    reason = data.get("reason")
+    if end < start:
+        raise ApiError(400, "Tanggal akhir harus setelah tanggal mulai")
+    if reason not in LEAVE_REASONS:
+        raise ApiError(400, f"reason harus salah satu dari {', '.join(sorted(LEAVE_REASONS))}")
+    error = await run_db(business.manager_assignment_error, req.user["id"])
+    if error:
+        raise ApiError(400, error)
+    ok, message = await run_write(business.submit_leave, req.user["id"], start, end, reason)
+    if not ok:
+        raise ApiError(400, message)
+    return 201, {"message": message}
+
+async def history(req):
+    user_id, manager_id = req.user["id"], None
+    scope = req.query.get("scope", "me")
+    if scope == "team":
+        if req.user["role"] != "MANAGER":
+            raise ApiError(403, "scope=team hanya untuk Manager")
+        user_id, manager_id = None, req.user["id"]
+    elif scope == "all":
+        if req.user["role"] != "HR_ADMIN":
+            raise ApiError(403, "scope=all hanya untuk HR")
+        user_id = req.int_arg("user_id")
+    before = None
+    if req.query.get("before"):
+        try:
+            ts, request_id = req.query["before"].split(":")
+            before = (int(ts), int(request_id))
+        except ValueError:
+            raise ApiError(400, "Parameter 'before' harus berformat <created_at_ts>:<id>")
+    limit = max(1, min(req.int_arg("limit", 50), HISTORY_MAX_LIMIT))
+    rows, cursor = await run_db(request_history, user_id, manager_id, req.query.get("type"),
+                                req.query.get("status"), before, limit)
+    return 200, {"items": rows, "next": f"{cursor[0]}:{cursor[1]}" if cursor else None}
+
+async def manager_pending(req):
+    return 200, {"items": _records(await run_db(business.manager_pending, req.user["id"]))}
+
+async def hr_pending(req):
+    return 200, {"items": _records(await run_db(business.hr_pending))}
+
+def _approve(req):
+    approve = req.json().get("approve")
+    if not isinstance(approve, bool):
+        raise ApiError(400, "'approve' wajib true / false")
+    return approve
+
+def _pending_request(request_id, status):
+    conn = get_conn()
+    try:
+        row = conn.execute("""
+            SELECT r.id, r.status, u.manager_id FROM requests r JOIN users u ON u.id = r.user_id WHERE r.id = ?
+        """, (request_id,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        raise ApiError(404, "Request tidak ditemukan")
+    if row["status"] != status:
+        raise ApiError(409, f"Request sudah berstatus {row['status']}")
+    return row
+
+def _manager_decision(manager_id, request_id, approve):
+    if _pending_request(request_id, "PENDING_MANAGER")["manager_id"] != manager_id:
+        raise ApiError(403, "Anda bukan manager dari employee ini")
+    try:
+        business.set_manager_decision(manager_id, request_id, approve)
+    except ValueError as e:
+        raise ApiError(409, str(e))  # keputusan lain (proses lain) masuk lebih dulu
+    return "PENDING_HR" if approve else "REJECTED"
+
+def _hr_decision(hr_id, request_id, approve):
+    _pending_request(request_id, "PENDING_HR")
+    try:
+        business.set_hr_decision(hr_id, request_id, approve)
+    except ValueError as e:
+        raise ApiError(409, str(e))
+    return "APPROVED" if approve else "REJECTED"
+
+async def manager_decision(req):
+    status = await run_write(_manager_decision, req.user["id"], int(req.params["id"]), _approve(req))
+    return 200, {"id": int(req.params["id"]), "status": status}
+
+async def hr_decision(req):
+    status = await run_write(_hr_decision, req.user["id"], int(req.params["id"]), _approve(req))
+    return 200, {"id": int(req.params["id"]), "status": status}
+
+async def report_summary(req):
+    year = req.int_arg("year", business.current_year())
+    return 200, {"items": _records(await run_db(reports.get_user_quota_summary, year))}
+
+async def report_period(req):
+    start, end = req.int_arg("start"), req.int_arg("end")
+    if start is None or end is None:
+        raise ApiError(400, "Parameter 'start' dan 'end' (YYYYMM) wajib diisi")
+    active_only = req.query.get("active_only") in ("1", "true")
+    return 200, {"items": _records(await run_db(reports.get_period_report, start, end, active_only))}
+
+async def report_semester(req):
+    semester = req.int_arg("semester", 1)
+    if semester not in (1, 2):
+        raise ApiError(400, "semester harus 1 atau 2")
+    year = req.int_arg("year", business.current_year())
+    return 200, {"items": _records(await run_db(reports.get_semester_report, semester, year))}
+
+# (method, path regex, handler, role yang boleh; None = tanpa login, () = semua user login)
+ROUTES = [
+    ("GET", r"/api/health", health, None),
+    ("POST", r"/api/login", api_login, None),
+    ("GET", r"/api/me", me, ()),
+    ("GET", r"/api/quota", quota, ()),
+    ("GET", r"/api/requests", history, ()),
+    ("POST", r"/api/requests/leave", submit_leave, ()),
+    ("GET", r"/api/manager/pending", manager_pending, ("MANAGER",)),
+    ("POST", r"/api/manager/requests/(?P<id>\d+)/decision", manager_decision, ("MANAGER",)),
+    ("GET", r"/api/hr/pending", hr_pending, ("HR_ADMIN",)),
+    ("POST", r"/api/hr/requests/(?P<id>\d+)/decision", hr_decision, ("HR_ADMIN",)),
+    ("GET", r"/api/reports/summary", report_summary, ("HR_ADMIN",)),
+    ("GET", r"/api/reports/period", report_period, ("HR_ADMIN",)),
+    ("GET", r"/api/reports/semester", report_semester, ("HR_ADMIN",)),
+]
+_ROUTES = [(method, re.compile(pattern + r"/?$"), handler, roles) for method, pattern, handler, roles in ROUTES]
+
+async def dispatch(method, path, query_string, headers, body):
+    """Return (status, payload) untuk satu request"""
+    allowed = []
+    for route_method, pattern, handler, roles in _ROUTES:
+        match = pattern.match(path)
+        if not match:
+            continue
+        if route_method != method:
+            allowed.append(route_method)
+            continue
+        req = Request(method, path, query_string, headers, body, match.groupdict())
+        try:
+            if roles is not None:
+                req.user = await _authenticate(req, roles)
+            return await handler(req)
+        except ApiError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:
+            print(f"❌ API {method} {path}: {e}")
+            return 500, {"error": "Terjadi kesalahan internal"}
+    if allowed:
+        return 405, {"error": f"Method tidak didukung, gunakan {', '.join(allowed)}"}
+    return 404, {"error": "Endpoint tidak ditemukan"}
+
+# ==================== ASGI ====================
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    body, more = b"", True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+        if len(body) > MAX_BODY:
+            break
+    if len(body) > MAX_BODY:
+        status, payload = 413, {"error": f"Body lebih dari {MAX_BODY} byte"}
+    else:
+        headers = {name.lower(): value for name, value in scope.get("headers", [])}
+        status, payload = await dispatch(scope["method"], scope["path"], scope.get("query_string", b""),
+                                         headers, body)
+    data = json.dumps(payload, default=str).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                            (b"content-length", str(len(data)).encode())]})
+    await send({"type": "http.response.body", "body": data})
+
+# ==================== RUNNER BAWAAN ====================
+# HTTP/1.1 minimal (keep-alive, body Content-Length) di atas asyncio, cukup untuk `app` di atas
+# tanpa dependency tambahan. Untuk TLS / banyak proses, jalankan lewat uvicorn atau reverse proxy.
+
+def _raw_response(status, payload, keep_alive=False):
+    data = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + data
+
+async def _handle_connection(reader, writer):
+    peer = writer.get_extra_info("peername")
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+            except asyncio.LimitOverrunError:
+                writer.write(_raw_response(431, {"error": "Header terlalu besar"}))
+                break
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                break
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ")
+            except ValueError:
+                writer.write(_raw_response(400, {"error": "Request line tidak valid"}))
+                break
+            headers = []
+            for line in lines[1:]:
+                if line:
+                    name, _, value = line.partition(":")
+                    headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+            header_map = dict(headers)
+            if header_map.get(b"transfer-encoding"):
+                writer.write(_raw_response(411, {"error": "Gunakan Content-Length, bukan chunked"}))
+                break
+            try:
+                length = int(header_map.get(b"content-length", b"0") or 0)
+            except ValueError:
+                writer.write(_raw_response(400, {"error": "Content-Length tidak valid"}))
+                break
+            if length > MAX_BODY:
+                writer.write(_raw_response(413, {"error": f"Body lebih dari {MAX_BODY} byte"}))
+                break
+            body = await reader.readexactly(length) if length else b""
+            connection = header_map.get(b"connection", b"").lower()
+            keep_alive = connection == b"keep-alive" or (version == "HTTP/1.1" and connection != b"close")
+
+            path, _, query = target.partition("?")
+            scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": version.split("/")[-1],
+                     "method": method.upper(), "scheme": "http", "path": unquote(path),
+                     "raw_path": path.encode("latin-1"), "query_string": query.encode("latin-1"),
+                     "headers": headers, "client": peer, "server": (HOST, PORT)}
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    lines_out = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+                    lines_out += [f"{k.decode('latin-1')}: {v.decode('latin-1')}" for k, v in message["headers"]]
+                    lines_out.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+                    writer.write(("\r\n".join(lines_out) + "\r\n\r\n").encode("latin-1"))
+                elif message["type"] == "http.response.body":
+                    writer.write(message.get("body", b""))
+
+            await app(scope, receive, send)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+async def serve(host=HOST, port=PORT):
+    server = await asyncio.start_server(_handle_connection, host, port, limit=MAX_BODY, backlog=1024)
+    print(f"✅ HRMS API di http://{host}:{port} ({THREADS} thread SQLite)")
+    async with server:
+        await server.serve_forever()
+
+def _arg(args, name, default):
+    if name in args:
+        return args[args.index(name) + 1]
+    return default
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    try:
+        asyncio.run(serve(_arg(args, "--host", HOST), int(_arg(args, "--port", PORT))))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,345 @@
+import io
+import os
+import sys
+import time
+import itertools
+import zlib
+import struct
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from docx import Document
+from docx.shared import Pt
+from db import get_conn, get_job_state, set_job_state, to_epoch
+from request_archive import iter_partitions
+from reports import BULAN
+from scheduler import TIMEZONE
+
+# Generator surat persetujuan cuti / change off (DOCX) dari template.
+# Template di-parse sekali dengan python-docx (placeholder {{...}} yang terpecah di beberapa run
+# digabung), lalu part statis (styles, theme, dll) dikompres sekali dan disimpan bersama
+# word/document.xml siap pakai. Render satu surat cukup replace string + kompres document.xml,
+# tanpa parse XML lagi. Mode batch membagi request ke ProcessPoolExecutor dan hasilnya
+# dikumpulkan ke satu file ZIP.
+TEMPLATE_PATH = os.environ.get("HRMS_LETTER_TEMPLATE", os.path.join("templates", "approval_letter.docx"))
+LETTER_DIR = os.environ.get("HRMS_LETTER_DIR", os.path.join("data", "letters"))
+BATCH_SIZE = 200           # request per task di process pool
+INLINE_THRESHOLD = 200     # di bawah ini render langsung tanpa process pool
+MAX_PENDING_PER_WORKER = 2  # batch yang menunggu di pool per worker; row dibaca bertahap, tidak semua sekaligus
+STATE_KEY = "approval_letters.last_hr_at_ts"  # "<hr_at_ts>:<id>" surat terakhir (nilai lama: hanya hr_at_ts)
+DOCUMENT_XML = "word/document.xml"
+
+LETTER_QUERY = """
+    SELECT r.id, r.type, r.reason, r.start_date, r.end_date, r.change_off_days, r.hours,
+           r.keterangan, r.hr_at, r.hr_at_ts,
+           u.name AS user_name, u.nik AS user_nik, u.division AS user_division,
+           m.name AS manager_name, h.name AS hr_name
+    FROM {requests} r
+    JOIN users u ON u.id = r.user_id
+    LEFT JOIN users m ON m.id = u.manager_id
+    LEFT JOIN users h ON h.id = r.hr_id
+    WHERE r.status = 'APPROVED' AND r.hr_at_ts IS NOT NULL
+"""
+
+_template_cache = {}
+
+# ==================== TEMPLATE ====================
+
+def default_template_bytes() -> bytes:
+    """Template bawaan jika templates/approval_letter.docx belum disediakan HR"""
+    doc = Document()
+    style = doc.styles["Normal"]
+    style.font.name = "Calibri"
+    style.font.size = Pt(11)
+    doc.add_heading("SURAT PERSETUJUAN {{jenis_surat}}", level=1)
+    doc.add_paragraph("Nomor: {{nomor}}")
+    doc.add_paragraph("Yang bertanda tangan di bawah ini, HR Department menerangkan bahwa:")
+    table = doc.add_table(rows=0, cols=2)
+    for label, key in [("Nama", "nama"), ("NIK", "nik"), ("Divisi", "divisi"), ("Atasan", "atasan"),
+                       ("Jenis", "jenis"), ("Tanggal", "periode"), ("Jumlah", "jumlah_hari")]:
+        cells = table.add_row().cells
+        cells[0].text = label
+        cells[1].text = f": {{{{{key}}}}}"
+    doc.add_paragraph("")
+    doc.add_paragraph("telah DISETUJUI pada {{tanggal_disetujui}}. Keterangan: {{keterangan}}")
+    doc.add_paragraph("Demikian surat ini dibuat untuk dipergunakan sebagaimana mestinya.")
+    doc.add_paragraph("")
+    doc.add_paragraph("{{tanggal_surat}}")
+    doc.add_paragraph("HR Department")
+    doc.add_paragraph("")
+    doc.add_paragraph("{{disetujui_oleh}}")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def _merge_placeholder_runs(paragraph):
+    """
+    Word sering memecah '{{nama}}' ke beberapa run; gabungkan hanya run yang dilewati placeholder
+    ke run tempat placeholder dimulai (format run lain di paragraf tetap), supaya bisa di-replace
+    """
+    runs = paragraph.runs
+    if "{{" not in paragraph.text or len(runs) < 2:
+        return
+    i = 0
+    while i < len(runs):
+        text, j = runs[i].text, i
+        # Placeholder belum tertutup, atau '{' + '{' terpisah di dua run
+        while j + 1 < len(runs) and (text.count("{{") > text.count("}}") or text.endswith("{")):
+            j += 1
+            text += runs[j].text
+        if j > i:
+            runs[i].text = text
+            for run in runs[i + 1:j + 1]:
+                run.text = ""
+        i = j + 1
+
+def _iter_paragraphs(doc):
+    yield from doc.paragraphs
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield from cell.paragraphs
+
+def _deflate(name: str, data: bytes):
+    """Entry zip yang sudah dikompres: (nama, crc32, data terkompresi, ukuran asli)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return name.encode("utf-8"), zlib.crc32(data), compressed, len(data)
+
+def _zip_bytes(entries) -> bytes:
+    """Tulis file zip dari entry yang sudah dikompres (tanpa kompres ulang part statis)"""
+    buf = io.BytesIO()
+    central = []
+    for name, crc, compressed, size in entries:
+        offset = buf.tell()
+        buf.write(struct.pack("<4s5H3L2H", b"PK\x03\x04", 20, 0, zipfile.ZIP_DEFLATED, 0, 0x21,
+                              crc, len(compressed), size, len(name), 0))
+        buf.write(name)
+        buf.write(compressed)
+        central.append(struct.pack("<4s6H3L5H2L", b"PK\x01\x02", 20, 20, 0, zipfile.ZIP_DEFLATED, 0, 0x21,
+                                   crc, len(compressed), size, len(name), 0, 0, 0, 0, 0, offset) + name)
+    directory_offset = buf.tell()
+    for record in central:
+        buf.write(record)
+    buf.write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, len(central), len(central),
+                          buf.tell() - directory_offset, directory_offset, 0))
+    return buf.getvalue()
+
+def parse_template(data: bytes):
+    """
+    Parse template sekali: return (list entry zip, index word/document.xml, document.xml sebagai string).
+    Semua part selain document.xml sudah dikompres di sini.
+    """
+    doc = Document(io.BytesIO(data))
+    for paragraph in _iter_paragraphs(doc):
+        _merge_placeholder_runs(paragraph)
+    document_xml = doc.part.blob.decode("utf-8")
+    entries, document_index = [], None
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        for info in zf.infolist():
+            if info.filename == DOCUMENT_XML:
+                document_index = len(entries)
+                entries.append(None)
+            else:
+                entries.append(_deflate(info.filename, zf.read(info.filename)))
+    return entries, document_index, document_xml
+
+def load_template(path: str = TEMPLATE_PATH):
+    """Template ter-parse, di-cache per proses dan di-refresh jika file template berubah"""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    cached = _template_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    if mtime is None:
+        data = default_template_bytes()
+    else:
+        with open(path, "rb") as f:
+            data = f.read()
+    template = parse_template(data)
+    _template_cache[path] = (mtime, template)
+    return template
+
+# ==================== RENDER ====================
+
+def _format_date(value) -> str:
+    if not value:
+        return "-"
+    try:
+        d = datetime.fromisoformat(str(value)).date()
+    except ValueError:
+        return str(value)
+    return f"{d.day} {BULAN[d.month - 1]} {d.year}"
+
+def letter_context(row: dict) -> dict:
+    """Nilai placeholder untuk satu request"""
+    if row["type"] == "CHANGEOFF":
+        jenis_surat = "CHANGE OFF"
+        jenis = "Change Off (penambahan saldo)"
+        days = row["change_off_days"] or int((row["hours"] or 0) / 8)
+    else:
+        jenis_surat = "CUTI"
+        jenis = {
+            "PERSONAL": "Cuti Personal",
+            "CHANGEOFF": "Cuti Change Off (potong saldo Change Off)",
+            "UNPAID_LEAVE": "Unpaid Leave",
+        }.get(row["reason"], "Sakit" if (row["reason"] or "").startswith("SICK") else (row["reason"] or "Cuti"))
+        try:
+            days = (datetime.fromisoformat(row["end_date"]).date()
+                    - datetime.fromisoformat(row["start_date"]).date()).days + 1
+        except (TypeError, ValueError):
+            days = "-"
+    # Tanggal di surat resmi mengikuti WIB, bukan UTC / zona waktu server
+    hr_at = datetime.fromtimestamp(row["hr_at_ts"], TIMEZONE).date().isoformat() if row["hr_at_ts"] else ""
+    return {
+        "nomor": f"{row['id']:05d}/HR/{jenis_surat.replace(' ', '')}/{hr_at[5:7] or '00'}/{hr_at[:4] or '0000'}",
+        "jenis_surat": jenis_surat,
+        "nama": row["user_name"] or "-",
+        "nik": row["user_nik"] or "-",
+        "divisi": row["user_division"] or "-",
+        "atasan": row["manager_name"] or "-",
+        "jenis": jenis,
+        "periode": f"{_format_date(row['start_date'])} s/d {_format_date(row['end_date'])}",
+        "jumlah_hari": f"{days} hari",
+        "keterangan": row["keterangan"] or "-",
+        "tanggal_disetujui": _format_date(hr_at),
+        "tanggal_surat": _format_date(datetime.now(TIMEZONE).date().isoformat()),
+        "disetujui_oleh": row["hr_name"] or "HR Admin",
+    }
+
+def letter_filename(row: dict) -> str:
+    name = "".join(c if c.isalnum() else "_" for c in (row["user_name"] or "user")).strip("_")
+    return f"{row['id']:05d}_{row['type']}_{name}.docx"
+
+def render_docx(template, context: dict) -> bytes:
+    entries, document_index, document_xml = template
+    for key, value in context.items():
+        document_xml = document_xml.replace("{{%s}}" % key, escape(str(value)))
+    entries = list(entries)
+    entries[document_index] = _deflate(DOCUMENT_XML, document_xml.encode("utf-8"))
+    return _zip_bytes(entries)
+
+def _render_batch(template_path: str, rows):
+    """Task untuk worker process: render list request -> list (filename, bytes)"""
+    template = load_template(template_path)
+    return [(letter_filename(row), render_docx(template, letter_context(row))) for row in rows]
+
+def render_letter(request_id: int, template_path: str = TEMPLATE_PATH):
+    """Render satu surat untuk request yang sudah APPROVED. Return (filename, bytes) atau None"""
+    conn = get_conn()
+    try:
+        row = None
+        for schema in iter_partitions(conn):  # request lama bisa sudah dipindah ke file arsip
+            row = conn.execute(LETTER_QUERY.format(requests=f"{schema}.requests") + " AND r.id = ?",
+                               (request_id,)).fetchone()
+            if row:
+                break
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return _render_batch(template_path, [dict(row)])[0]
+
+# ==================== BATCH ====================
+
+def _parse_cursor(value):
+    """'1766504700:123' -> (1766504700, 123); checkpoint lama tanpa id diulang dari awal detik itu"""
+    ts, _, request_id = str(value).partition(":")
+    return int(ts), int(request_id or 0)
+
+def _letter_rows(since=None, start=None, end=None):
+    """Batch row surat per partisi (hot dulu, lalu file arsip); urut waktu approval di dalam partisi"""
+    query, params = LETTER_QUERY, []
+    if since:
+        # Cursor (hr_at_ts, id): approval di detik yang sama dengan surat terakhir tetap terambil
+        query += " AND (r.hr_at_ts, r.id) > (?, ?)"
+        params.extend(_parse_cursor(since))
+    if start:
+        query += " AND r.hr_at_ts >= ?"
+        params.append(to_epoch(start))
+    if end:
+        query += " AND r.hr_at_ts < ?"
+        params.append(to_epoch(end))
+    query += " ORDER BY r.hr_at_ts, r.id"
+    conn = get_conn()
+    try:
+        for schema in iter_partitions(conn):
+            cur = conn.execute(query.format(requests=f"{schema}.requests"), params)
+            while True:
+                rows = cur.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                yield [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+def generate_letters(start=None, end=None, incremental=False, workers=None, template_path=TEMPLATE_PATH):
+    """
+    Render surat untuk semua request APPROVED (opsional filter waktu approval HR di [start, end)) ke satu ZIP.
+    incremental=True: hanya request yang di-approve setelah run incremental terakhir.
+    Return ringkasan: jumlah surat, path zip, dan durasi.
+    """
+    started = time.time()
+    since = get_job_state(STATE_KEY) if incremental else None
+    batches = _letter_rows(since, start, end)
+    first = next(batches, None)
+    result = {"letters": 0, "zip": None, "since": since, "seconds": 0}
+    if not first:
+        result["seconds"] = round(time.time() - started, 2)
+        return result
+    # Cukup intip satu batch berikutnya untuk memutuskan render inline atau lewat process pool
+    second = next(batches, None)
+    inline = workers == 1 or (second is None and len(first) <= INLINE_THRESHOLD)
+    batches = itertools.chain([first] if second is None else [first, second], batches)
+    newest = [(0, 0)]  # (hr_at_ts, id) terbesar yang sudah dibuatkan surat
+
+    os.makedirs(LETTER_DIR, exist_ok=True)
+    zip_path = os.path.join(LETTER_DIR, f"approval_letters_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+    tmp_path = f"{zip_path}.part"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        def collect(letters):
+            for filename, data in letters:
+                zf.writestr(filename, data)  # DOCX sudah terkompresi
+                result["letters"] += 1
+
+        def track(batch):
+            newest[0] = max(newest[0], max((row["hr_at_ts"], row["id"]) for row in batch))
+            return batch
+
+        if inline:
+            for batch in batches:
+                collect(_render_batch(template_path, track(batch)))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                limit = (workers or os.cpu_count() or 1) * MAX_PENDING_PER_WORKER
+                pending = set()
+                for batch in batches:
+                    pending.add(pool.submit(_render_batch, template_path, track(batch)))
+                    if len(pending) >= limit:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future.result())
+                for future in as_completed(pending):
+                    collect(future.result())
+    os.replace(tmp_path, zip_path)
+
+    if incremental:
+        set_job_state(STATE_KEY, "%d:%d" % newest[0])
+    result["zip"] = zip_path
+    result["seconds"] = round(time.time() - started, 2)
+    return result
+
+def month_range(year: int, month: int):
+    """Batas waktu approval [awal bulan, awal bulan berikutnya) sebagai string ISO (UTC)"""
+    start = f"{year:04d}-{month:02d}-01"
+    end = f"{year + 1:04d}-01-01" if month == 12 else f"{year:04d}-{month + 1:02d}-01"
+    return start, end
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    start = end = None
+    if "--month" in args:
+        year, month = args[args.index("--month") + 1].split("-")
+        start, end = month_range(int(year), int(month))
+    summary = generate_letters(start, end, incremental="--incremental" in args)
+    print(f"📄 {summary['letters']} surat dibuat dalam {summary['seconds']} detik -> {summary['zip'] or '-'}")
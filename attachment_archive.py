@@ -0,0 +1,192 @@
+import os
+import sys
+import mmap
+import struct
+import zipfile
+import threading
+from datetime import date
+from db import get_conn, to_epoch
+from attachment_store import UPLOAD_DIR, get_attachment, register_existing
+from request_archive import iter_partitions
+
+# Arsip tahunan attachment: file lepas dari tahun yang sudah tutup dipak ke ZIP (ZIP_STORED, tanpa kompresi
+# supaya member bisa dibaca langsung lewat mmap). Path yang disimpan di DB menjadi "<pack>.zip!/<member>".
+ARCHIVE_DIR = os.path.join(UPLOAD_DIR, "archive")
+ARCHIVE_SEP = "!/"
+FINAL_STATUSES = ("APPROVED", "REJECTED")
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_index_cache = {}
+_cache_lock = threading.Lock()
+
+def is_archived(path: str) -> bool:
+    return bool(path) and ARCHIVE_SEP in path
+
+def split_path(path: str):
+    """'uploads/archive/attachments_2023.zip!/abc.pdf' -> ('uploads/archive/attachments_2023.zip', 'abc.pdf')"""
+    pack, _, member = path.partition(ARCHIVE_SEP)
+    return pack, member
+
+def _load_pack(pack_path: str):
+    """Baca central directory ZIP sekali, hitung offset data tiap member, dan mmap file pack"""
+    members = {}
+    with open(pack_path, "rb") as f:
+        with zipfile.ZipFile(f) as zf:
+            infos = zf.infolist()
+        for info in infos:
+            if info.compress_type != zipfile.ZIP_STORED:
+                continue
+            f.seek(info.header_offset)
+            header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+            name_len, extra_len = header[9], header[10]
+            data_offset = info.header_offset + _LOCAL_HEADER.size + name_len + extra_len
+            members[info.filename] = (data_offset, info.file_size)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return members, mapped
+
+def _pack(pack_path: str):
+    """Index + mmap per pack, di-cache dan di-refresh jika file pack berubah"""
+    mtime = os.path.getmtime(pack_path)
+    with _cache_lock:
+        cached = _index_cache.get(pack_path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+        if cached:
+            try:
+                cached[2].close()
+            except BufferError:
+                pass  # masih ada memoryview aktif; mmap lama dilepas oleh GC
+        members, mapped = _load_pack(pack_path)
+        _index_cache[pack_path] = (mtime, members, mapped)
+        return members, mapped
+
+def member_exists(path: str) -> bool:
+    pack_path, member = split_path(path)
+    if not os.path.exists(pack_path):
+        return False
+    members, _ = _pack(pack_path)
+    return member in members
+
+def member_view(path: str) -> memoryview:
+    """Akses random satu member lewat mmap - tanpa ekstrak seluruh pack"""
+    pack_path, member = split_path(path)
+    members, mapped = _pack(pack_path)
+    if member not in members:
+        raise FileNotFoundError(path)
+    offset, size = members[member]
+    return memoryview(mapped)[offset:offset + size]
+
+def _next_pack_path(year: int) -> str:
+    path = os.path.join(ARCHIVE_DIR, f"attachments_{year}.zip")
+    n = 2
+    while os.path.exists(path):
+        path = os.path.join(ARCHIVE_DIR, f"attachments_{year}-{n}.zip")
+        n += 1
+    return path
+
+def _candidates(conn, year: int):
+    """Path lepas dari request final tahun itu, di partisi hot maupun file arsip request (cold_YYYY)"""
+    placeholders = ",".join("?" * len(FINAL_STATUSES))
+    paths = set()
+    for schema in iter_partitions(conn):
+        paths.update(r[0] for r in conn.execute(f"""
+            SELECT DISTINCT timesheet_path FROM {schema}.requests
+            WHERE timesheet_path IS NOT NULL
+              AND timesheet_path NOT LIKE '%{ARCHIVE_SEP}%'
+              AND created_at_ts >= ? AND created_at_ts < ?
+              AND status IN ({placeholders})
+        """, (to_epoch(date(year, 1, 1)), to_epoch(date(year + 1, 1, 1)), *FINAL_STATUSES)).fetchall())
+    return sorted(p for p in paths if os.path.isfile(p))
+
+def _still_referenced(conn, paths):
+    """Path lepas yang masih ditunjuk row mana pun (mis. request baru yang dedup ke file yang sama)"""
+    paths, found = list(paths), set()
+    for i in range(0, len(paths), 500):
+        chunk = paths[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for schema in iter_partitions(conn):
+            found.update(r[0] for r in conn.execute(
+                f"SELECT DISTINCT timesheet_path FROM {schema}.requests WHERE timesheet_path IN ({placeholders})",
+                chunk).fetchall())
+        for legacy in ("leave_requests", "changeoff_requests"):
+            try:
+                found.update(r[0] for r in conn.execute(
+                    f"SELECT DISTINCT timesheet_path FROM {legacy} WHERE timesheet_path IN ({placeholders})",
+                    chunk).fetchall())
+            except Exception:
+                pass
+    return found
+
+def archive_year(year: int, dry_run=False):
+    """
+    Pak semua attachment lepas dari request yang sudah final di tahun tertentu ke satu ZIP,
+    lalu update path di requests (hot + arsip) / tabel legacy / attachments, dan hapus file lepas
+    yang sudah tidak direferensikan row mana pun.
+    """
+    if year >= date.today().year:
+        raise ValueError("Hanya tahun yang sudah tutup yang bisa diarsipkan")
+
+    conn = get_conn()
+    try:
+        paths = _candidates(conn, year)
+        result = {"year": year, "files": len(paths), "bytes": sum(os.path.getsize(p) for p in paths),
+                  "pack": None, "dry_run": dry_run}
+        if dry_run or not paths:
+            return result
+
+        # Pastikan semua file punya metadata (size/mime/hash) sebelum path-nya berubah
+        for path in paths:
+            if not get_attachment(path):
+                register_existing(path)
+
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        pack_path = _next_pack_path(year)
+        tmp_path = f"{pack_path}.part"
+        mapping = {}
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for path in paths:
+                member = os.path.basename(path)
+                if member in zf.NameToInfo:
+                    member = f"{len(mapping)}-{member}"
+                zf.write(path, member)
+                mapping[path] = f"{pack_path}{ARCHIVE_SEP}{member}"
+        os.replace(tmp_path, pack_path)
+
+        cur = conn.cursor()
+        for old_path, new_path in mapping.items():
+            cur.execute("UPDATE attachments SET path = ? WHERE path = ?", (new_path, old_path))
+            cur.execute("UPDATE attachment_aliases SET path = ? WHERE path = ?", (new_path, old_path))
+            for legacy in ("leave_requests", "changeoff_requests"):
+                try:
+                    cur.execute(f"UPDATE {legacy} SET timesheet_path = ? WHERE timesheet_path = ?", (new_path, old_path))
+                except Exception:
+                    pass
+        # Commit per partisi: file arsip request di-DETACH antar batch (tidak bisa di dalam transaksi).
+        # Sampai file lepas dihapus di bawah, path lama dan baru sama-sama valid.
+        for schema in iter_partitions(conn):
+            conn.executemany(f"UPDATE {schema}.requests SET timesheet_path = ? WHERE timesheet_path = ?",
+                             [(new_path, old_path) for old_path, new_path in mapping.items()])
+            conn.commit()
+        result["pack"] = pack_path
+
+        removed = 0
+        referenced = _still_referenced(conn, mapping)
+        for old_path in mapping:
+            if old_path in referenced:
+                continue
+            try:
+                os.remove(old_path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        result["removed"] = removed
+    finally:
+        conn.close()
+    return result
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python attachment_archive.py <year> [--dry-run]")
+        sys.exit(1)
+    summary = archive_year(int(sys.argv[1]), dry_run="--dry-run" in sys.argv)
+    print(f"📦 Archive {summary['year']}: {summary['files']} file ({summary['bytes']} bytes) -> {summary['pack'] or '-'}")
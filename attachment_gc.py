@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from db import get_conn
+from attachment_store import UPLOAD_DIR, TMP_DIR, QUARANTINE_DIR, walk_files
+from previews import PREVIEW_DIR, preview_path
+from attachment_archive import ARCHIVE_SEP, is_archived, split_path
+from request_archive import iter_partitions
+
+# Garbage collector file attachment yang tidak direferensikan lagi oleh request mana pun.
+# Mark: path yang masih dipakai dialirkan dari DB ke tabel SQLite sementara (di disk, bukan di memory).
+# Sweep: folder uploads dijelajahi dengan os.scandir, file yang tidak ter-mark dipindah ke karantina.
+GRACE_SECONDS = 24 * 3600  # file baru bisa saja belum sempat tercatat di tabel requests
+BATCH_SIZE = 1000
+
+# Tabel legacy yang masih bisa mereferensikan attachment (requests dibaca per partisi, lihat iter_partitions)
+LEGACY_TABLES = ("leave_requests", "changeoff_requests")
+
+def _norm(path: str) -> str:
+    if is_archived(path):
+        # Referensi ke member arsip berarti file pack-nya yang dipakai
+        path = split_path(path)[0]
+    return os.path.normpath(path)
+
+def _mark_query(conn, mark_conn, query):
+    try:
+        cur = conn.execute(query)
+    except sqlite3.OperationalError:
+        return 0  # tabel legacy belum ada
+    marked = 0
+    while True:
+        rows = cur.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        mark_conn.executemany("INSERT OR IGNORE INTO marked(path) VALUES (?)",
+                              [(_norm(r[0]),) for r in rows])
+        marked += len(rows)
+    return marked
+
+def _reference_tables(conn):
+    """Tabel yang mereferensikan attachment: requests di tiap partisi (hot + file arsip) lalu tabel legacy"""
+    for schema in iter_partitions(conn):
+        yield f"{schema}.requests"
+    for table in LEGACY_TABLES:
+        yield table
+
+def _mark(mark_conn):
+    """Alirkan semua path yang direferensikan ke tabel mark (batch, memory tetap kecil)"""
+    conn = get_conn()
+    marked = 0
+    try:
+        for table in _reference_tables(conn):
+            marked += _mark_query(conn, mark_conn, f"SELECT timesheet_path FROM {table} WHERE timesheet_path IS NOT NULL")
+        mark_conn.commit()
+    finally:
+        conn.close()
+    return marked
+
+def _referenced_now(paths):
+    """
+    Cek ulang langsung ke DB path yatim mana yang sekarang direferensikan: hasil mark bisa basi selama
+    sweep berjalan (mis. request baru yang dedup ke file lama). Pack arsip dicek lewat prefix "<pack>!/".
+    """
+    found = set()
+    if not paths:
+        return found
+    placeholders = ",".join("?" * len(paths))
+    packs = [p for p in paths if p.endswith(".zip")]
+    conn = get_conn()
+    try:
+        for table in _reference_tables(conn):
+            try:
+                found.update(_norm(r[0]) for r in conn.execute(
+                    f"SELECT timesheet_path FROM {table} WHERE timesheet_path IN ({placeholders})", paths).fetchall())
+                for pack in packs:
+                    if conn.execute(f"SELECT 1 FROM {table} WHERE timesheet_path LIKE ? LIMIT 1",
+                                    (f"{pack}{ARCHIVE_SEP}%",)).fetchone():
+                        found.add(pack)
+            except sqlite3.OperationalError:
+                continue  # tabel legacy belum ada
+    finally:
+        conn.close()
+    return found
+
+def _unreferenced(mark_conn, entries):
+    paths = [_norm(e.path) for e in entries]
+    placeholders = ",".join("?" * len(paths))
+    found = {r[0] for r in mark_conn.execute(f"SELECT path FROM marked WHERE path IN ({placeholders})", paths)}
+    return [e for e, p in zip(entries, paths) if p not in found]
+
+def _quarantine(entry, quarantine_root):
+    rel = os.path.relpath(entry.path, UPLOAD_DIR)
+    target = os.path.join(quarantine_root, rel)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(entry.path, target)
+
+def _forget_attachments(paths):
+    """Hapus metadata + preview untuk file yang sudah dikarantina"""
+    if not paths:
+        return
+    conn = get_conn()
+    cur = conn.cursor()
+    placeholders = ",".join("?" * len(paths))
+    cur.execute(f"SELECT sha256 FROM attachments WHERE path IN ({placeholders})", paths)
+    hashes = [r["sha256"] for r in cur.fetchall()]
+    cur.execute(f"DELETE FROM attachments WHERE path IN ({placeholders})", paths)
+    cur.execute(f"DELETE FROM attachment_aliases WHERE path IN ({placeholders})", paths)
+    if hashes:
+        # Alias dari row yang dihapus tidak punya metadata lagi; file-nya didaftarkan ulang saat dibuka
+        cur.execute(f"DELETE FROM attachment_aliases WHERE sha256 IN ({','.join('?' * len(hashes))})", hashes)
+    conn.commit()
+    conn.close()
+    for sha256 in hashes:
+        try:
+            os.remove(preview_path(sha256))
+        except FileNotFoundError:
+            pass
+
+def collect_garbage(dry_run=False, grace_seconds=GRACE_SECONDS):
+    """
+    Mark-and-sweep file attachment yang tidak direferensikan.
+    File yatim dipindah ke uploads/.quarantine/<timestamp>/ (bukan langsung dihapus).
+    Return ringkasan: jumlah file discan, file yatim, dan byte yang dibebaskan.
+    """
+    started = time.time()
+    quarantine_root = os.path.join(QUARANTINE_DIR, datetime.utcnow().strftime("%Y%m%dT%H%M%S"))
+    result = {"dry_run": dry_run, "referenced": 0, "scanned": 0, "orphaned": 0,
+              "bytes_reclaimed": 0, "quarantine_dir": None if dry_run else quarantine_root}
+
+    with tempfile.TemporaryDirectory(prefix="hrms-gc-") as tmp:
+        mark_conn = sqlite3.connect(os.path.join(tmp, "mark.db"))
+        mark_conn.execute("PRAGMA journal_mode = OFF")
+        mark_conn.execute("PRAGMA synchronous = OFF")
+        mark_conn.execute("CREATE TABLE marked (path TEXT PRIMARY KEY) WITHOUT ROWID")
+        try:
+            result["referenced"] = _mark(mark_conn)
+
+            cutoff = started - grace_seconds
+            batch = []
+
+            def sweep(batch):
+                orphans = []
+                for entry in _unreferenced(mark_conn, batch):
+                    try:
+                        st_info = entry.stat()
+                    except FileNotFoundError:
+                        continue  # sudah dihapus / dipindah proses lain sejak scandir
+                    if st_info.st_mtime <= cutoff:
+                        orphans.append((entry, st_info))
+                # Mark diambil di awal GC; cek ulang ke DB tepat sebelum karantina
+                referenced = _referenced_now([_norm(entry.path) for entry, _ in orphans])
+                moved = []
+                for entry, st_info in orphans:
+                    if _norm(entry.path) in referenced:
+                        continue
+                    if not dry_run:
+                        try:
+                            _quarantine(entry, quarantine_root)
+                        except FileNotFoundError:
+                            continue
+                        moved.append(entry.path)
+                    result["orphaned"] += 1
+                    result["bytes_reclaimed"] += st_info.st_size
+                if moved:
+                    _forget_attachments(moved)
+
+            if os.path.isdir(UPLOAD_DIR):
+                for entry in walk_files(UPLOAD_DIR, (TMP_DIR, PREVIEW_DIR, QUARANTINE_DIR)):
+                    result["scanned"] += 1
+                    batch.append(entry)
+                    if len(batch) >= BATCH_SIZE:
+                        sweep(batch)
+                        batch = []
+                if batch:
+                    sweep(batch)
+        finally:
+            mark_conn.close()
+
+    result["seconds"] = round(time.time() - started, 2)
+    return result
+
+def purge_quarantine(older_than_days=30, dry_run=False):
+    """Hapus permanen folder karantina yang lebih tua dari N hari"""
+    purged = {"dirs": 0, "bytes": 0}
+    if not os.path.isdir(QUARANTINE_DIR):
+        return purged
+    cutoff = time.time() - older_than_days * 86400
+    for entry in os.scandir(QUARANTINE_DIR):
+        if not entry.is_dir() or entry.stat().st_mtime > cutoff:
+            continue
+        for root, _, files in os.walk(entry.path):
+            for name in files:
+                purged["bytes"] += os.path.getsize(os.path.join(root, name))
+        purged["dirs"] += 1
+        if not dry_run:
+            shutil.rmtree(entry.path)
+    return purged
+
+if __name__ == "__main__":
+    dry = "--dry-run" in sys.argv
+    summary = collect_garbage(dry_run=dry)
+    print(f"🧹 Attachment GC {'(dry run) ' if dry else ''}selesai dalam {summary['seconds']} detik")
+    print(f"   📎 Referensi: {summary['referenced']} • File discan: {summary['scanned']}")
+    print(f"   🗑️ File yatim: {summary['orphaned']} • Dibebaskan: {summary['bytes_reclaimed']} bytes")
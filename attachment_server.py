@@ -0,0 +1,178 @@
+import os
+import hmac
+import time
+import hashlib
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote
+from attachment_store import get_attachment_by_hash, CHUNK_SIZE
+from attachment_archive import is_archived, member_exists, member_view
+
+# Server file attachment yang berjalan di samping Streamlit (thread terpisah),
+# supaya PDF tidak perlu di-inline sebagai base64 ke halaman.
+HOST = os.environ.get("HRMS_ATTACHMENT_HOST", "127.0.0.1")
+PORT = int(os.environ.get("HRMS_ATTACHMENT_PORT", "8578"))
+# URL yang dipakai browser user untuk mencapai server ini (mis. https://hrms.example.com/files di belakang
+# reverse proxy). Kosong = server tidak dipakai dan file dialirkan lewat Streamlit (lihat file_utils).
+PUBLIC_URL = os.environ.get("HRMS_ATTACHMENT_PUBLIC_URL", "").rstrip("/")
+URL_TTL = int(os.environ.get("HRMS_ATTACHMENT_URL_TTL", "300"))  # detik
+SECRET = os.environ.get("HRMS_ATTACHMENT_SECRET", "").encode() or secrets.token_bytes(32)
+
+_server = None
+_lock = threading.Lock()
+
+def enabled(page_origin: str = None) -> bool:
+    """Link ke server ini hanya dipakai jika PUBLIC_URL diset dan tidak jadi mixed content di halaman HTTPS"""
+    if not PUBLIC_URL:
+        return False
+    return not (page_origin or "").startswith("https://") or PUBLIC_URL.startswith("https://")
+
+def _signature(sha256: str, expires: int, name: str = "") -> str:
+    return hmac.new(SECRET, f"{sha256}:{expires}:{name}".encode(), hashlib.sha256).hexdigest()
+
+def signed_url(sha256: str, download: bool = False, name: str = None) -> str:
+    """
+    URL bertanda tangan (HMAC) untuk satu attachment.
+    Expiry dibulatkan per window TTL supaya URL tetap sama antar rerun
+    (iframe tidak reload dan cache browser tetap terpakai).
+    name: nama file download milik request yang membuka (ikut ditandatangani)
+    """
+    expires = (int(time.time()) // URL_TTL + 2) * URL_TTL
+    name = name or ""
+    url = f"{PUBLIC_URL}/a/{sha256}?exp={expires}&sig={_signature(sha256, expires, name)}"
+    if name:
+        url += f"&name={quote(name, safe='')}"
+    return f"{url}&download=1" if download else url
+
+def verify(sha256: str, expires: str, signature: str, name: str = "") -> bool:
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(sha256, expires, name or ""), signature or "")
+
+def parse_range(header: str, size: int):
+    """Parse header 'Range: bytes=start-end' (satu range). Return (start, end) inklusif atau None"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[len("bytes="):].strip().partition("-")
+    if start_s == "":
+        # Suffix range: N byte terakhir
+        length = int(end_s)
+        if length <= 0:
+            raise ValueError("invalid range")
+        return max(size - length, 0), size - 1
+    start = int(start_s)
+    end = int(end_s) if end_s else size - 1
+    if start >= size or end < start:
+        raise ValueError("invalid range")
+    return start, min(end, size - 1)
+
+class AttachmentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # jangan spam log Streamlit
+
+    def _error(self, code, message):
+        body = message.encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "a":
+            return self._error(404, "Not found")
+        sha256 = parts[1]
+        query = parse_qs(url.query)
+        name = query.get("name", [""])[0]
+        if not verify(sha256, query.get("exp", [None])[0], query.get("sig", [None])[0], name):
+            return self._error(403, "Link tidak valid atau sudah kedaluwarsa")
+
+        attachment = get_attachment_by_hash(sha256)
+        archived = bool(attachment) and is_archived(attachment["path"])
+        exists = attachment and (member_exists(attachment["path"]) if archived else os.path.exists(attachment["path"]))
+        if not exists:
+            return self._error(404, "File tidak ditemukan")
+
+        size = attachment["size"]
+        etag = f'"{sha256}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        try:
+            byte_range = parse_range(self.headers.get("Range"), size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = byte_range if byte_range else (0, size - 1)
+        length = max(end - start + 1, 0)
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", attachment["mime_type"])
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", f"private, max-age={URL_TTL}")
+        if query.get("download") == ["1"]:
+            # Nama dari URL (milik request yang membuka), bukan original_name upload pertama isi yang sama
+            file_name = quote(name or os.path.basename(attachment["path"]))
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{file_name}")
+        else:
+            self.send_header("Content-Disposition", "inline")
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+
+        if archived:
+            # Member di dalam pack ZIP dibaca langsung dari mmap, tanpa ekstrak
+            view = member_view(attachment["path"])[start:start + length]
+            for offset in range(0, length, CHUNK_SIZE):
+                self.wfile.write(view[offset:offset + CHUNK_SIZE])
+            return
+
+        with open(attachment["path"], "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+def ensure_started():
+    """Jalankan server attachment sekali per proses (daemon thread)"""
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((HOST, PORT), AttachmentHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="attachment-server", daemon=True).start()
+            print(f"✅ Attachment server running on {HOST}:{PORT}")
+    return _server
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer((HOST, PORT), AttachmentHandler)
+    print(f"✅ Attachment server running on {HOST}:{PORT}")
+    server.serve_forever()
@@ -0,0 +1,184 @@
+import os
+import hashlib
+import mimetypes
+import tempfile
+from datetime import datetime
+from db import get_conn
+
+UPLOAD_DIR = os.environ.get("HRMS_UPLOAD_DIR", "uploads")
+TMP_DIR = os.path.join(UPLOAD_DIR, ".tmp")
+QUARANTINE_DIR = os.path.join(UPLOAD_DIR, ".quarantine")  # file yatim dari attachment_gc.py
+CHUNK_SIZE = 1024 * 1024  # 1 MB per chunk
+
+def content_path(sha256: str, ext: str = "") -> str:
+    """Path file berdasarkan hash: uploads/ab/cd/abcd...<ext>"""
+    return os.path.join(UPLOAD_DIR, sha256[:2], sha256[2:4], f"{sha256}{ext}")
+
+def walk_files(root: str, skip=()):
+    """
+    Jelajahi folder secara iteratif dengan os.scandir (tanpa list semua file di memory), yield DirEntry file.
+    Subfolder di skip tidak dimasuki; folder yang hilang di tengah jalan dilewati.
+    """
+    skip = {os.path.normpath(path) for path in skip}
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if os.path.normpath(entry.path) not in skip:
+                            stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+def _is_archived(path: str) -> bool:
+    from attachment_archive import is_archived  # lazy: attachment_archive mengimport modul ini
+    return is_archived(path)
+
+def attachment_exists(path: str) -> bool:
+    """File lepas ada di disk, atau member masih ada di pack arsip ("<pack>.zip!/<member>")"""
+    if _is_archived(path):
+        from attachment_archive import member_exists
+        return member_exists(path)
+    return os.path.exists(path)
+
+def attachment_bytes(path: str) -> bytes:
+    """Isi file attachment (file lepas atau member pack arsip)"""
+    if _is_archived(path):
+        from attachment_archive import member_view
+        return bytes(member_view(path))
+    with open(path, "rb") as f:
+        return f.read()
+
+def get_attachment(path: str):
+    """Ambil metadata attachment berdasarkan path (termasuk alias file lama), None jika belum terdaftar"""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM attachments WHERE path = ?", (path,))
+    row = cur.fetchone()
+    if not row:
+        cur.execute("""
+            SELECT a.sha256, al.path, a.size, a.mime_type, a.original_name, a.created_at
+            FROM attachment_aliases al JOIN attachments a ON a.sha256 = al.sha256
+            WHERE al.path = ?
+        """, (path,))
+        row = cur.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def get_attachment_by_hash(sha256: str):
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM attachments WHERE sha256 = ?", (sha256,))
+    row = cur.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def set_upload_name(request_id: int, original_name: str, cursor):
+    """Catat nama file upload milik satu request (dalam transaksi INSERT request pemanggil)"""
+    cursor.execute("INSERT OR REPLACE INTO request_attachment_names (request_id, original_name) VALUES (?, ?)",
+                   (request_id, original_name))
+
+def upload_name(request_id: int):
+    """Nama file upload request ini, None untuk request lama yang belum mencatatnya"""
+    conn = get_conn()
+    row = conn.execute("SELECT original_name FROM request_attachment_names WHERE request_id = ?",
+                       (request_id,)).fetchone()
+    conn.close()
+    return row["original_name"] if row else None
+
+def _register(sha256, path, size, mime_type, original_name):
+    """Simpan metadata attachment; jika hash sudah ada, pakai row yang lama"""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT OR IGNORE INTO attachments (sha256, path, size, mime_type, original_name, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (sha256, path, size, mime_type, original_name, datetime.utcnow().isoformat()))
+    conn.commit()
+    cur.execute("SELECT * FROM attachments WHERE sha256 = ?", (sha256,))
+    row = dict(cur.fetchone())
+    conn.close()
+    return row
+
+def _copy_hashed(stream, out):
+    """Tulis stream ke file per chunk sambil menghitung sha256, return (hash, size)"""
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        out.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+def store_stream(stream, filename: str) -> dict:
+    """
+    Simpan file secara streaming ke storage content-addressed:
+    - hash dihitung per chunk selagi menulis ke file temporary
+    - file dengan isi yang sama hanya disimpan sekali (dedup)
+    - file dipindah atomik ke path final dengan os.replace
+    Return metadata attachment (sha256, path, size, mime_type, ...)
+    """
+    ext = (os.path.splitext(filename)[1] or "").lower()
+    mime_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    os.makedirs(TMP_DIR, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(prefix="upload-", suffix=".part", dir=TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            sha256, size = _copy_hashed(stream, out)
+            out.flush()
+            os.fsync(out.fileno())
+
+        existing = get_attachment_by_hash(sha256)
+        if existing and attachment_exists(existing["path"]):
+            # Isi file sama sudah pernah diupload (lepas atau sudah dipak ke arsip) - tidak perlu disimpan lagi
+            os.remove(tmp_path)
+            if not _is_archived(existing["path"]):
+                os.utime(existing["path"])  # mtime = waktu dipakai terakhir; GC memberi grace period lagi
+            return existing
+
+        # File terdaftar tapi hilang: tulis ulang di path lepas (member pack arsip tidak bisa ditulis ulang)
+        archived = existing and _is_archived(existing["path"])
+        path = existing["path"] if existing and not archived else content_path(sha256, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if archived:
+        conn = get_conn()
+        conn.execute("UPDATE attachments SET path = ? WHERE sha256 = ?", (path, sha256))
+        conn.commit()
+        conn.close()
+    return _register(sha256, path, size, mime_type, filename)
+
+def register_existing(path: str):
+    """Daftarkan file lama (sebelum content-addressed store) ke tabel attachments"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    sha256 = digest.hexdigest()
+    existing = get_attachment_by_hash(sha256)
+    if existing:
+        # Isi sama sudah terdaftar di path lain; simpan path ini sebagai alias supaya tidak di-hash ulang
+        conn = get_conn()
+        conn.execute("INSERT OR REPLACE INTO attachment_aliases (path, sha256) VALUES (?, ?)", (path, sha256))
+        conn.commit()
+        conn.close()
+        return dict(existing, path=path)
+    return _register(sha256, path, size, mime_type, os.path.basename(path))
@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+from datetime import datetime
+from db import get_conn, DB_PATH, BackupRestarted, backup_progress
+from attachment_store import UPLOAD_DIR, TMP_DIR, QUARANTINE_DIR, walk_files
+from previews import PREVIEW_DIR
+from request_archive import archive_years, archive_db_path
+
+# Backup online tanpa menghentikan aplikasi.
+# Database disalin dengan sqlite3 backup API per langkah kecil (PAGES_PER_STEP halaman) dengan jeda di antaranya,
+# jadi lock baca pada database hanya dipegang sebentar dan writer (approval, submit) tidak ikut menunggu.
+# Setiap snapshot diverifikasi dengan PRAGMA integrity_check sebelum dianggap sah, lalu snapshot lama dirotasi.
+# Attachment di-backup incremental ke satu mirror (file content-addressed, hanya file baru/berubah yang disalin;
+# file yang sudah hilang dari uploads dipindah ke trash sampai snapshot yang memakainya dirotasi).
+BACKUP_DIR = os.environ.get("HRMS_BACKUP_DIR", os.path.join(os.path.dirname(DB_PATH) or ".", "backups"))
+SNAPSHOT_DIR = os.path.join(BACKUP_DIR, "snapshots")
+ATTACHMENT_MIRROR = os.path.join(BACKUP_DIR, "uploads")
+# File mirror yang sumbernya hilang dari uploads dipindah ke sini (attachment_trash/<timestamp>/<path relatif>),
+# dan baru dihapus saat semua snapshot yang mungkin masih mereferensikannya sudah dirotasi
+ATTACHMENT_TRASH = os.path.join(BACKUP_DIR, "attachment_trash")
+RETENTION = int(os.environ.get("HRMS_BACKUP_RETENTION", "7"))
+INTERVAL_HOURS = float(os.environ.get("HRMS_BACKUP_INTERVAL_HOURS", "24"))  # dijadwalkan scheduler.py, 0 = mati
+PAGES_PER_STEP = 256
+STEP_SLEEP = 0.02  # detik jeda antar langkah backup
+def _file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def integrity_check(path) -> str:
+    """PRAGMA integrity_check pada file backup (dibuka read-only)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return "\n".join(r[0] for r in rows)
+
+def backup_database(source_path, target_path, pages=PAGES_PER_STEP):
+    """Salin database SQLite yang sedang dipakai ke target_path lewat backup API, lalu verifikasi"""
+    tmp_path = f"{target_path}.part"
+    if source_path == DB_PATH:
+        source = get_conn()
+    else:
+        source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    target = sqlite3.connect(tmp_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=backup_progress(STEP_SLEEP))
+        except BackupRestarted:
+            # Database terlalu sering ditulis untuk disalin bertahap: salin sekaligus (lock baca hanya
+            # selama satu salinan penuh, writer menunggu sebentar lalu lanjut via busy timeout)
+            source.backup(target, pages=-1)
+    finally:
+        target.close()
+        source.close()
+    result = integrity_check(tmp_path)
+    if result != "ok":
+        os.remove(tmp_path)
+        raise RuntimeError(f"integrity_check gagal untuk backup {source_path}: {result[:200]}")
+    os.replace(tmp_path, target_path)
+    return result
+
+def _previous_manifest():
+    snapshots = list_snapshots()
+    if not snapshots:
+        return None, {}
+    path = os.path.join(SNAPSHOT_DIR, snapshots[0], "manifest.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return snapshots[0], json.load(f)
+    except (OSError, ValueError):
+        return snapshots[0], {}
+
+def _backup_archives(snapshot_path, previous, previous_manifest):
+    """File archive_YYYY.db jarang berubah: jika sama dengan snapshot sebelumnya cukup di-hardlink"""
+    files = {}
+    previous_files = previous_manifest.get("databases", {})
+    for year in archive_years():
+        source = archive_db_path(year)
+        name = os.path.basename(source)
+        signature = _file_signature(source)
+        target = os.path.join(snapshot_path, name)
+        old = previous_files.get(name)
+        if previous and old and old.get("source") == signature:
+            try:
+                os.link(os.path.join(SNAPSHOT_DIR, previous, name), target)
+                files[name] = {"source": signature, "integrity": old.get("integrity"), "linked": True}
+                continue
+            except OSError:
+                pass  # filesystem tanpa hardlink / file lama hilang -> backup penuh
+        files[name] = {"source": signature, "integrity": backup_database(source, target)}
+    return files
+
+def _prune_mirror(mirror, trash=ATTACHMENT_TRASH):
+    """
+    Pindahkan file mirror yang sumbernya sudah tidak ada di uploads (dikarantina GC, dipak ke arsip, terhapus)
+    ke trash bertimestamp. Snapshot database lama masih bisa menunjuk path itu, jadi belum dihapus di sini.
+    """
+    trash_root = os.path.join(trash, datetime.utcnow().strftime("%Y%m%dT%H%M%S"))
+    pruned = 0
+    for entry in walk_files(mirror):
+        rel = os.path.relpath(entry.path, mirror)
+        if os.path.isfile(os.path.join(UPLOAD_DIR, rel)):
+            continue
+        if entry.name.endswith(".part"):
+            target = None  # salinan setengah jadi dari backup yang terputus
+        else:
+            target = os.path.join(trash_root, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            if target:
+                os.replace(entry.path, target)
+            else:
+                os.remove(entry.path)
+            pruned += 1
+        except FileNotFoundError:
+            pass
+    return pruned
+
+def purge_attachment_trash(oldest_snapshot, trash=ATTACHMENT_TRASH):
+    """Hapus trash yang lebih tua dari snapshot tertua yang disimpan (tidak ada lagi snapshot yang memakainya)"""
+    if not oldest_snapshot or not os.path.isdir(trash):
+        return []
+    purged = sorted(name for name in os.listdir(trash) if name < oldest_snapshot)
+    for name in purged:
+        shutil.rmtree(os.path.join(trash, name), ignore_errors=True)
+    return purged
+
+def backup_attachments(mirror=ATTACHMENT_MIRROR):
+    """Salin attachment baru/berubah (beda ukuran atau mtime) ke mirror backup, lalu buang file yang sudah hilang"""
+    result = {"scanned": 0, "copied": 0, "bytes_copied": 0, "pruned": 0}
+    if not os.path.isdir(UPLOAD_DIR):
+        return result  # folder uploads tidak ada (volume belum di-mount?): jangan kosongkan mirror
+    for entry in walk_files(UPLOAD_DIR, (TMP_DIR, PREVIEW_DIR, QUARANTINE_DIR)):
+        result["scanned"] += 1
+        target = os.path.join(mirror, os.path.relpath(entry.path, UPLOAD_DIR))
+        stat = entry.stat()
+        try:
+            existing = os.stat(target)
+            if existing.st_size == stat.st_size and int(existing.st_mtime) == int(stat.st_mtime):
+                continue
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(entry.path, f"{target}.part")
+        os.replace(f"{target}.part", target)
+        result["copied"] += 1
+        result["bytes_copied"] += stat.st_size
+    result["pruned"] = _prune_mirror(mirror)
+    return result
+
+def list_snapshots():
+    """Nama folder snapshot (timestamp UTC), terbaru dulu"""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    return sorted((name for name in os.listdir(SNAPSHOT_DIR)
+                   if os.path.isfile(os.path.join(SNAPSHOT_DIR, name, "manifest.json"))), reverse=True)
+
+def rotate_snapshots(keep=RETENTION):
+    """Hapus snapshot di luar retensi (dan folder snapshot setengah jadi)"""
+    removed = []
+    snapshots = list_snapshots()
+    if not snapshots:
+        return removed
+    kept = set(snapshots[:keep])
+    for name in os.listdir(SNAPSHOT_DIR):
+        # folder tanpa manifest yang lebih baru dari snapshot terakhir = backup lain yang masih berjalan
+        if name not in kept and name <= snapshots[0]:
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+            removed.append(name)
+    purge_attachment_trash(min(kept) if kept else None)
+    return sorted(removed)
+
+def run_backup(include_attachments=True, keep=RETENTION):
+    """
+    Satu putaran backup: database utama + file arsip request -> snapshots/<timestamp>/,
+    attachment -> mirror incremental, lalu rotasi. Return manifest snapshot.
+    """
+    started = time.time()
+    previous, previous_manifest = _previous_manifest()
+    name = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    snapshot_path = os.path.join(SNAPSHOT_DIR, name)
+    os.makedirs(snapshot_path, exist_ok=True)
+
+    db_name = os.path.basename(DB_PATH)
+    manifest = {"snapshot": name, "created_at": datetime.utcnow().isoformat(), "databases": {}}
+    manifest["databases"][db_name] = {
+        "source": _file_signature(DB_PATH),
+        "integrity": backup_database(DB_PATH, os.path.join(snapshot_path, db_name)),
+    }
+    manifest["databases"].update(_backup_archives(snapshot_path, previous, previous_manifest))
+    if include_attachments:
+        manifest["attachments"] = backup_attachments()
+    manifest["seconds"] = round(time.time() - started, 2)
+
+    # manifest ditulis terakhir: snapshot tanpa manifest dianggap gagal dan ikut dihapus saat rotasi
+    with open(os.path.join(snapshot_path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    manifest["removed"] = rotate_snapshots(keep)
+    return manifest
+
+def summarize(manifest):
+    """Ringkasan hasil backup untuk job_state / halaman status"""
+    return {"snapshot": manifest["snapshot"], "removed": len(manifest["removed"]),
+            "attachments_copied": manifest.get("attachments", {}).get("copied", 0),
+            "attachments_pruned": manifest.get("attachments", {}).get("pruned", 0)}
+
+if __name__ == "__main__":
+    from scheduler import run_job
+    # python backup.py [--no-attachments] [--keep N] | --list | --verify SNAPSHOT
+    args = sys.argv[1:]
+    if "--list" in args:
+        for snapshot in list_snapshots():
+            print(snapshot)
+    elif "--verify" in args:
+        snapshot_path = os.path.join(SNAPSHOT_DIR, args[args.index("--verify") + 1])
+        for name in sorted(os.listdir(snapshot_path)):
+            if name.endswith(".db"):
+                print(f"{name}: {integrity_check(os.path.join(snapshot_path, name))}")
+    else:
+        keep = int(args[args.index("--keep") + 1]) if "--keep" in args else RETENTION
+        manifest = run_job("backup", lambda: run_backup(include_attachments="--no-attachments" not in args, keep=keep),
+                           summarize)
+        print(f"💾 Snapshot {manifest['snapshot']} ({manifest['seconds']} detik)")
+        for name, info in manifest["databases"].items():
+            print(f"   {name}: {info['integrity']}{' (hardlink)' if info.get('linked') else ''}")
+        if "attachments" in manifest:
+            att = manifest["attachments"]
+            print(f"   attachments: {att['copied']}/{att['scanned']} file disalin ({att['bytes_copied']} byte), "
+                  f"{att['pruned']} file lama dipindah ke trash")
+        if manifest["removed"]:
+            print(f"   rotasi: {', '.join(manifest['removed'])} dihapus")
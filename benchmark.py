@@ -0,0 +1,296 @@
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import sqlite3
+import platform
+import subprocess
+from datetime import datetime
+from synthetic_params import generator_params
+
+# Benchmark fungsi business / reports di atas organisasi sintetis (synthetic_org.py) pada beberapa skala.
+# Tiap skala: database dasar dibuat sekali (di-cache per parameter generator), lalu worker terpisah
+# (proses baru, HRMS_DB_PATH menunjuk salinan kerja) menjalankan semua case. Case yang mengubah data
+# selalu mulai dari salinan bersih. Hasil disimpan sebagai JSON di data/benchmarks/ untuk dibandingkan
+# antar versi:  python benchmark.py [small,medium] [--repeat N] [--cases a,b] [--compare hasil_lama.json]
+SCALES = {
+    "small": {"users": 200, "years": 2, "requests": 10000},
+    "medium": {"users": 2000, "years": 3, "requests": 200000},
+    "large": {"users": 5000, "years": 4, "requests": 1000000},
+    "xlarge": {"users": 10000, "years": 5, "requests": 3000000},
+}
+DEFAULT_SCALES = ["small", "medium"]
+SEED = 42
+END_YEAR = 2025
+REPEAT = 5
+MUTATING_REPEAT = 3  # case yang mengubah data butuh salinan database baru per run
+SAMPLE_USERS = 100
+SAMPLE_DECISIONS = 20
+REGRESSION_THRESHOLD = 1.2  # median > 1.2x hasil pembanding = regresi
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.environ.get("HRMS_BENCH_DIR", os.path.join("data", "bench"))
+RESULTS_DIR = os.environ.get("HRMS_BENCH_RESULTS_DIR", os.path.join("data", "benchmarks"))
+
+# ==================== ORKESTRASI ====================
+
+def _stored_params(path):
+    """Parameter generator yang tersimpan di database dasar, None jika belum ada / rusak"""
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(path)
+        row = conn.execute("SELECT value FROM job_state WHERE name = 'synthetic_org.params'").fetchone()
+        conn.close()
+    except sqlite3.Error:
+        return None
+    return json.loads(row[0]) if row else None
+
+def _subprocess(args, db_path, cwd, extra_env=None):
+    env = dict(os.environ, HRMS_DB_PATH=db_path, PYTHONPATH=REPO_DIR, **(extra_env or {}))
+    return subprocess.run([sys.executable] + args, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+def prepare_scale(name):
+    """Pastikan database dasar skala ini ada dan sesuai parameter. Return (path, detik generate | None)"""
+    spec = SCALES[name]
+    scale_dir = os.path.abspath(os.path.join(BENCH_DIR, name))
+    base = os.path.join(scale_dir, "base.db")
+    wanted = generator_params(seed=SEED, end_year=END_YEAR, **spec)
+    if _stored_params(base) == wanted:
+        return base, None
+    os.makedirs(scale_dir, exist_ok=True)
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        if os.path.exists(base + suffix):
+            os.remove(base + suffix)
+    print(f"🏗️  Generate skala {name}: {spec['users']} user, {spec['requests']} request ...")
+    started = time.time()
+    _subprocess([os.path.join(REPO_DIR, "synthetic_org.py"), "--users", str(spec["users"]),
+                 "--years", str(spec["years"]), "--requests", str(spec["requests"]), "--seed", str(SEED),
+                 "--end-year", str(END_YEAR)], base, scale_dir)
+    return base, round(time.time() - started, 1)
+
+def run_scale(name, repeat=REPEAT, cases=None):
+    base, generated = prepare_scale(name)
+    scale_dir = os.path.dirname(base)
+    args = [os.path.abspath(__file__), "--worker", base, "--repeat", str(repeat)]
+    if cases:
+        args += ["--cases", ",".join(cases)]
+    # Laporan dibaca langsung dari database kerja (tanpa snapshot)
+    result = _subprocess(args, os.path.join(scale_dir, "work.db"), scale_dir, {"HRMS_REPORT_SNAPSHOT_MAX_AGE": "0"})
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    summary.update(params=SCALES[name], generate_seconds=generated, db_bytes=os.path.getsize(base))
+    return summary
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(scales=None, repeat=REPEAT, cases=None):
+    """Jalankan benchmark di semua skala dan simpan hasilnya. Return (path file hasil, dict hasil)"""
+    commit = _git_commit()
+    results = {
+        "created_at": datetime.utcnow().isoformat(), "commit": commit, "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "repeat": repeat, "scales": {},
+    }
+    for name in scales or DEFAULT_SCALES:
+        results["scales"][name] = run_scale(name, repeat, cases)
+        _print_scale(name, results["scales"][name])
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path, results
+
+def compare(results, baseline):
+    """Bandingkan median per case dengan hasil lama. Return list (skala, case, lama, baru, rasio)"""
+    rows = []
+    for scale, summary in results["scales"].items():
+        old_cases = baseline.get("scales", {}).get(scale, {}).get("cases", {})
+        for case, stat in summary["cases"].items():
+            old = old_cases.get(case)
+            if not old or "median_ms" not in old or "median_ms" not in stat:
+                continue
+            ratio = stat["median_ms"] / old["median_ms"] if old["median_ms"] else 1.0
+            rows.append((scale, case, old["median_ms"], stat["median_ms"], round(ratio, 2)))
+    return rows
+
+def _print_scale(name, summary):
+    print(f"\n📊 {name} ({summary['params']['users']} user, {summary['params']['requests']} request)")
+    for case, stat in summary["cases"].items():
+        if "error" in stat:
+            print(f"   ❌ {case:<32} {stat['error'][:80]}")
+            continue
+        per_call = f", {stat['per_call_ms']} ms/panggilan" if stat["calls"] > 1 else ""
+        print(f"   {case:<34} median {stat['median_ms']:>9} ms (min {stat['min_ms']}, max {stat['max_ms']}), "
+              f"{stat['sql_count']} SQL{per_call}")
+
+# ==================== WORKER ====================
+
+def _worker_context(conn):
+    """Subjek benchmark yang representatif: manager dengan antrean terpanjang, user dengan history terbanyak"""
+    one = lambda sql, params=(): conn.execute(sql, params).fetchone()
+    manager_id = one("""
+        SELECT u.manager_id FROM requests r JOIN users u ON u.id = r.user_id
+        WHERE r.status = 'PENDING_MANAGER' GROUP BY u.manager_id ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    return {
+        "year": END_YEAR,
+        "hr_id": one("SELECT id FROM users WHERE role = 'HR_ADMIN' ORDER BY id LIMIT 1")[0],
+        "manager_id": manager_id[0] if manager_id else None,
+        "busiest_user": one("SELECT user_id FROM requests GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1")[0],
+        "sample_users": [row[0] for row in conn.execute(
+            "SELECT id FROM users ORDER BY id LIMIT ?", (SAMPLE_USERS,))],
+        "manager_queue": [row[0] for row in conn.execute("""
+            SELECT r.id FROM requests r JOIN users u ON u.id = r.user_id
+            WHERE r.status = 'PENDING_MANAGER' AND u.manager_id = ? ORDER BY r.id LIMIT ?
+        """, (manager_id[0] if manager_id else None, SAMPLE_DECISIONS))],
+        "hr_queue": [row[0] for row in conn.execute(
+            "SELECT id FROM requests WHERE status = 'PENDING_HR' ORDER BY id LIMIT ?", (SAMPLE_DECISIONS,))],
+    }
+
+def _cases(ctx):
+    """
+    Nama -> (fungsi, mengubah data?, jumlah panggilan per run).
+    Antrean & approval memakai fungsi yang dipanggil halaman Manager / HR (ui_manager, ui_hr).
+    """
+    import business
+    import reports
+    import report_export
+    import ui_manager
+    import ui_hr
+    from request_archive import request_history
+    year = ctx["year"]
+
+    def each(fn, items):
+        return lambda: [fn(item) for item in items]
+
+    def checked(fn):
+        # fungsi UI melaporkan error lewat st.error dan return False
+        def call(*args):
+            if not fn(*args):
+                raise RuntimeError(f"{fn.__name__}{args} gagal")
+        return call
+
+    return {
+        "list_users": (business.list_users, False, 1),
+        "list_managers": (business.list_managers, False, 1),
+        "user_quota": (each(lambda uid: business.user_quota(uid, year), ctx["sample_users"]),
+                       False, len(ctx["sample_users"])),
+        "manager_pending": (lambda: ui_manager.get_manager_pending_requests(ctx["manager_id"]), False, 1),
+        "hr_pending": (ui_hr.get_hr_pending_requests, False, 1),
+        "request_history.user": (lambda: request_history(user_id=ctx["busiest_user"]), False, 1),
+        "request_history.manager": (lambda: request_history(manager_id=ctx["manager_id"]), False, 1),
+        "approve.manager": (each(lambda rid: checked(ui_manager.set_manager_decision_new)(ctx["manager_id"], rid, True),
+                                 ctx["manager_queue"]), True, len(ctx["manager_queue"])),
+        "approve.hr": (each(lambda rid: checked(ui_hr.set_hr_decision_new)(ctx["hr_id"], rid, True), ctx["hr_queue"]),
+                       True, len(ctx["hr_queue"])),
+        "hr_reset_quotas": (lambda: business.hr_reset_quotas(year, 12, 0), True, 1),
+        "hr_reset_quotas_special": (lambda: business.hr_reset_quotas_special(year), True, 1),
+        "hr_reset_quotas_to_zero": (lambda: business.hr_reset_quotas_to_zero(year), True, 1),
+        "hr_reset_quotas_incremental": (lambda: business.hr_reset_quotas_incremental(year), True, 1),
+        "reports.period_year": (lambda: reports.get_period_report(year * 100 + 1, year * 100 + 12), False, 1),
+        "reports.quota_summary": (lambda: reports.get_user_quota_summary(year), False, 1),
+        "reports.semester": (lambda: reports.get_semester_report(1, year), False, 1),
+        "export.summary": (lambda: report_export.export_summary(year), False, 1),
+        "export.history_year": (lambda: report_export.export_history(year), False, 1),
+    }
+
+def _reset_work_db(base, work):
+    for suffix in ("-journal", "-wal", "-shm"):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copyfile(base, work)
+
+def _count_sql(fn):
+    import profiler
+    counter = [0]
+    def listener(sql, params, ms):
+        counter[0] += 1
+    profiler.add_listener(listener)
+    try:
+        fn()
+    finally:
+        profiler.remove_listener(listener)
+    return counter[0]
+
+def _time_case(fn, mutating, calls, repeat, reset):
+    durations = []
+    runs = min(repeat, MUTATING_REPEAT) if mutating else repeat
+    if not mutating:
+        fn()  # warm-up: page cache & import lazy
+    for _ in range(runs):
+        if mutating:
+            reset()
+        started = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    if mutating:
+        reset()
+    sql_count = _count_sql(fn)
+    if mutating:
+        reset()  # case berikutnya harus melihat database dasar, bukan hasil run penghitung SQL
+    durations.sort()
+    median = durations[len(durations) // 2]
+    return {
+        "runs": runs, "calls": calls, "min_ms": round(durations[0], 2), "median_ms": round(median, 2),
+        "max_ms": round(durations[-1], 2),
+        "per_call_ms": round(median / calls, 3) if calls else None, "sql_count": sql_count,
+    }
+
+def worker(base, repeat, only=None):
+    """Dijalankan di proses terpisah dengan HRMS_DB_PATH = database kerja. Return dict hasil per case"""
+    from db import DB_PATH
+    work = DB_PATH
+    _reset_work_db(base, work)
+    ctx_conn = sqlite3.connect(work)
+    ctx = _worker_context(ctx_conn)
+    ctx_conn.close()
+    results = {}
+    for name, (fn, mutating, calls) in _cases(ctx).items():
+        if only and name not in only:
+            continue
+        try:
+            results[name] = _time_case(fn, mutating, calls, repeat, lambda: _reset_work_db(base, work))
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            del e
+            gc.collect()  # koneksi yang tidak di-close di jalur error masih memegang lock tulis
+            _reset_work_db(base, work)
+    return {"cases": results, "context": {k: v for k, v in ctx.items() if not isinstance(v, list)}}
+
+def _arg(args, name, default):
+    return type(default)(args[args.index(name) + 1]) if name in args else default
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = _arg(args, "--repeat", REPEAT)
+    only = [c for c in _arg(args, "--cases", "").split(",") if c] or None
+    if "--worker" in args:
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):  # print dari modul aplikasi jangan campur dengan JSON
+            summary = worker(_arg(args, "--worker", ""), repeat, only)
+        print(json.dumps(summary))
+        sys.exit(0)
+
+    scales = args[0].split(",") if args and not args[0].startswith("--") else DEFAULT_SCALES
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        sys.exit(f"Skala tidak dikenal: {', '.join(unknown)} (pilihan: {', '.join(SCALES)})")
+    path, results = run_suite(scales, repeat, only)
+    print(f"\n💾 Hasil: {path}")
+
+    baseline_path = _arg(args, "--compare", "")
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            rows = compare(results, json.load(f))
+        regressions = [row for row in rows if row[4] > REGRESSION_THRESHOLD]
+        print(f"\n🔍 Dibanding {baseline_path}:")
+        for scale, case, old, new, ratio in rows:
+            flag = "🔴" if ratio > REGRESSION_THRESHOLD else "🟢" if ratio < 1 / REGRESSION_THRESHOLD else "⚪"
+            print(f"   {flag} {scale}/{case}: {old} -> {new} ms ({ratio}x)")
+        sys.exit(1 if regressions else 0)
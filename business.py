@@ -3,17 +3,53 @@ import pandas as pd
 import pytz
 from datetime import datetime, date, timedelta
 from db import get_conn
+from profiler import connection_factory
+from request_archive import get_archived_changeoff_details
 from models import *
-import streamlit as st
 import hashlib
 
 # Tambahkan fungsi koneksi database
 def get_db_connection():
     """Membuat koneksi ke database SQLite"""
-    conn = sqlite3.connect('database.db')  # Ganti dengan path database kamu
+    conn = sqlite3.connect('database.db', factory=connection_factory())  # Ganti dengan path database kamu
     conn.row_factory = sqlite3.Row
     return conn
 
+def get_changeoff_details(request_ids):
+    """Detail change off (lokasi, PIC, aktivitas) untuk sekumpulan request id -> dict id -> detail"""
+    ids = [int(i) for i in request_ids]
+    details = {}
+    conn = get_conn()
+    for offset in range(0, len(ids), 500):
+        chunk = ids[offset:offset + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(f"""
+            SELECT request_id, location, pic, activities_json
+            FROM changeoff_details WHERE request_id IN ({placeholders})
+        """, chunk):
+            details[row["request_id"]] = dict(row)
+    conn.close()
+    missing = [i for i in ids if i not in details]
+    if missing:
+        details.update(get_archived_changeoff_details(missing))
+    return details
+
+def with_changeoff_details(df):
+    """
+    Tambahkan kolom location / pic / activities_json ke DataFrame requests untuk tampilan detail.
+    Hanya row CHANGEOFF yang di-lookup (satu query per 500 id), list biasa tidak perlu memanggil ini.
+    """
+    df = df.copy()
+    columns = ["location", "pic", "activities_json"]
+    if df.empty:
+        for column in columns:
+            df[column] = None
+        return df
+    details = get_changeoff_details(df.loc[df["type"] == "CHANGEOFF", "id"])
+    for column in columns:
+        df[column] = df["id"].map(lambda i: details.get(int(i), {}).get(column))
+    return df
+
 # Fungsi reset kuota yang diperbaiki
 def hr_reset_quotas_incremental(year):
     """
@@ -238,6 +274,7 @@ def parse_date(date_string):
                 # Format simple YYYY-MM-DD
                 return datetime.strptime(date_string, '%Y-%m-%d').date()
         except:
+            import streamlit as st  # lazy: business juga dipakai API / CLI tanpa Streamlit
             st.warning(f"Tidak bisa parse date: {date_string}")
             return None
 
@@ -261,13 +298,20 @@ def get_manager_for_user(user_id):
     conn.close()
     return row
 
-def require_manager_assigned(user):
-    mgr = get_manager_for_user(int(user["id"]))
-    if not mgr:
-        st.error("Akun Anda belum memiliki Manager yang ditetapkan. Hubungi HR untuk mengatur Manager terlebih dahlu.")
-        return False
+def manager_assignment_error(user_id):
+    """Pesan error jika user belum punya Manager yang valid, None jika OK (dipakai UI dan API)"""
+    mgr = get_manager_for_user(int(user_id))
+    if not mgr or mgr["id"] is None:
+        return "Akun Anda belum memiliki Manager yang ditetapkan. Hubungi HR untuk mengatur Manager terlebih dahlu."
     if mgr["role"] != "MANAGER":
-        st.error(f"Manager yang ditetapkan adalah {mgr['name']} ({mgr['email']}) tetapi rolenya {mgr['role']}. HR perlu memperbaiki.")
+        return f"Manager yang ditetapkan adalah {mgr['name']} ({mgr['email']}) tetapi rolenya {mgr['role']}. HR perlu memperbaiki."
+    return None
+
+def require_manager_assigned(user):
+    error = manager_assignment_error(user["id"])
+    if error:
+        import streamlit as st
+        st.error(error)
         return False
     return True
 
@@ -308,7 +352,18 @@ def get_or_create_quota(user_id, year):
     return q
 
 def user_quota(user_id, year):
-    q = get_or_create_quota(user_id, year)
+    return _quota_dict(get_or_create_quota(user_id, year), year)
+
+def read_user_quota(user_id, year):
+    """Seperti user_quota tapi read-only: tanpa row quota -> nilai awal get_or_create_quota, tanpa INSERT"""
+    conn = get_conn()
+    q = conn.execute("SELECT * FROM quotas WHERE user_id=? AND year=?", (user_id, year)).fetchone()
+    conn.close()
+    if not q:
+        q = {"leave_total": 12, "leave_used": 0, "changeoff_earned": 0, "changeoff_used": 0}
+    return _quota_dict(q, year)
+
+def _quota_dict(q, year):
     return {
         "year": year,
         "leave_total": int(q["leave_total"]),
@@ -366,7 +421,7 @@ def submit_sick_leave(user_id, start_date, end_date, has_doctor_note=False, kete
         end_dt = parse_date(end_date)
         days = (end_dt - start_dt).days + 1
         
-        now = datetime.now().isoformat()
+        now = datetime.utcnow().isoformat()
         status = "PENDING_MANAGER"
         
         if has_doctor_note:
@@ -424,7 +479,7 @@ def manager_pending(manager_id):
             FROM requests r
             JOIN users u ON u.id = r.user_id
             WHERE r.status = 'PENDING_MANAGER' AND u.manager_id = ?
-            ORDER BY r.created_at DESC
+            ORDER BY r.created_at_ts DESC, r.id DESC
         """, conn, params=(manager_id,))
         conn.close()
         return df
@@ -455,7 +510,7 @@ def set_manager_decision(manager_id, request_id, approve):
         
         # Update status
         new_status = 'PENDING_HR' if approve else 'REJECTED'
-        now = datetime.now().isoformat()
+        now = datetime.utcnow().isoformat()
         
         cursor.execute("""
             UPDATE requests 
@@ -485,7 +540,7 @@ def hr_pending():
             FROM requests r
             JOIN users u ON u.id = r.user_id
             WHERE r.status = 'PENDING_HR'
-            ORDER BY r.created_at DESC
+            ORDER BY r.created_at_ts DESC, r.id DESC
         """, conn)
         conn.close()
         return df
@@ -494,26 +549,35 @@ def hr_pending():
         return pd.DataFrame()
 
 def set_hr_decision(hr_id, request_id, approve, request_type=None):
-    """Set HR decision - UPDATED VERSION"""
+    """
+    Set HR decision (dipakai halaman HR dan API).
+    Status dan quota diupdate dalam satu transaksi BEGIN IMMEDIATE, dan UPDATE hanya berlaku selama request
+    masih PENDING_HR: dua keputusan bersamaan (proses UI / API berbeda) tidak bisa memotong quota dua kali.
+    ValueError jika request tidak ada atau sudah diputuskan.
+    """
+    conn = get_conn()
+    conn.isolation_level = None  # transaksi diatur manual
+    cursor = conn.cursor()
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        
+        cursor.execute("BEGIN IMMEDIATE")
+
         # Get request details
         cursor.execute("SELECT * FROM requests WHERE id = ?", (request_id,))
         request = cursor.fetchone()
         if not request:
-            raise Exception("Request tidak ditemukan")
+            raise ValueError("Request tidak ditemukan")
         
         # Update status
         new_status = 'APPROVED' if approve else 'REJECTED'
-        now = datetime.now().isoformat()
+        now = datetime.utcnow().isoformat()
         
         cursor.execute("""
             UPDATE requests 
             SET status = ?, hr_id = ?, hr_at = ?, updated_at = ?
-            WHERE id = ?
+            WHERE id = ? AND status = 'PENDING_HR'
         """, (new_status, hr_id, now, now, request_id))
+        if cursor.rowcount == 0:
+            raise ValueError(f"Request sudah berstatus {request['status']}")
         
         # Update quotas if approved
         if approve:
@@ -537,11 +601,19 @@ def set_hr_decision(hr_id, request_id, approve, request_type=None):
                         SET leave_used = ?, updated_at = ?
                         WHERE user_id = ? AND year = ?
                     """, (new_used, now, user_id, year))
+                else:
+                    cursor.execute("""
+                        INSERT INTO quotas (user_id, year, leave_total, leave_used, changeoff_earned, changeoff_used, created_at, updated_at)
+                        VALUES (?, ?, 12, ?, 0, 0, ?, ?)
+                    """, (user_id, year, days, now, now))
                 
             elif request["type"] == "CHANGEOFF":
-                # Add changeoff balance
-                hours = request.get("hours", 0)
-                days_earned = int(hours / 8)  # Convert hours to days
+                # Sama dengan halaman HR: pakai change_off_days, fallback jam / 8 untuk data lama
+                if request["change_off_days"] and request["change_off_days"] > 0:
+                    days_earned = request["change_off_days"]
+                else:
+                    hours = request["hours"] if request["hours"] is not None else 0
+                    days_earned = int(hours / 8) if hours > 0 else 0
                 
                 cursor.execute("SELECT * FROM quotas WHERE user_id = ? AND year = ?", (user_id, year))
                 quota = cursor.fetchone()
@@ -559,13 +631,40 @@ def set_hr_decision(hr_id, request_id, approve, request_type=None):
                         INSERT INTO quotas (user_id, year, leave_total, leave_used, changeoff_earned, changeoff_used, created_at, updated_at)
                         VALUES (?, ?, 12, 0, ?, 0, ?, ?)
                     """, (user_id, year, days_earned, now, now))
+
+            elif request["type"] == "LEAVE" and request["reason"] == "CHANGEOFF":
+                # Cuti dengan saldo change off - potong changeoff_used
+                start_date = datetime.fromisoformat(request["start_date"]).date()
+                end_date = datetime.fromisoformat(request["end_date"]).date()
+                days = (end_date - start_date).days + 1
+
+                cursor.execute("SELECT * FROM quotas WHERE user_id = ? AND year = ?", (user_id, year))
+                quota = cursor.fetchone()
+
+                if quota:
+                    cursor.execute("""
+                        UPDATE quotas 
+                        SET changeoff_used = ?, updated_at = ?
+                        WHERE user_id = ? AND year = ?
+                    """, (quota["changeoff_used"] + days, now, user_id, year))
+                else:
+                    cursor.execute("""
+                        INSERT INTO quotas (user_id, year, leave_total, leave_used, changeoff_earned, changeoff_used, created_at, updated_at)
+                        VALUES (?, ?, 12, 0, 0, ?, ?, ?)
+                    """, (user_id, year, days, now, now))
         
-        conn.commit()
-        conn.close()
+        cursor.execute("COMMIT")
         return True
         
+    except ValueError:
+        cursor.execute("ROLLBACK")
+        raise
     except Exception as e:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
         raise Exception(f"Error setting HR decision: {e}")
+    finally:
+        conn.close()
 
 def hr_reset_quotas(year, leave_total=0, co_earned=0):
     """HR function to reset all quotas for a year - TOTAL DI-SET 0"""
@@ -613,7 +712,14 @@ def manual_increment_leave_balance(year=None):
             FROM users 
             WHERE id NOT IN (SELECT user_id FROM quotas WHERE year = ?)
         """, (year, now, now, year))
-        
+
+        if year == date.today().year:
+            # Catat seperti auto_increment_leave_balance, supaya accrual terjadwal bulan ini tidak menambah lagi
+            cur.execute("""
+                INSERT OR REPLACE INTO system_settings (id, last_increment, updated_at)
+                VALUES (1, ?, ?)
+            """, (datetime.now().isoformat(), now))  # tanggal lokal, sama dengan date.today() pembandingnya
+
         conn.commit()
         return True, f"✅ Semua user dapat +1 leave balance untuk tahun {year}!"
         
@@ -624,39 +730,51 @@ def manual_increment_leave_balance(year=None):
         conn.close()
 
 def set_manager_decision(manager_id, request_id, approve):
+    """
+    Keputusan manager dalam satu transaksi BEGIN IMMEDIATE; UPDATE hanya berlaku selama request masih
+    PENDING_MANAGER. ValueError jika request tidak ada, bukan tim manager ini, atau sudah diputuskan.
+    """
     conn = get_conn()
+    conn.isolation_level = None  # transaksi diatur manual
     cur = conn.cursor()
-    
-    # Cek apakah request ada dan user memang manager dari employee tersebut
-    cur.execute("""SELECT r.*, u.manager_id
-                   FROM requests r JOIN users u ON u.id=r.user_id
-                   WHERE r.id=?""", (request_id,))
-    row = cur.fetchone()
-    
-    if not row:
-        conn.close()
-        raise ValueError("Request tidak ditemukan")
-    
-    # Verifikasi bahwa user memang manager dari employee yang membuat request
-    if row['manager_id'] != manager_id:
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+
+        # Cek apakah request ada dan user memang manager dari employee tersebut
+        cur.execute("""SELECT r.*, u.manager_id
+                       FROM requests r JOIN users u ON u.id=r.user_id
+                       WHERE r.id=?""", (request_id,))
+        row = cur.fetchone()
+
+        if not row:
+            raise ValueError("Request tidak ditemukan")
+
+        # Verifikasi bahwa user memang manager dari employee yang membuat request
+        if row['manager_id'] != manager_id:
+            raise ValueError("Anda bukan manager dari employee ini")
+
+        # Update status berdasarkan keputusan
+        now = datetime.utcnow().isoformat()
+        if approve:
+            status = 'PENDING_HR'  # Lanjut ke HR
+        else:
+            status = 'REJECTED'    # Ditolak manager
+
+        cur.execute("""
+            UPDATE requests 
+            SET status = ?, manager_at = ?, updated_at = ?
+            WHERE id = ? AND status = 'PENDING_MANAGER'
+        """, (status, now, now, request_id))
+        if cur.rowcount == 0:
+            raise ValueError(f"Request sudah berstatus {row['status']}")
+
+        cur.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
         conn.close()
-        raise ValueError("Anda bukan manager dari employee ini")
-    
-    # Update status berdasarkan keputusan
-    now = datetime.utcnow().isoformat()
-    if approve:
-        status = 'PENDING_HR'  # Lanjut ke HR
-    else:
-        status = 'REJECTED'    # Ditolak manager
-    
-    cur.execute("""
-        UPDATE requests 
-        SET status = ?, manager_by = ?, manager_at = ?, updated_at = ?
-        WHERE id = ?
-    """, (status, manager_id, now, now, request_id))
-    
-    conn.commit()
-    conn.close()
 
 def my_requests(user_id: int) -> pd.DataFrame:
     """Get all requests for a user"""
@@ -833,11 +951,30 @@ def delete_quota(user_id, year):
     conn.close()
 
 
+def leave_accrual_due(today=None):
+    """True jika auto_increment_leave_balance() akan menambah saldo hari ini (untuk dry run CLI)"""
+    today = today or date.today()
+    if today.day != 1:
+        return False
+    conn = get_conn()
+    try:
+        setting = conn.execute("SELECT last_increment FROM system_settings WHERE id=1").fetchone()
+    except sqlite3.OperationalError:
+        setting = None  # tabel belum ada = belum pernah increment
+    finally:
+        conn.close()
+    try:
+        last_increment = datetime.fromisoformat(setting["last_increment"]).date() if setting else None
+    except (TypeError, ValueError):
+        last_increment = None
+    return not last_increment or last_increment.month != today.month
+
 def auto_increment_leave_balance():
-    """Auto increment leave balance every 1st of the month"""
+    """Auto increment leave balance every 1st of the month. Return True jika increment dijalankan"""
     from db import get_conn
     from datetime import datetime, date
     
+    executed = False
     today = date.today()
     if today.day == 1:  # Hanya jalan tiap tanggal 1
         conn = get_conn()
@@ -884,112 +1021,13 @@ def auto_increment_leave_balance():
             """, (now, now))
             
             conn.commit()
+            executed = True
             print(f"✅ Auto increment executed on {today}. All users got +1 leave balance.")
         conn.close()
+    return executed
 
-def get_user_quota_summary(year=None):
-    """Get summary report of all users' quotas for the year"""
-    from db import get_conn
-    import pandas as pd
-    
-    if year is None:
-        year = date.today().year
-    
-    conn = get_conn()
-    
-    # Query untuk mendapatkan summary per user
-    query = """
-    SELECT 
-        u.id as user_id,
-        u.name as user_name,
-        u.email as user_email,
-        u.division as user_division,
-        u.nik as user_nik,
-        q.year as year,
-        q.leave_total as leave_total,
-        q.leave_used as leave_used,
-        q.leave_total - q.leave_used as leave_balance,
-        q.changeoff_earned as co_earned,
-        q.changeoff_used as co_used,
-        q.changeoff_earned - q.changeoff_used as co_balance,
-        u.sick_balance as sick_balance,
-        CASE 
-            WHEN q.leave_balance >= 8 THEN 'Excellent'
-            WHEN q.leave_balance >= 4 THEN 'Good' 
-            WHEN q.leave_balance >= 1 THEN 'Low'
-            ELSE 'Critical'
-        END as leave_status,
-        CASE 
-            WHEN q.co_balance >= 5 THEN 'Excellent'
-            WHEN q.co_balance >= 3 THEN 'Good'
-            WHEN q.co_balance >= 1 THEN 'Low'
-            ELSE 'No Balance'
-        END as co_status,
-        CASE 
-            WHEN u.sick_balance >= 4 THEN 'Sufficient'
-            WHEN u.sick_balance >= 2 THEN 'Moderate'
-            ELSE 'Low'
-        END as sick_status
-    FROM users u
-    LEFT JOIN quotas q ON u.id = q.user_id AND q.year = ?
-    ORDER BY u.name
-    """
-    
-    df = pd.read_sql_query(query, conn, params=(year,))
-    conn.close()
-    
-    return df
-
-def get_semester_report(semester=1, year=None):
-    """Get detailed report per semester"""
-    from db import get_conn
-    import pandas as pd
-    
-    if year is None:
-        year = date.today().year
-    
-    # Tentukan bulan range berdasarkan semester
-    if semester == 1:
-        month_range = "01-06"  # Jan-Jun
-    else:
-        month_range = "07-12"  # Jul-Dec
-    
-    conn = get_conn()
-    
-    query = """
-    SELECT 
-        u.id as user_id,
-        u.name as user_name,
-        u.nik as user_nik,
-        u.division as user_division,
-        q.year as year,
-        'Semester {}' as semester,
-        q.leave_total as total_leave,
-        q.leave_used as used_leave,
-        q.leave_balance as balance_leave,
-        q.changeoff_earned as earned_co,
-        q.changeoff_used as used_co,
-        q.changeoff_balance as balance_co,
-        u.sick_balance as sick_balance,
-        COUNT(r.id) as total_requests,
-        SUM(CASE WHEN r.status = 'APPROVED' THEN 1 ELSE 0 END) as approved_requests,
-        SUM(CASE WHEN r.status LIKE 'PENDING%' THEN 1 ELSE 0 END) as pending_requests
-    FROM users u
-    LEFT JOIN quotas q ON u.id = q.user_id AND q.year = ?
-    LEFT JOIN requests r ON u.id = r.user_id 
-        AND strftime('%Y', r.created_at) = ?
-        AND strftime('%m', r.created_at) BETWEEN ? AND ?
-    GROUP BY u.id
-    ORDER BY u.name
-    """.format(semester)
-    
-    # Parse month range
-    start_month, end_month = month_range.split('-')
-    
-    df = pd.read_sql_query(query, conn, params=(year, str(year), start_month, end_month))
-    conn.close()
-    
-    return df
+# Laporan summary / semester / periode custom dihitung dari rollup (lihat reports.py)
+from reports import get_user_quota_summary, get_semester_report, get_period_report
 
 
 
@@ -1116,9 +1154,10 @@ def hr_reset_quotas_special(year):
         raise e
 
 
-def hr_reset_quotas_to_zero(year):
+def hr_reset_quotas_to_zero(year, progress=None):
     """
-    Reset semua kuota cuti dan change off ke nol
+    Reset semua kuota cuti dan change off ke nol.
+    progress: callback opsional (selesai, total) per user, mis. untuk output CLI
     """
     try:
         conn = get_db_connection()
@@ -1135,6 +1174,8 @@ def hr_reset_quotas_to_zero(year):
             # Reset semua nilai ke 0
             upsert_quota(user_id, year, 0, 0, 0, 0)
             updated_count += 1
+            if progress:
+                progress(updated_count, len(users_df))
         
         conn.close()
         return updated_count
@@ -1143,9 +1184,10 @@ def hr_reset_quotas_to_zero(year):
         print(f"Error in hr_reset_quotas_to_zero: {e}")
         raise e
 
-def hr_reset_quotas_incremental(year):
+def hr_reset_quotas_incremental(year, progress=None):
     """
-    Tambah 1 saldo cuti untuk semua user
+    Tambah 1 saldo cuti untuk semua user.
+    progress: callback opsional (selesai, total) per user
     """
     try:
         conn = get_db_connection()
@@ -1169,6 +1211,8 @@ def hr_reset_quotas_incremental(year):
                 int(current_quota["co_used"]),
                 int(current_quota["leave_used"])
             )
+            if progress:
+                progress(updated_count, len(users_df))
         
         conn.close()
         return {"updated_count": updated_count, "total_users": len(users_df)}
@@ -1,20 +1,108 @@
 import sqlite3
 import os
+import time
+import calendar
+import threading
+from urllib.parse import quote
 from datetime import datetime
+from profiler import connection_factory
+
+DB_PATH = os.environ.get("HRMS_DB_PATH", os.path.join("data", "database.db"))
+DATA_DIR = os.path.dirname(DB_PATH) or "."
+
+# Laporan berat dibaca dari snapshot read-only (salinan database yang di-refresh berkala), bukan dari
+# database yang dipakai approval. 0 = baca langsung database utama dengan koneksi mode=ro.
+REPORT_SNAPSHOT_PATH = os.path.join(DATA_DIR, "report_snapshot.db")
+REPORT_SNAPSHOT_MAX_AGE = int(os.environ.get("HRMS_REPORT_SNAPSHOT_MAX_AGE", "300"))
+# Snapshot disalin bertahap: tiap langkah menyalin N halaman lalu melepas shared lock sebentar, jadi writer
+# (rollback journal, tanpa WAL) hanya tertahan selama satu langkah, bukan selama seluruh salinan
+REPORT_SNAPSHOT_STEP_PAGES = int(os.environ.get("HRMS_REPORT_SNAPSHOT_STEP_PAGES", "256"))
+REPORT_SNAPSHOT_STEP_SLEEP = float(os.environ.get("HRMS_REPORT_SNAPSHOT_STEP_SLEEP", "0.01"))
+BACKUP_MAX_RESTARTS = 3  # write dari koneksi lain membuat backup bertahap mulai ulang; setelah ini salin sekaligus
+_snapshot_lock = threading.Lock()
+
+class BackupRestarted(Exception):
+    pass
+
+def backup_progress(step_sleep):
+    """
+    Callback progress untuk Connection.backup bertahap (juga dipakai backup.py). Tidur setelah tiap langkah
+    supaya lock baca terlepas dan writer bisa masuk; BackupRestarted jika salinan terlalu sering mulai ulang.
+    """
+    state = {"remaining": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        # remaining naik lagi = ada write di tengah backup dan SQLite memulai ulang salinan dari awal
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] >= BACKUP_MAX_RESTARTS:
+                raise BackupRestarted()
+        state["remaining"] = remaining
+        time.sleep(step_sleep)
+    return progress
 
 def get_conn():
     """Membuat koneksi ke database SQLite"""
-    os.makedirs('data', exist_ok=True)
-    conn = sqlite3.connect('data/database.db')
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, factory=connection_factory())
     conn.row_factory = sqlite3.Row
     # DISABLE foreign key constraints untuk kemudahan delete
     conn.execute("PRAGMA foreign_keys = OFF")
     return conn
 
+def _ro_uri(path, immutable=False):
+    return f"file:{quote(os.path.abspath(path))}?mode=ro" + ("&immutable=1" if immutable else "")
+
+def report_snapshot_time():
+    """Waktu (epoch) snapshot laporan terakhir dibuat, None jika belum ada"""
+    try:
+        return os.path.getmtime(REPORT_SNAPSHOT_PATH)
+    except OSError:
+        return None
+
+def refresh_report_snapshot(force=False):
+    """
+    Buat ulang snapshot laporan jika lebih tua dari REPORT_SNAPSHOT_MAX_AGE.
+    Salinan ditulis ke file sementara lalu di-rename: koneksi laporan yang sedang terbuka tetap membaca
+    file lama (view point-in-time yang konsisten), koneksi baru membaca snapshot baru.
+    """
+    with _snapshot_lock:
+        created = report_snapshot_time()
+        if not force and created is not None and time.time() - created < REPORT_SNAPSHOT_MAX_AGE:
+            return REPORT_SNAPSHOT_PATH
+        tmp_path = f"{REPORT_SNAPSHOT_PATH}.{os.getpid()}.part"
+        source = get_conn()
+        target = sqlite3.connect(tmp_path)
+        try:
+            try:
+                source.backup(target, pages=REPORT_SNAPSHOT_STEP_PAGES,
+                              progress=backup_progress(REPORT_SNAPSHOT_STEP_SLEEP))
+            except BackupRestarted:
+                # Write terus-menerus: jangan berputar sambil memegang _snapshot_lock, salin sekaligus
+                source.backup(target, pages=-1)
+        finally:
+            target.close()
+            source.close()
+        os.replace(tmp_path, REPORT_SNAPSHOT_PATH)
+    return REPORT_SNAPSHOT_PATH
+
+def get_report_conn():
+    """Koneksi read-only untuk laporan/analitik (tidak pernah mengambil lock tulis di database utama)"""
+    if REPORT_SNAPSHOT_MAX_AGE <= 0:
+        conn = sqlite3.connect(_ro_uri(DB_PATH), uri=True, factory=connection_factory())
+    else:
+        # Snapshot tidak pernah diubah di tempat (selalu diganti lewat rename) -> aman dibuka immutable
+        conn = sqlite3.connect(_ro_uri(refresh_report_snapshot(), immutable=True), uri=True,
+                               factory=connection_factory())
+    conn.row_factory = sqlite3.Row
+    return conn
+
 def init_db():
     """Inisialisasi database - buat semua tabel jika belum ada"""
     conn = get_conn()
     cursor = conn.cursor()
+    # Hanya berlaku untuk database baru (sebelum tabel pertama dibuat); database lama dikonversi maintenance.py
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
     
     # ==================== USERS TABLE ====================
     cursor.execute('''
@@ -63,13 +151,8 @@ def init_db():
             end_date TEXT NOT NULL,
             reason TEXT,
             keterangan TEXT,
-            departure_date TEXT,
-            return_date TEXT,
             hours INTEGER,
             change_off_days INTEGER DEFAULT 0,
-            location TEXT,
-            pic TEXT,
-            activities_json TEXT,
             status TEXT DEFAULT 'PENDING_MANAGER',
             file_uploaded BOOLEAN DEFAULT FALSE,
             timesheet_path TEXT,
@@ -87,6 +170,28 @@ def init_db():
         print("✅ Added change_off_days column to requests table")
     except sqlite3.OperationalError:
         pass  # Column already exists
+
+    # Kolom epoch UTC (generated, otomatis terisi untuk data lama) + index untuk sort / filter rentang
+    add_epoch_columns(cursor)
+
+    # ==================== CHANGEOFF DETAILS TABLE ====================
+    # Kolom change off yang lebar & jarang dibaca (activities_json, lokasi, PIC) dipisah dari requests,
+    # hanya di-join di tampilan detail. Tanggal berangkat/pulang = start_date/end_date di requests.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS changeoff_details (
+            request_id INTEGER PRIMARY KEY,
+            location TEXT,
+            pic TEXT,
+            activities_json TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_requests_changeoff_details_delete AFTER DELETE ON requests
+        BEGIN
+            DELETE FROM changeoff_details WHERE request_id = OLD.id;
+        END
+    ''')
+    narrow_requests_table(cursor)
     
     # ==================== LEGACY TABLES (Keep for backward compatibility) ====================
     cursor.execute('''
@@ -167,9 +272,95 @@ def init_db():
             updated_at TEXT NOT NULL
         )
     ''')
-    
+
+    # ==================== ATTACHMENTS TABLE ====================
+    # Metadata file upload (content-addressed), supaya preview tidak perlu os.stat / mimetypes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachments (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size INTEGER NOT NULL,
+            mime_type TEXT NOT NULL,
+            original_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # File lama yang isinya sama dengan attachment terdaftar di path lain (sha256 / path di atas unik),
+    # supaya tidak di-hash ulang setiap kali dibuka
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachment_aliases (
+            path TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL
+        )
+    ''')
+    # Nama file seperti diupload requester. File dedup dipakai bersama banyak request, jadi
+    # attachments.original_name (nama upload pertama) tidak boleh ditampilkan ke request lain
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS request_attachment_names (
+            request_id INTEGER PRIMARY KEY,
+            original_name TEXT NOT NULL
+        )
+    ''')
+
+    # ==================== JOB STATE TABLE ====================
+    # Checkpoint untuk job batch (mis. waktu approval terakhir yang sudah dibuatkan surat)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_state (
+            name TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+
+    # ==================== HEALTH CHECKS TABLE ====================
+    # Hasil terakhir job integritas data (integrity.py), ditampilkan di halaman Status HR
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS health_checks (
+            name TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            value INTEGER,
+            detail TEXT,
+            checked_at TEXT NOT NULL
+        )
+    ''')
+
+    # ==================== REQUEST ROLLUPS (REPORTING) ====================
+    # Agregat per user per bulan (YYYYMM), diupdate otomatis oleh trigger di tabel requests
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='request_rollups'")
+    rollups_created = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS request_rollups (
+            user_id INTEGER NOT NULL,
+            period INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            reason TEXT NOT NULL DEFAULT '',
+            status TEXT NOT NULL,
+            request_count INTEGER NOT NULL DEFAULT 0,
+            days INTEGER NOT NULL DEFAULT 0,
+            co_days INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period, type, reason, status)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_request_rollups_period ON request_rollups(period)")
+    create_rollup_triggers(cursor)
+
+    # ==================== CHANGELOG (PAYROLL FEED) ====================
+    # Setiap perubahan requests / quotas dicatat dengan seq yang naik terus, consumer cukup minta "seq > token"
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    create_changelog_triggers(cursor)
+
     # ==================== MIGRATE DATA ====================
     migrate_legacy_data(cursor)
+    if rollups_created:
+        rebuild_rollups(cursor)
     
     conn.commit()
     conn.close()
@@ -178,6 +369,172 @@ def init_db():
     # Create default admin user jika belum ada
     create_default_admin()
 
+# Timestamp di requests ditulis dalam format campuran (ISO UTC naive, ISO +07:00, CURRENT_TIMESTAMP, tanggal saja).
+# strftime('%s') menormalkan semuanya ke epoch UTC (nilai tanpa offset dianggap UTC, format tidak valid -> NULL).
+EPOCH_COLUMNS = {
+    "created_at_ts": "created_at",
+    "updated_at_ts": "updated_at",
+    "manager_at_ts": "manager_at",
+    "hr_at_ts": "hr_at",
+    "start_ts": "start_date",
+    "end_ts": "end_date",
+}
+EPOCH_INDEXES = {
+    "idx_requests_user_created": "user_id, created_at_ts",
+    "idx_requests_status_created": "status, created_at_ts",
+}
+
+def add_epoch_columns(cursor):
+    """Tambah kolom epoch generated (VIRTUAL) + index di requests, aman dipanggil berulang"""
+    for column, source in EPOCH_COLUMNS.items():
+        try:
+            cursor.execute(f"""
+                ALTER TABLE requests ADD COLUMN {column} INTEGER
+                GENERATED ALWAYS AS (CAST(strftime('%s', {source}) AS INTEGER)) VIRTUAL
+            """)
+            print(f"✅ Added {column} column to requests table")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_requests_{column} ON requests({column})")
+    for name, columns in EPOCH_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON requests({columns})")
+
+def to_epoch(value):
+    """date / datetime / string ISO -> epoch UTC (int), sama dengan kolom *_ts di requests"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is not None:
+        return int(value.timestamp())
+    return calendar.timegm(value.timetuple())
+
+# Kolom lebar yang dulu ada di requests untuk semua tipe request
+WIDE_REQUEST_COLUMNS = ["departure_date", "return_date", "location", "pic", "activities_json"]
+
+def narrow_requests_table(cursor):
+    """Pindahkan kolom change off yang lebar ke changeoff_details lalu drop dari requests (sekali saja)"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(requests)")}
+    wide = [c for c in WIDE_REQUEST_COLUMNS if c in existing]
+    if not wide:
+        return
+    if {"location", "pic", "activities_json"} <= existing:
+        cursor.execute('''
+            INSERT OR IGNORE INTO changeoff_details (request_id, location, pic, activities_json)
+            SELECT id, location, pic, activities_json FROM requests
+            WHERE type = 'CHANGEOFF' OR location IS NOT NULL OR pic IS NOT NULL OR activities_json IS NOT NULL
+        ''')
+    if {"departure_date", "return_date"} <= existing:
+        # Data lama: start/end kosong tapi tanggal berangkat/pulang terisi
+        cursor.execute('''
+            UPDATE requests SET start_date = COALESCE(NULLIF(start_date, ''), departure_date),
+                                end_date = COALESCE(NULLIF(end_date, ''), return_date)
+            WHERE type = 'CHANGEOFF' AND (NULLIF(start_date, '') IS NULL OR NULLIF(end_date, '') IS NULL)
+        ''')
+    for column in wide:
+        cursor.execute(f"ALTER TABLE requests DROP COLUMN {column}")
+    print(f"✅ Moved {', '.join(wide)} from requests to changeoff_details")
+
+def get_job_state(name, default=None):
+    """Baca checkpoint job batch dari tabel job_state"""
+    conn = get_conn()
+    row = conn.execute("SELECT value FROM job_state WHERE name = ?", (name,)).fetchone()
+    conn.close()
+    return row["value"] if row else default
+
+def set_job_state(name, value, cursor=None):
+    """Simpan checkpoint job batch (pakai cursor yang diberikan supaya ikut transaksi pemanggil)"""
+    sql = '''
+        INSERT INTO job_state (name, value, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+    '''
+    params = (name, None if value is None else str(value), datetime.utcnow().isoformat())
+    if cursor is not None:
+        cursor.execute(sql, params)
+        return
+    conn = get_conn()
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+def _rollup_select(row):
+    """Kolom rollup untuk satu row requests (row = 'NEW' / 'OLD' di trigger, atau alias tabel)"""
+    return f"""
+        {row}.user_id AS user_id,
+        CAST(strftime('%Y%m', {row}.start_date) AS INTEGER) AS period,
+        {row}.type AS type,
+        COALESCE({row}.reason, '') AS reason,
+        COALESCE({row}.status, 'PENDING_MANAGER') AS status,
+        CAST(julianday(date({row}.end_date)) - julianday(date({row}.start_date)) AS INTEGER) + 1 AS days,
+        CASE WHEN {row}.type = 'CHANGEOFF'
+             THEN COALESCE(NULLIF({row}.change_off_days, 0), CAST(COALESCE({row}.hours, 0) / 8.0 AS INTEGER))
+             ELSE 0 END AS co_days
+    """
+
+def create_rollup_triggers(cursor):
+    """Trigger yang menjaga request_rollups tetap sinkron dengan setiap INSERT/UPDATE/DELETE di requests"""
+    def upsert(row, sign):
+        return f"""
+            INSERT INTO request_rollups (user_id, period, type, reason, status, request_count, days, co_days)
+            SELECT user_id, period, type, reason, status, {sign}, {sign} * days, {sign} * co_days
+            FROM (SELECT {_rollup_select(row)})
+            WHERE period IS NOT NULL
+            ON CONFLICT(user_id, period, type, reason, status) DO UPDATE SET
+                request_count = request_count + excluded.request_count,
+                days = days + excluded.days,
+                co_days = co_days + excluded.co_days;
+        """
+
+    cleanup = """
+        DELETE FROM request_rollups
+        WHERE user_id = OLD.user_id AND request_count = 0;
+    """
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_requests_rollup_insert AFTER INSERT ON requests
+        BEGIN {upsert('NEW', 1)} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_requests_rollup_update
+        AFTER UPDATE OF user_id, type, reason, status, start_date, end_date, hours, change_off_days ON requests
+        BEGIN {upsert('OLD', -1)} {upsert('NEW', 1)} {cleanup} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_requests_rollup_delete AFTER DELETE ON requests
+        BEGIN {upsert('OLD', -1)} {cleanup} END
+    """)
+
+def create_changelog_triggers(cursor):
+    """Trigger yang mencatat INSERT/UPDATE/DELETE di requests dan quotas ke tabel changelog"""
+    watched = {
+        # requests: hanya kolom yang relevan untuk payroll (update path attachment dll tidak dicatat)
+        "requests": "UPDATE OF user_id, type, reason, status, start_date, end_date, hours, change_off_days",
+        "quotas": "UPDATE",
+    }
+    for table, update_event in watched.items():
+        for event, op, row in (("INSERT", "I", "NEW"), (update_event, "U", "NEW"), ("DELETE", "D", "OLD")):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_changelog_{op.lower()} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO changelog (entity, entity_id, op) VALUES ('{table}', {row}.id, '{op}');
+                END
+            """)
+
+def rebuild_rollups(cursor):
+    """Hitung ulang seluruh request_rollups dari tabel requests (backfill / perbaikan)"""
+    cursor.execute("DELETE FROM request_rollups")
+    cursor.execute(f"""
+        INSERT INTO request_rollups (user_id, period, type, reason, status, request_count, days, co_days)
+        SELECT user_id, period, type, reason, status, COUNT(*), SUM(days), SUM(co_days)
+        FROM (SELECT {_rollup_select('r')} FROM requests r)
+        WHERE period IS NOT NULL
+        GROUP BY user_id, period, type, reason, status
+    """)
+    print(f"✅ Rebuilt request rollups ({cursor.rowcount} rows)")
+
 def migrate_legacy_data(cursor):
     """Migrate data dari tabel terpisah ke tabel requests yang unified"""
     try:
@@ -193,19 +550,23 @@ def migrate_legacy_data(cursor):
             FROM leave_requests
         ''')
         
-        # Migrate changeoff_requests to requests
+        # Migrate changeoff_requests to requests (+ detail lebar ke changeoff_details)
         cursor.execute('''
             INSERT OR IGNORE INTO requests 
-            (id, user_id, type, start_date, end_date, keterangan,
-             departure_date, return_date, hours, location, pic, activities_json,
+            (id, user_id, type, start_date, end_date, keterangan, hours,
              status, file_uploaded, timesheet_path, manager_at,
              hr_id, hr_at, created_at, updated_at)
-            SELECT id, user_id, 'CHANGEOFF', departure_date, return_date, keterangan,
-                   departure_date, return_date, hours, location, pic, activities_json,
+            SELECT id, user_id, 'CHANGEOFF', departure_date, return_date, keterangan, hours,
                    status, file_uploaded, timesheet_path, manager_at,
                    hr_id, hr_at, created_at, updated_at
             FROM changeoff_requests
         ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO changeoff_details (request_id, location, pic, activities_json)
+            SELECT c.id, c.location, c.pic, c.activities_json
+            FROM changeoff_requests c
+            JOIN requests r ON r.id = c.id AND r.type = 'CHANGEOFF'
+        ''')
         
         print("✅ Legacy data migrated successfully!")
         
@@ -225,7 +586,7 @@ def create_default_admin():
     if admin_count == 0:
         # Hash password untuk admin default
         password_hash = hashlib.sha256("admin123".encode()).hexdigest()
-        now = datetime.now().isoformat()
+        now = datetime.utcnow().isoformat()
         
         cursor.execute("""
             INSERT INTO users (email, name, role, password_hash, division, sick_balance, created_at, updated_at)
@@ -302,6 +663,33 @@ def delete_user_complete(user_id):
         print(f"❌ Error deleting user: {e}")
         return False
 
+# Referensi yatim: nama -> (tabel, kondisi, aksi perbaikan). Kondisi memakai NOT EXISTS ke primary key tabel induk,
+# jadi tiap row cukup satu lookup index (tanpa materialisasi subquery NOT IN). Dipakai clean_orphaned_data() dan
+# job integritas terjadwal (integrity.py); tidak lagi dijalankan saat startup.
+ORPHAN_CHECKS = {
+    "orphan_requests": ("requests", "user_id IS NOT NULL AND NOT EXISTS "
+                        "(SELECT 1 FROM users u WHERE u.id = requests.user_id)", "DELETE"),
+    "orphan_quotas": ("quotas", "user_id IS NOT NULL AND NOT EXISTS "
+                      "(SELECT 1 FROM users u WHERE u.id = quotas.user_id)", "DELETE"),
+    "orphan_notifications": ("notifications", "user_id IS NOT NULL AND NOT EXISTS "
+                             "(SELECT 1 FROM users u WHERE u.id = notifications.user_id)", "DELETE"),
+    "orphan_approvals": ("approvals", "approver_id IS NOT NULL AND NOT EXISTS "
+                         "(SELECT 1 FROM users u WHERE u.id = approvals.approver_id)", "DELETE"),
+    "orphan_changeoff_details": ("changeoff_details", "NOT EXISTS "
+                                 "(SELECT 1 FROM requests r WHERE r.id = changeoff_details.request_id)", "DELETE"),
+    "invalid_manager": ("users", "manager_id IS NOT NULL AND NOT EXISTS "
+                        "(SELECT 1 FROM users m WHERE m.id = users.manager_id AND m.id != users.id)",
+                        "SET manager_id = NULL"),
+    "invalid_hr": ("requests", "hr_id IS NOT NULL AND NOT EXISTS "
+                   "(SELECT 1 FROM users u WHERE u.id = requests.hr_id)", "SET hr_id = NULL"),
+}
+
+def orphan_fix_sql(name):
+    table, condition, action = ORPHAN_CHECKS[name]
+    if action == "DELETE":
+        return f"DELETE FROM {table} WHERE {condition}"
+    return f"UPDATE {table} {action} WHERE {condition}"
+
 def clean_orphaned_data():
     """Bersihkan data yang tidak memiliki referensi user yang valid"""
     try:
@@ -310,59 +698,16 @@ def clean_orphaned_data():
         
         print("🧹 Cleaning orphaned data...")
         
-        # Clean orphaned requests
-        cursor.execute("""
-            DELETE FROM requests 
-            WHERE user_id NOT IN (SELECT id FROM users)
-        """)
-        cleaned_requests = cursor.rowcount
-        
-        # Clean orphaned quotas
-        cursor.execute("""
-            DELETE FROM quotas 
-            WHERE user_id NOT IN (SELECT id FROM users)
-        """)
-        cleaned_quotas = cursor.rowcount
-        
-        # Clean orphaned notifications
-        cursor.execute("""
-            DELETE FROM notifications 
-            WHERE user_id NOT IN (SELECT id FROM users)
-        """)
-        cleaned_notifications = cursor.rowcount
-        
-        # Clean orphaned approvals
-        cursor.execute("""
-            DELETE FROM approvals 
-            WHERE approver_id NOT IN (SELECT id FROM users)
-        """)
-        cleaned_approvals = cursor.rowcount
-        
-        # Fix invalid manager references
-        cursor.execute("""
-            UPDATE users SET manager_id = NULL 
-            WHERE manager_id IS NOT NULL 
-            AND manager_id NOT IN (SELECT id FROM users WHERE id != users.id)
-        """)
-        fixed_managers = cursor.rowcount
-        
-        # Fix invalid HR references
-        cursor.execute("""
-            UPDATE requests SET hr_id = NULL 
-            WHERE hr_id IS NOT NULL 
-            AND hr_id NOT IN (SELECT id FROM users)
-        """)
-        fixed_hr = cursor.rowcount
+        cleaned = {}
+        for name in ORPHAN_CHECKS:
+            cursor.execute(orphan_fix_sql(name))
+            cleaned[name] = cursor.rowcount
         
         conn.commit()
         conn.close()
         
-        print(f"✅ Cleaned {cleaned_requests} orphaned requests")
-        print(f"✅ Cleaned {cleaned_quotas} orphaned quotas")
-        print(f"✅ Cleaned {cleaned_notifications} orphaned notifications")
-        print(f"✅ Cleaned {cleaned_approvals} orphaned approvals")
-        print(f"✅ Fixed {fixed_managers} invalid manager references")
-        print(f"✅ Fixed {fixed_hr} invalid HR references")
+        for name, count in cleaned.items():
+            print(f"✅ {name}: {count}")
         
         return True
         
@@ -371,7 +716,7 @@ def clean_orphaned_data():
         return False
 
 def check_database():
-    """Cek status database dan tables"""
+    """Cek status database dan tables (orphan check ada di integrity.py)"""
     conn = get_conn()
     cursor = conn.cursor()
     
@@ -398,23 +743,6 @@ def check_database():
         requests_count = cursor.fetchone()['count']
         print(f"   📋 Total Requests: {requests_count}")
         
-        # Check for orphaned data
-        cursor.execute("""
-            SELECT COUNT(*) as count FROM requests 
-            WHERE user_id NOT IN (SELECT id FROM users)
-        """)
-        orphaned_requests = cursor.fetchone()['count']
-        if orphaned_requests > 0:
-            print(f"   ⚠️  Orphaned Requests: {orphaned_requests}")
-        
-        cursor.execute("""
-            SELECT COUNT(*) as count FROM quotas 
-            WHERE user_id NOT IN (SELECT id FROM users)
-        """)
-        orphaned_quotas = cursor.fetchone()['count']
-        if orphaned_quotas > 0:
-            print(f"   ⚠️  Orphaned Quotas: {orphaned_quotas}")
-        
     except Exception as e:
         print(f"❌ Error checking database: {e}")
     finally:
@@ -424,7 +752,6 @@ def check_database():
 if __name__ != "__main__":
     try:
         init_db()
-        check_database()
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
 
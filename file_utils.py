@@ -1,11 +1,9 @@
 import os
-import uuid
 import base64
-import mimetypes
 import streamlit as st
-from datetime import datetime
-
-UPLOAD_DIR = os.environ.get("HRMS_UPLOAD_DIR", "uploads")
+import attachment_server
+import previews
+from attachment_store import store_stream, get_attachment, register_existing, attachment_bytes, upload_name
 
 def human_size(num_bytes: int) -> str:
     for unit in ["B", "KB", "MB", "GB", "TB"]:
@@ -15,40 +13,87 @@ def human_size(num_bytes: int) -> str:
     return f"{num_bytes:.1f} PB"
 
 def save_file(uploaded_file) -> str:
-    """Simpan file upload ke server dan return path"""
-    ext = os.path.splitext(uploaded_file.name)[1]
-    fname = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex}{ext}"
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    path = os.path.join(UPLOAD_DIR, fname)
-    with open(path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return path
+    """Simpan file upload ke server (streaming, content-addressed) dan return path"""
+    uploaded_file.seek(0)
+    attachment = store_stream(uploaded_file, uploaded_file.name)
+    # Thumbnail / halaman pertama disiapkan di background untuk halaman approval
+    previews.schedule_preview(attachment)
+    return attachment["path"]
+
+def _use_attachment_server() -> bool:
+    """
+    Attachment server hanya dipakai jika URL publiknya dikonfigurasi (dan aman untuk origin halaman ini);
+    selain itu file dialirkan lewat Streamlit sendiri dan hanya saat user memintanya.
+    """
+    try:
+        origin = st.context.headers.get("Origin")
+    except Exception:
+        origin = None
+    if not attachment_server.enabled(origin):
+        return False
+    attachment_server.ensure_started()
+    return True
 
-def preview_pdf_iframe(file_path, width="100%", height=900):
+def preview_pdf_iframe(file_path, width="100%", height=900, attachment=None):
+    """Tampilkan PDF lewat URL bertanda tangan dari attachment server (fallback: base64 inline)"""
     try:
-        with open(file_path, "rb") as f:
-            base64_pdf = base64.b64encode(f.read()).decode('utf-8')
-        pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="{width}" height="{height}" type="application/pdf" style="border: none;"></iframe>'
+        attachment = attachment or get_attachment(file_path) or register_existing(file_path)
+        if not attachment:
+            st.error("File tidak ditemukan di server.")
+            return
+        if _use_attachment_server():
+            url = attachment_server.signed_url(attachment["sha256"])
+        else:
+            url = "data:application/pdf;base64," + base64.b64encode(attachment_bytes(attachment["path"])).decode()
+        pdf_display = f'<iframe src="{url}" width="{width}" height="{height}" type="application/pdf" style="border: none;"></iframe>'
         st.markdown(pdf_display, unsafe_allow_html=True)
     except Exception as e:
         st.error(f"Gagal menampilkan PDF: {e}")
 
-def preview_file(path: str, label_prefix: str = "Attachment", key_prefix: str = None, user_role: str = "EMPLOYEE"):
-    if not os.path.exists(path):
+def preview_file(path: str, label_prefix: str = "Attachment", key_prefix: str = None, user_role: str = "EMPLOYEE",
+                 request_id: int = None):
+    # Metadata dari tabel attachments; file lama didaftarkan sekali saat pertama dibuka
+    attachment = get_attachment(path) or register_existing(path)
+    if not attachment:
         st.error("File tidak ditemukan di server.")
         return
     if key_prefix is None:
         key_prefix = os.path.basename(path)
-    size = os.path.getsize(path)
-    mime, _ = mimetypes.guess_type(path)
+    size = attachment["size"]
+    mime = attachment["mime_type"]
+    # Nama upload milik request ini; attachments.original_name milik uploader pertama isi yang sama (dedup)
+    file_name = (upload_name(request_id) if request_id else None) or os.path.basename(path)
     ext = (os.path.splitext(path)[1] or "").lower()
-    st.write(f"{label_prefix}: {os.path.basename(path)} • {human_size(size)} • {mime or 'application/octet-stream'}")
-    with open(path, "rb") as f:
-        st.download_button("Download File", f, file_name=os.path.basename(path), mime=mime or "application/octet-stream", key=f"dl_{key_prefix}")
+    st.write(f"{label_prefix}: {file_name} • {human_size(size)} • {mime}")
+    # File asli hanya diambil saat diklik (lewat attachment server), tidak dikirim ulang setiap rerun
+    if _use_attachment_server():
+        st.link_button("Download File", attachment_server.signed_url(attachment["sha256"], download=True, name=file_name))
+    elif st.button("Siapkan Download", key=f"dl_prep_{key_prefix}"):
+        # Tanpa attachment server: isi file hanya dikirim lewat Streamlit pada rerun setelah user memintanya;
+        # rerun berikutnya (termasuk setelah tombol download diklik) kembali ke tombol "Siapkan Download"
+        st.download_button("Download File", attachment_bytes(attachment["path"]), file_name=file_name,
+                           mime=mime, key=f"dl_{key_prefix}")
     if user_role not in ["MANAGER", "HR_ADMIN"]:
         st.info("Hanya Manager dan HR yang dapat melihat preview file.")
         return
-    if ext == ".pdf" or (mime == "application/pdf"):
-        preview_pdf_iframe(path, width="100%", height=900)
-    else:
-        st.warning("Preview hanya tersedia untuk file PDF. Tipe lain hanya dapat diunduh.")
\ No newline at end of file
+
+    preview = previews.get_preview(attachment)
+    if preview:
+        st.image(preview, caption="Preview", use_column_width=True)
+    elif previews.schedule_preview(attachment):
+        st.caption("⏳ Preview sedang disiapkan...")
+    elif previews.preview_failed(attachment):
+        st.caption("⚠️ Preview tidak bisa dibuat untuk file ini.")
+
+    is_pdf = ext == ".pdf" or mime == "application/pdf"
+    is_image = mime in previews.IMAGE_TYPES
+    if not (is_pdf or is_image):
+        st.warning("Preview hanya tersedia untuk file PDF dan gambar. Tipe lain hanya dapat diunduh.")
+        return
+    if st.toggle("Tampilkan file asli", key=f"orig_{key_prefix}"):
+        if is_pdf:
+            preview_pdf_iframe(path, width="100%", height=900, attachment=attachment)
+        else:
+            source = (attachment_server.signed_url(attachment["sha256"]) if _use_attachment_server()
+                      else attachment_bytes(attachment["path"]))
+            st.image(source, use_column_width=True)
@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import time
+import hashlib
+from datetime import date, datetime
+from pptx import Presentation
+from pptx.chart.data import CategoryChartData
+from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
+from pptx.util import Inches, Pt
+from db import get_report_conn, to_epoch
+from reports import BULAN, to_period
+from request_archive import iter_partitions
+
+# Deck review bulanan HR (PPTX) dari data agregat: utilisasi cuti per divisi, change off earned vs used,
+# SLA approval, dan periode absen tertinggi. Data tiap slide diambil dari request_rollups (murah);
+# hanya SLA yang membaca requests, dan hasilnya di-cache per bulan selama request di bulan itu tidak berubah.
+# python-pptx tidak bisa menyalin slide antar file, jadi cache dilakukan di level data: jika data semua
+# slide + template sama dengan run sebelumnya, file deck lama langsung dipakai ulang.
+TEMPLATE_PATH = os.environ.get("HRMS_DECK_TEMPLATE", os.path.join("templates", "hr_review.pptx"))
+DECK_DIR = os.environ.get("HRMS_DECK_DIR", os.path.join("data", "decks"))
+CACHE_PATH = os.path.join(DECK_DIR, ".cache.json")
+TOP_PERIODS = 5
+
+TITLE_LAYOUT, TITLE_ONLY_LAYOUT = 0, 5
+
+# ==================== DATA ====================
+
+def _division_rows(cur, year, month):
+    """Agregat per divisi: hari absen bulan ini, YTD leave & change off dari rollups + quotas"""
+    cur.execute("""
+        SELECT COALESCE(u.division, '-') AS division,
+               COUNT(DISTINCT u.id) AS employees,
+               COALESCE(SUM(t.leave_month), 0) AS leave_month,
+               COALESCE(SUM(t.sick_month), 0) AS sick_month,
+               COALESCE(SUM(t.unpaid_month), 0) AS unpaid_month,
+               COALESCE(SUM(t.co_earned), 0) AS co_earned,
+               COALESCE(SUM(t.co_used), 0) AS co_used,
+               COALESCE(SUM(q.leave_used), 0) AS leave_used_ytd,
+               COALESCE(SUM(q.leave_total), 0) AS leave_total
+        FROM users u
+        LEFT JOIN quotas q ON q.user_id = u.id AND q.year = ?
+        LEFT JOIN (
+            SELECT user_id,
+                   SUM(CASE WHEN period = ? AND type = 'LEAVE' AND reason IN ('PERSONAL', 'CHANGEOFF') THEN days ELSE 0 END) AS leave_month,
+                   SUM(CASE WHEN period = ? AND type = 'LEAVE' AND reason LIKE 'SICK%' THEN days ELSE 0 END) AS sick_month,
+                   SUM(CASE WHEN period = ? AND type = 'LEAVE' AND reason = 'UNPAID_LEAVE' THEN days ELSE 0 END) AS unpaid_month,
+                   SUM(CASE WHEN type = 'CHANGEOFF' THEN co_days ELSE 0 END) AS co_earned,
+                   SUM(CASE WHEN type = 'LEAVE' AND reason = 'CHANGEOFF' THEN days ELSE 0 END) AS co_used
+            FROM request_rollups
+            WHERE status = 'APPROVED' AND period BETWEEN ? AND ?
+            GROUP BY user_id
+        ) t ON t.user_id = u.id
+        WHERE u.is_active = 1 AND u.role != 'HR_ADMIN'
+        GROUP BY COALESCE(u.division, '-')
+        ORDER BY division
+    """, (year, to_period(year, month), to_period(year, month), to_period(year, month),
+          to_period(year, 1), to_period(year, month)))
+    return [dict(r) for r in cur.fetchall()]
+
+def _absence_trend(cur, year, month):
+    """Hari absen (approved LEAVE) per bulan untuk 12 bulan terakhir s/d bulan laporan"""
+    start_year, start_month = (year, month - 11) if month == 12 else (year - 1, month + 1)
+    cur.execute("""
+        SELECT period, SUM(days) AS days, COUNT(DISTINCT user_id) AS people
+        FROM request_rollups
+        WHERE status = 'APPROVED' AND type = 'LEAVE' AND period BETWEEN ? AND ?
+        GROUP BY period
+        ORDER BY period
+    """, (to_period(start_year, start_month), to_period(year, month)))
+    return [dict(r) for r in cur.fetchall()]
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[idx]
+
+def _sla_fingerprint(cur, start, end):
+    count, last = 0, None
+    for schema in iter_partitions(cur.connection, readonly=True):
+        cur.execute(f"SELECT COUNT(*), MAX(updated_at_ts) FROM {schema}.requests WHERE hr_at_ts >= ? AND hr_at_ts < ?",
+                    (start, end))
+        n, latest = cur.fetchone()
+        count += n
+        if latest is not None and (last is None or latest > last):
+            last = latest
+    return f"{count}:{last}"
+
+def _approval_sla(cur, start, end):
+    """Durasi approval (jam) untuk request yang diputuskan HR di bulan laporan (partisi hot + arsip)"""
+    rows = []
+    for schema in iter_partitions(cur.connection, readonly=True):
+        cur.execute(f"""
+            SELECT (manager_at_ts - created_at_ts) / 3600.0,
+                   (hr_at_ts - manager_at_ts) / 3600.0,
+                   (hr_at_ts - created_at_ts) / 3600.0
+            FROM {schema}.requests
+            WHERE hr_at_ts >= ? AND hr_at_ts < ?
+        """, (start, end))
+        rows += cur.fetchall()
+    stages = {"Manager": [], "HR": [], "Total": []}
+    for row in rows:
+        for stage, value in zip(stages, row):
+            if value is not None:
+                stages[stage].append(max(value, 0))
+    return [{
+        "stage": stage,
+        "count": len(values),
+        "avg": round(sum(values) / len(values), 1) if values else None,
+        "p50": round(_percentile(values, 50), 1) if values else None,
+        "p90": round(_percentile(values, 90), 1) if values else None,
+    } for stage, values in stages.items()]
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_cache(cache):
+    os.makedirs(DECK_DIR, exist_ok=True)
+    tmp_path = f"{CACHE_PATH}.part"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, CACHE_PATH)
+
+def deck_data(year: int, month: int, cache=None):
+    """Data semua slide untuk satu bulan (SLA diambil dari cache jika request bulan itu tidak berubah)"""
+    cache = _load_cache() if cache is None else cache
+    start = to_epoch(date(year, month, 1))
+    end = to_epoch(date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1))
+    conn = get_report_conn()
+    cur = conn.cursor()
+    try:
+        divisions = _division_rows(cur, year, month)
+        trend = _absence_trend(cur, year, month)
+        sla_key = f"sla:{year:04d}-{month:02d}"
+        fingerprint = _sla_fingerprint(cur, start, end)
+        cached = cache.get(sla_key)
+        if cached and cached["fingerprint"] == fingerprint:
+            sla = cached["data"]
+        else:
+            sla = _approval_sla(cur, start, end)
+            cache[sla_key] = {"fingerprint": fingerprint, "data": sla}
+    finally:
+        conn.close()
+    return {"year": year, "month": month, "divisions": divisions, "trend": trend, "sla": sla}
+
+# ==================== SLIDES ====================
+
+def _period_label(period: int) -> str:
+    return f"{BULAN[period % 100 - 1][:3]} {period // 100}"
+
+def _title_only(prs, title):
+    slide = prs.slides.add_slide(prs.slide_layouts[TITLE_ONLY_LAYOUT])
+    slide.shapes.title.text = title
+    return slide
+
+def _add_table(slide, header, rows, top, height=None):
+    left, width = Inches(0.5), Inches(9)
+    height = height or Inches(0.3) * (len(rows) + 1)
+    table = slide.shapes.add_table(len(rows) + 1, len(header), left, top, width, height).table
+    for col, label in enumerate(header):
+        table.cell(0, col).text = label
+    for r, row in enumerate(rows, 1):
+        for col, value in enumerate(row):
+            table.cell(r, col).text = "-" if value is None else str(value)
+    for row in table.rows:
+        for cell in row.cells:
+            for paragraph in cell.text_frame.paragraphs:
+                for run in paragraph.runs:
+                    run.font.size = Pt(11)
+    return table
+
+def _add_chart(slide, chart_type, categories, series, top, height=Inches(3.2)):
+    chart_data = CategoryChartData()
+    chart_data.categories = categories
+    for name, values in series:
+        chart_data.add_series(name, values)
+    chart = slide.shapes.add_chart(chart_type, Inches(0.5), top, Inches(9), height, chart_data).chart
+    chart.has_legend = len(series) > 1
+    if chart.has_legend:
+        chart.legend.position = XL_LEGEND_POSITION.BOTTOM
+        chart.legend.include_in_layout = False
+    return chart
+
+def slide_title(prs, data):
+    slide = prs.slides.add_slide(prs.slide_layouts[TITLE_LAYOUT])
+    slide.shapes.title.text = f"HR Monthly Review — {BULAN[data['month'] - 1]} {data['year']}"
+    if len(slide.placeholders) > 1:
+        slide.placeholders[1].text = f"Dibuat {datetime.now().strftime('%d %b %Y %H:%M')}"
+
+def slide_leave_utilization(prs, data):
+    slide = _title_only(prs, "Utilisasi Cuti per Divisi")
+    divisions = data["divisions"]
+    if not divisions:
+        return
+    _add_chart(slide, XL_CHART_TYPE.COLUMN_CLUSTERED, [d["division"] for d in divisions], [
+        ("Cuti (hari)", [d["leave_month"] for d in divisions]),
+        ("Sakit (hari)", [d["sick_month"] for d in divisions]),
+        ("Unpaid (hari)", [d["unpaid_month"] for d in divisions]),
+    ], top=Inches(1.3))
+    rows = [(d["division"], d["employees"], d["leave_month"], f"{d['leave_used_ytd']} / {d['leave_total']}",
+             f"{d['leave_used_ytd'] / d['leave_total'] * 100:.0f}%" if d["leave_total"] else "-")
+            for d in divisions]
+    _add_table(slide, ["Divisi", "Karyawan", "Cuti bulan ini", "YTD terpakai / kuota", "Utilisasi"],
+               rows, top=Inches(4.6))
+
+def slide_changeoff(prs, data):
+    slide = _title_only(prs, "Change Off: Earned vs Used (YTD)")
+    divisions = data["divisions"]
+    if not divisions:
+        return
+    _add_chart(slide, XL_CHART_TYPE.COLUMN_CLUSTERED, [d["division"] for d in divisions], [
+        ("Earned", [d["co_earned"] for d in divisions]),
+        ("Used", [d["co_used"] for d in divisions]),
+    ], top=Inches(1.3))
+    rows = [(d["division"], d["co_earned"], d["co_used"], d["co_earned"] - d["co_used"]) for d in divisions]
+    _add_table(slide, ["Divisi", "Earned", "Used", "Selisih"], rows, top=Inches(4.6))
+
+def slide_sla(prs, data):
+    slide = _title_only(prs, "SLA Approval (jam)")
+    rows = [(s["stage"], s["count"], s["avg"], s["p50"], s["p90"]) for s in data["sla"]]
+    _add_table(slide, ["Tahap", "Jumlah", "Rata-rata", "P50", "P90"], rows, top=Inches(1.5))
+    note = slide.shapes.add_textbox(Inches(0.5), Inches(3.2), Inches(9), Inches(0.8)).text_frame
+    note.text = "Manager: diajukan → keputusan manager • HR: keputusan manager → keputusan HR • Total: diajukan → final"
+    note.paragraphs[0].runs[0].font.size = Pt(11)
+
+def slide_absentee(prs, data):
+    slide = _title_only(prs, "Periode Absen Tertinggi (12 bulan)")
+    trend = data["trend"]
+    if not trend:
+        return
+    _add_chart(slide, XL_CHART_TYPE.LINE_MARKERS, [_period_label(t["period"]) for t in trend],
+               [("Hari absen", [t["days"] for t in trend])], top=Inches(1.3), height=Inches(2.8))
+    top = sorted(trend, key=lambda t: t["days"], reverse=True)[:TOP_PERIODS]
+    rows = [(_period_label(t["period"]), t["days"], t["people"]) for t in top]
+    _add_table(slide, ["Periode", "Hari absen", "Karyawan"], rows, top=Inches(4.3))
+
+SLIDES = [slide_title, slide_leave_utilization, slide_changeoff, slide_sla, slide_absentee]
+
+def _fingerprint(data) -> str:
+    template_mtime = os.path.getmtime(TEMPLATE_PATH) if os.path.exists(TEMPLATE_PATH) else None
+    payload = json.dumps({"data": data, "template": template_mtime, "slides": [s.__name__ for s in SLIDES]},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_deck(year: int, month: int, force=False):
+    """
+    Buat deck review bulanan. Return ringkasan: path pptx, apakah dipakai ulang dari cache, durasi.
+    """
+    started = time.time()
+    cache = _load_cache()
+    data = deck_data(year, month, cache)
+    fingerprint = _fingerprint(data)
+    deck_key = f"deck:{year:04d}-{month:02d}"
+    path = os.path.join(DECK_DIR, f"hr_review_{year:04d}_{month:02d}.pptx")
+
+    cached = cache.get(deck_key)
+    if not force and cached and cached["fingerprint"] == fingerprint and os.path.exists(path):
+        _save_cache(cache)
+        return {"path": path, "cached": True, "seconds": round(time.time() - started, 2)}
+
+    prs = Presentation(TEMPLATE_PATH) if os.path.exists(TEMPLATE_PATH) else Presentation()
+    for build in SLIDES:
+        build(prs, data)
+    os.makedirs(DECK_DIR, exist_ok=True)
+    tmp_path = f"{path}.part"
+    prs.save(tmp_path)
+    os.replace(tmp_path, path)
+
+    cache[deck_key] = {"fingerprint": fingerprint}
+    _save_cache(cache)
+    return {"path": path, "cached": False, "seconds": round(time.time() - started, 2)}
+
+def previous_month(today: date = None):
+    today = today or date.today()
+    return (today.year - 1, 12) if today.month == 1 else (today.year, today.month - 1)
+
+if __name__ == "__main__":
+    # python hr_deck.py [YYYY-MM] [--force]  (default: bulan lalu)
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if args:
+        year, month = (int(x) for x in args[0].split("-"))
+    else:
+        year, month = previous_month()
+    summary = build_deck(year, month, force="--force" in sys.argv)
+    print(f"📽️ HR review {year}-{month:02d}: {summary['path']} "
+          f"({'cache' if summary['cached'] else 'baru'}, {summary['seconds']} detik)")
@@ -0,0 +1,346 @@
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import contextlib
+from datetime import date
+
+# CLI admin HR untuk cron / operator: python -m hrms <perintah> [opsi]
+# Memanggil fungsi business / job yang sama dengan halaman HR, tanpa Streamlit dan modul UI.
+# Modul di-import per perintah (lazy), jadi `python -m hrms --help` dan perintah ringan start dalam hitungan
+# milidetik; hanya perintah yang butuh pandas (quota) yang membayar import pandas.
+# Opsi umum: --dry-run (tampilkan yang akan dilakukan tanpa menulis), --json (hasil akhir JSON di stdout),
+# --quiet (tanpa progress). Progress & log modul ditulis ke stderr, jadi stdout bersih untuk hasil / data.
+# Exit code: 0 sukses, 1 gagal atau ada masalah (row import gagal, cek integritas tidak ok), 2 salah pemakaian.
+PROGRESS_INTERVAL = 1.0  # detik minimal antar baris progress
+
+USAGE = """Usage: python -m hrms <perintah> [opsi] [--dry-run] [--json] [--quiet]
+
+Perintah:
+  accrual [--force [--year Y]]             +1 saldo cuti bulanan (tanpa --force hanya jalan tgl 1, sekali/bulan)
+  reset-quotas incremental|zero [--year Y] reset kuota seperti di halaman HR Quotas
+  integrity [--fix]                        cek data yatim + PRAGMA quick_check (--fix membersihkan)
+  backup [--no-attachments] [--keep N]     snapshot database + arsip + attachment
+  backups                                  daftar snapshot
+  maintenance [--quiet-now]                ANALYZE, incremental vacuum, checkpoint WAL
+  archive [--years N]                      pindahkan request lama ke file arsip per tahun
+  gc-attachments                           karantina file attachment yang tidak direferensikan
+  import-users FILE [--default-password X] [--report errors.csv]
+  report summary|semester|period [--year Y] [--semester 1|2] [--start YYYYMM --end YYYYMM]
+         [--format csv|json] [--out FILE]  data laporan (default CSV ke stdout)
+  export summary|semester|period|history|yearly [...] [--out FILE.xlsx]
+  jobs                                     hasil run terakhir job terjadwal
+"""
+
+class UsageError(Exception):
+    pass
+
+_stdout = sys.stdout  # stdout asli; selama perintah berjalan print() modul lain dialihkan ke stderr
+
+def _arg(args, name, default=None):
+    if name in args:
+        index = args.index(name)
+        if index + 1 >= len(args):
+            raise UsageError(f"{name} butuh nilai")
+        return args[index + 1]
+    return default
+
+def _int_arg(args, name, default=None):
+    value = _arg(args, name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise UsageError(f"{name} harus angka")
+
+def _positional(args, index, choices=None, name="argumen"):
+    values = []
+    skip = False
+    for i, arg in enumerate(args):
+        if skip:
+            skip = False
+        elif arg.startswith("--"):
+            skip = i + 1 < len(args) and not args[i + 1].startswith("--") and arg not in _FLAGS
+        else:
+            values.append(arg)
+    if index >= len(values):
+        raise UsageError(f"{name} wajib diisi" + (f" ({'|'.join(choices)})" if choices else ""))
+    value = values[index]
+    if choices and value not in choices:
+        raise UsageError(f"{name} harus salah satu dari {'|'.join(choices)}")
+    return value
+
+# Opsi tanpa nilai (selain itu, --opsi diikuti nilainya)
+_FLAGS = {"--dry-run", "--json", "--quiet", "--force", "--fix", "--no-attachments", "--quiet-now", "--help"}
+
+def _progress(label, quiet):
+    """Callback progress (selesai, total) yang mencetak paling sering tiap PROGRESS_INTERVAL detik ke stderr"""
+    state = {"last": 0.0}
+
+    def report(done, total=None):
+        if quiet:
+            return
+        now = time.time()
+        if now - state["last"] < PROGRESS_INTERVAL and (total is None or done < total):
+            return
+        state["last"] = now
+        print(f"⏳ {label}: {done}/{total}" if total else f"⏳ {label}: {done}", file=sys.stderr, flush=True)
+    return report
+
+def _job(name, fn, summary):
+    """Jalankan lewat scheduler.run_job supaya hasilnya juga tampil di halaman Status HR"""
+    from scheduler import run_job
+    return run_job(name, fn, summary)
+
+# ==================== PERINTAH ====================
+
+def cmd_accrual(args, dry_run, quiet):
+    import business
+    force = "--force" in args
+    if "--year" in args and not force:
+        # Accrual terjadwal selalu untuk tahun berjalan; tahun lain hanya lewat --force
+        raise UsageError("--year hanya bisa dipakai bersama --force")
+    year = _int_arg(args, "--year", date.today().year)
+    if dry_run:
+        due = force or business.leave_accrual_due()
+        return {"ok": True, "dry_run": True, "would_run": due, "year": year, "force": force}, \
+            f"🔍 Accrual {'akan' if due else 'tidak akan'} dijalankan (tahun {year})"
+    if force:
+        ok, message = business.manual_increment_leave_balance(year)
+        return {"ok": ok, "executed": ok, "year": year, "force": True}, message
+    executed = business.auto_increment_leave_balance()
+    return {"ok": True, "executed": executed}, \
+        "✅ Accrual dijalankan" if executed else "ℹ️ Accrual tidak jatuh tempo (hanya tgl 1, sekali per bulan)"
+
+def cmd_reset_quotas(args, dry_run, quiet):
+    mode = _positional(args, 1, ("incremental", "zero"), "mode")
+    year = _int_arg(args, "--year", date.today().year)
+    import business
+    if dry_run:
+        users = len(business.list_users())
+        return {"ok": True, "dry_run": True, "mode": mode, "year": year, "would_update": users}, \
+            f"🔍 Reset {mode} {year} akan mengubah kuota {users} user"
+    progress = _progress(f"reset {mode} {year}", quiet)
+    if mode == "incremental":
+        result = business.hr_reset_quotas_incremental(year, progress=progress)
+        updated = result["updated_count"]
+    else:
+        updated = business.hr_reset_quotas_to_zero(year, progress=progress)
+    return {"ok": True, "mode": mode, "year": year, "updated": updated}, \
+        f"✅ Reset {mode} {year}: {updated} user diupdate"
+
+def cmd_integrity(args, dry_run, quiet):
+    import integrity
+    fix = "--fix" in args and not dry_run
+    results = _job("integrity", lambda: integrity.run_integrity_checks(fix=fix), integrity.summarize)
+    problems = integrity.summarize(results)["problems"]
+    lines = [f"{'✅' if r['status'] == 'ok' else '⚠️'} {integrity.CHECK_LABELS.get(name, name)}: {r['value']} ({r['detail']})"
+             for name, r in results.items()]
+    return {"ok": not problems, "fix": fix, "checks": results, "problems": problems}, "\n".join(lines)
+
+def cmd_backup(args, dry_run, quiet):
+    import backup
+    from request_archive import archive_years
+    keep = _int_arg(args, "--keep", backup.RETENTION)
+    include_attachments = "--no-attachments" not in args
+    if dry_run:
+        snapshots = backup.list_snapshots()
+        return {"ok": True, "dry_run": True, "snapshot_dir": backup.SNAPSHOT_DIR,
+                "database_bytes": os.path.getsize(backup.DB_PATH), "archives": archive_years(),
+                "attachments": include_attachments, "would_remove": sorted(snapshots[max(0, keep - 1):])}, \
+            f"🔍 Backup ke {backup.SNAPSHOT_DIR}, {len(snapshots)} snapshot ada, retensi {keep}"
+    if not quiet:
+        print("⏳ Backup berjalan...", file=sys.stderr, flush=True)
+    manifest = _job("backup", lambda: backup.run_backup(include_attachments=include_attachments, keep=keep),
+                    backup.summarize)
+    ok = all(info["integrity"] == "ok" for info in manifest["databases"].values())
+    return dict(manifest, ok=ok), f"💾 Snapshot {manifest['snapshot']} ({manifest['seconds']} detik)"
+
+def cmd_backups(args, dry_run, quiet):
+    import backup
+    snapshots = backup.list_snapshots()
+    return {"ok": True, "snapshots": snapshots}, "\n".join(snapshots) or "Belum ada snapshot"
+
+def cmd_maintenance(args, dry_run, quiet):
+    import maintenance
+    if dry_run:
+        stats = maintenance.database_stats()
+        return {"ok": True, "dry_run": True, "stats": stats}, \
+            f"🔍 Database {stats['size_bytes']} byte, fragmentasi {stats['fragmentation_pct']}%"
+    result = _job("maintenance", lambda: maintenance.run_maintenance(True if "--quiet-now" in args else None),
+                  maintenance.summarize)
+    return dict(result, ok=True), f"🧰 Maintenance selesai ({result['seconds']} detik)"
+
+def cmd_archive(args, dry_run, quiet):
+    import request_archive
+    years = _int_arg(args, "--years", request_archive.ARCHIVE_AFTER_YEARS)
+    summary = request_archive.archive_requests(years, dry_run=dry_run)
+    lines = [f"🗄️ Archive request sebelum {summary['cutoff_year']}{' (dry run)' if dry_run else ''}"]
+    lines += [f"   {year}: {count} request" for year, count in summary["years"].items()]
+    return dict(summary, ok=True), "\n".join(lines)
+
+def cmd_gc_attachments(args, dry_run, quiet):
+    import attachment_gc
+    summary = attachment_gc.collect_garbage(dry_run=dry_run)
+    return dict(summary, ok=True), \
+        f"🧹 Attachment GC{' (dry run)' if dry_run else ''}: {summary['orphaned']} file yatim, " \
+        f"{summary['bytes_reclaimed']} byte"
+
+def cmd_import_users(args, dry_run, quiet):
+    import user_import
+    path = _positional(args, 1, name="FILE")
+    if not os.path.exists(path):
+        raise UsageError(f"File {path} tidak ditemukan")
+    progress = _progress("import users", quiet)
+    result = user_import.import_users(path, dry_run=dry_run, default_password=_arg(args, "--default-password"),
+                                      progress=lambda stage, rows: progress(f"{stage} {rows} row"))
+    message = f"✅ {result['valid']}/{result['rows']} user {'valid (dry run)' if dry_run else 'diimport'} " \
+              f"dalam {result['seconds']} detik"
+    if result["errors"]:
+        report = _arg(args, "--report", os.path.splitext(path)[0] + ".errors.csv")
+        with open(report, "wb") as f:
+            f.write(user_import.error_report_csv(result["errors"]))
+        result["error_report"] = report
+        message += f"\n⚠️ {len(result['errors'])} baris gagal, detail di {report}"
+    return dict(result, ok=not result["errors"]), message
+
+_REPORTS = ("summary", "semester", "period")
+
+def _report_query(kind, args):
+    import reports
+    year = _int_arg(args, "--year", date.today().year)
+    if kind == "summary":
+        return reports.summary_query(year), f"summary_{year}"
+    if kind == "semester":
+        semester = _int_arg(args, "--semester", 1)
+        if semester not in (1, 2):
+            raise UsageError("--semester harus 1 atau 2")
+        return reports.semester_query(semester, year), f"semester{semester}_{year}"
+    start, end = _int_arg(args, "--start"), _int_arg(args, "--end")
+    if start is None or end is None:
+        raise UsageError("report period butuh --start YYYYMM dan --end YYYYMM")
+    return reports.period_query(start, end), f"period_{start}_{end}"
+
+def cmd_report(args, dry_run, quiet):
+    from report_export import iter_rows
+    kind = _positional(args, 1, _REPORTS, "jenis laporan")
+    (query, params), label = _report_query(kind, args)
+    fmt = _arg(args, "--format", "json" if "--json" in args else "csv")
+    if fmt not in ("csv", "json"):
+        raise UsageError("--format harus csv atau json")
+    path = _arg(args, "--out")
+    out = open(path, "w", encoding="utf-8", newline="") if path else _stdout
+    total = 0
+    try:
+        writer = None
+        for columns, rows in iter_rows(query, params):
+            if rows is None:
+                if fmt == "csv":
+                    writer = csv.writer(out)
+                    writer.writerow(columns)
+                else:
+                    out.write("[")
+                continue
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    out.write(("," if total else "") + "\n" + json.dumps(dict(zip(columns, row)), default=str))
+                    total += 1
+                continue
+            total += len(rows)
+        if fmt == "json":
+            out.write("\n]\n")
+    finally:
+        if path:
+            out.close()
+    # data sudah ditulis ke stdout / file; ringkasan ke stderr
+    print(f"📊 Laporan {label}: {total} baris{f' -> {path}' if path else ''}", file=sys.stderr)
+    return None, None
+
+_EXPORTS = ("summary", "semester", "period", "history", "yearly")
+
+def cmd_export(args, dry_run, quiet):
+    import report_export
+    kind = _positional(args, 1, _EXPORTS, "jenis export")
+    year = _int_arg(args, "--year", date.today().year)
+    if kind == "period":
+        start, end = _int_arg(args, "--start"), _int_arg(args, "--end")
+        if start is None or end is None:
+            raise UsageError("export period butuh --start YYYYMM dan --end YYYYMM")
+        path, rows = report_export.export_period(start, end)
+    elif kind == "semester":
+        path, rows = report_export.export_semester(_int_arg(args, "--semester", 1), year)
+    elif kind == "history":
+        path, rows = report_export.export_history(_int_arg(args, "--year"))
+    else:
+        path, rows = getattr(report_export, f"export_{kind}")(year)
+    target = _arg(args, "--out")
+    if target:
+        shutil.move(path, target)
+        path = target
+    return {"ok": True, "path": path, "rows": rows}, f"📥 {rows} baris -> {path}"
+
+def cmd_jobs(args, dry_run, quiet):
+    from scheduler import last_result
+    names = ("backup", "maintenance", "integrity", "report_snapshot")  # job terjadwal di scheduler._register_default_jobs
+    results = {name: last_result(name) for name in names}
+    results = {name: result for name, result in results.items() if result is not None}
+    lines = [f"{'✅' if r.get('ok') else '❌'} {name}: {r.get('at')} "
+             f"{json.dumps({k: v for k, v in r.items() if k not in ('ok', 'at')}, default=str)}"
+             for name, r in results.items()]
+    return {"ok": all(r.get("ok") for r in results.values()), "jobs": results}, \
+        "\n".join(lines) or "Belum ada job yang tercatat"
+
+COMMANDS = {
+    "accrual": cmd_accrual,
+    "reset-quotas": cmd_reset_quotas,
+    "integrity": cmd_integrity,
+    "backup": cmd_backup,
+    "backups": cmd_backups,
+    "maintenance": cmd_maintenance,
+    "archive": cmd_archive,
+    "gc-attachments": cmd_gc_attachments,
+    "import-users": cmd_import_users,
+    "report": cmd_report,
+    "export": cmd_export,
+    "jobs": cmd_jobs,
+}
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args or args[0] in ("-h", "--help", "help") or "--help" in args:
+        print(USAGE)
+        return 0
+    command = COMMANDS.get(args[0])
+    if command is None:
+        print(f"❌ Perintah tidak dikenal: {args[0]}\n\n{USAGE}", file=sys.stderr)
+        return 2
+    as_json = "--json" in args
+    started = time.time()
+    try:
+        # print() dari db / business / job masuk stderr, stdout hanya untuk hasil
+        with contextlib.redirect_stdout(sys.stderr):
+            result, message = command(args, "--dry-run" in args, "--quiet" in args)
+    except UsageError as e:
+        print(f"❌ {e}\n\n{USAGE}", file=sys.stderr)
+        return 2
+    except Exception as e:
+        if as_json:
+            print(json.dumps({"ok": False, "command": args[0], "error": str(e)}), file=_stdout)
+        print(f"❌ {args[0]} gagal: {e}", file=sys.stderr)
+        return 1
+    if result is None:  # perintah yang menulis data sendiri (report)
+        return 0
+    result = dict(result, command=args[0], seconds=round(time.time() - started, 3))
+    if as_json:
+        print(json.dumps(result, default=str, indent=2), file=_stdout)
+    else:
+        print(message, file=_stdout)
+    return 0 if result.get("ok", True) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
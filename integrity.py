@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+from datetime import datetime
+from db import get_conn, ORPHAN_CHECKS, orphan_fix_sql
+
+# Job integritas data terjadwal (scheduler.py), pengganti orphan check yang dulu jalan di setiap import db.py.
+# Tiap cek menghitung row yatim dengan NOT EXISTS (lookup primary key per row) dan menyimpan hasilnya di tabel
+# health_checks; halaman Status HR hanya membaca tabel itu, jadi membuka halaman tidak memicu scan.
+INTERVAL_HOURS = float(os.environ.get("HRMS_INTEGRITY_INTERVAL_HOURS", "6"))
+AUTOFIX = os.environ.get("HRMS_INTEGRITY_AUTOFIX", "0") == "1"  # default hanya melapor, perbaikan manual
+
+CHECK_LABELS = {
+    "orphan_requests": "Request tanpa user",
+    "orphan_quotas": "Kuota tanpa user",
+    "orphan_notifications": "Notifikasi tanpa user",
+    "orphan_approvals": "Approval dengan approver tidak valid",
+    "orphan_changeoff_details": "Detail change off tanpa request",
+    "invalid_manager": "User dengan manager tidak valid",
+    "invalid_hr": "Request dengan HR tidak valid",
+    "quick_check": "PRAGMA quick_check",
+}
+
+def _count(conn, name):
+    table, condition, _ = ORPHAN_CHECKS[name]
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {condition}").fetchone()[0]
+
+def _save(cur, name, status, value, detail):
+    cur.execute("""
+        INSERT INTO health_checks (name, status, value, detail, checked_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            status = excluded.status, value = excluded.value,
+            detail = excluded.detail, checked_at = excluded.checked_at
+    """, (name, status, value, detail, datetime.utcnow().isoformat()))
+
+def run_integrity_checks(fix=AUTOFIX):
+    """
+    Jalankan semua cek integritas dan simpan ke health_checks.
+    fix=True: row yatim langsung dibersihkan (aksi sama dengan clean_orphaned_data).
+    Return dict nama -> {status, value, detail}.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    results = {}
+    try:
+        existing = {row[0] for row in cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for name, (table, _, _) in ORPHAN_CHECKS.items():
+            if table not in existing:
+                continue
+            started = time.time()
+            value = _count(conn, name)
+            detail = f"{(time.time() - started) * 1000:.0f} ms"
+            if value and fix:
+                cur.execute(orphan_fix_sql(name))
+                detail += f", diperbaiki {cur.rowcount}"
+                value = 0
+            results[name] = {"status": "warn" if value else "ok", "value": value, "detail": detail}
+
+        quick = "\n".join(row[0] for row in cur.execute("PRAGMA quick_check").fetchall())
+        results["quick_check"] = {"status": "ok" if quick == "ok" else "error",
+                                  "value": 0 if quick == "ok" else len(quick.splitlines()), "detail": quick[:500]}
+
+        for name, result in results.items():
+            _save(cur, name, result["status"], result["value"], result["detail"])
+        conn.commit()
+    finally:
+        conn.close()
+    return results
+
+def summarize(results):
+    """Ringkasan hasil cek untuk job_state"""
+    problems = {name: r["value"] for name, r in results.items() if r["status"] != "ok"}
+    return {"problems": problems}
+
+def get_health():
+    """Hasil cek terakhir dari health_checks (tanpa menjalankan cek)"""
+    conn = get_conn()
+    rows = conn.execute("SELECT name, status, value, detail, checked_at FROM health_checks ORDER BY name").fetchall()
+    conn.close()
+    return [dict(row, label=CHECK_LABELS.get(row["name"], row["name"])) for row in rows]
+
+if __name__ == "__main__":
+    # python integrity.py [--fix]
+    from scheduler import run_job
+    results = run_job("integrity", lambda: run_integrity_checks(fix="--fix" in sys.argv[1:]), summarize)
+    for name, result in results.items():
+        icon = "✅" if result["status"] == "ok" else "⚠️" if result["status"] == "warn" else "❌"
+        print(f"{icon} {CHECK_LABELS.get(name, name)}: {result['value']} ({result['detail']})")
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import platform
+import subprocess
+from datetime import date, datetime, timedelta
+from benchmark import prepare_scale, SCALES, REPO_DIR, _git_commit, _arg
+from profiler import _percentile
+
+# Uji beban end-to-end: banyak sesi Streamlit (AppTest menjalankan main.py apa adanya) bersamaan di atas
+# database sintetis (synthetic_org.py / benchmark.py). Skenario: karyawan submit cuti, manager approve,
+# HR approve dan HR bulk operation. Output: throughput, persentil latensi per langkah, dan rasio error
+# "database is locked". AppTest memasang Runtime global per run, jadi satu proses = satu sesi aktif;
+# konkurensi didapat dari jumlah proses worker.
+#   python loadtest.py [small] [--processes 8] [--sessions 200] [--duration 120] [--mix employee=6,manager=3]
+#                      [--think-ms 0] [--compare hasil_lama.json]
+MIX = {"employee": 0.6, "manager": 0.25, "hr_approve": 0.1, "hr_bulk": 0.05}
+PROCESSES = min(8, os.cpu_count() or 2)
+SESSIONS = 200
+DURATION = 300  # detik, batas atas per worker
+WARMUP_SECONDS = 20  # worker import & run pertama dulu, lalu semua mulai bersamaan (lonjakan jam 9 pagi)
+APPTEST_TIMEOUT = 120
+PASSWORD = "password123"
+MAIN_SCRIPT = os.path.join(REPO_DIR, "main.py")
+RESULTS_DIR = os.environ.get("HRMS_LOADTEST_RESULTS_DIR", os.path.join("data", "loadtests"))
+LOCKED = "database is locked"
+REGRESSION_THRESHOLD = 1.2
+ATTACHMENT_PORT_BASE = int(os.environ.get("HRMS_LOADTEST_ATTACHMENT_PORT", "18600"))  # + index worker
+
+# Scheduler tidak ikut jalan di worker (backup / maintenance akan mengacaukan angka), kecuali --with-jobs
+NO_JOBS_ENV = {"HRMS_BACKUP_INTERVAL_HOURS": "0", "HRMS_MAINTENANCE_INTERVAL_HOURS": "0",
+               "HRMS_INTEGRITY_INTERVAL_HOURS": "0"}
+
+# ==================== ORKESTRASI ====================
+
+def _pools(path):
+    """Akun yang dipakai tiap skenario (password sintetis sama untuk semua user)"""
+    conn = sqlite3.connect(path)
+    emails = lambda sql: [row[0] for row in conn.execute(sql)]
+    pools = {
+        "employee": emails("SELECT email FROM users WHERE role = 'EMPLOYEE' AND manager_id IS NOT NULL "
+                           "AND email LIKE '%@synthetic.test' ORDER BY id"),
+        "manager": emails("""
+            SELECT DISTINCT m.email FROM requests r
+            JOIN users u ON u.id = r.user_id JOIN users m ON m.id = u.manager_id
+            WHERE r.status = 'PENDING_MANAGER' AND m.email LIKE '%@synthetic.test' ORDER BY m.id
+        """),
+        "hr": emails("SELECT email FROM users WHERE role = 'HR_ADMIN' AND email LIKE '%@synthetic.test' ORDER BY id"),
+    }
+    conn.close()
+    return pools
+
+def prepare_database(scale):
+    """Salinan baru database dasar skala ini khusus untuk uji beban. Return path"""
+    base, _ = prepare_scale(scale)
+    path = os.path.join(os.path.dirname(base), "loadtest.db")
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(base, path)
+    return path
+
+def run_load(scale="small", processes=PROCESSES, sessions=SESSIONS, duration=DURATION, mix=None, think_ms=0,
+             seed=42, with_jobs=False):
+    """Jalankan uji beban dan kembalikan dict hasil (config, ringkasan, per langkah)"""
+    path = prepare_database(scale)
+    pools = _pools(path)
+    mix = mix or MIX
+    start_at = time.time() + WARMUP_SECONDS
+    env = dict(os.environ, HRMS_DB_PATH=path, PYTHONPATH=REPO_DIR, HRMS_SLOW_QUERY_MS="0",
+               **({} if with_jobs else NO_JOBS_ENV))
+    workers = []
+    for index in range(processes):
+        config = {"seed": seed + index, "sessions": sessions // processes + (index < sessions % processes),
+                  "deadline": start_at + duration, "start_at": start_at, "mix": mix, "pools": pools,
+                  "think_ms": think_ms}
+        # tiap proses menjalankan attachment server sendiri (preview PDF), jadi port harus berbeda
+        worker_env = dict(env, HRMS_ATTACHMENT_PORT=str(ATTACHMENT_PORT_BASE + index))
+        workers.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", json.dumps(config)],
+                                        cwd=os.path.dirname(path), env=worker_env, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True))
+    print(f"🚦 {processes} worker, {sessions} sesi, skala {scale} ({SCALES[scale]['users']} user)")
+    records, failed = [], 0
+    for worker in workers:
+        stdout, _ = worker.communicate()
+        lines = stdout.strip().splitlines()
+        if worker.returncode != 0 or not lines:
+            failed += 1
+            continue
+        records.extend(json.loads(lines[-1]))
+    result = summarize(records)
+    result.update(config={"scale": scale, "processes": processes, "sessions": sessions, "duration": duration,
+                          "mix": mix, "think_ms": think_ms, "seed": seed, "with_jobs": with_jobs},
+                  failed_workers=failed, created_at=datetime.utcnow().isoformat(), commit=_git_commit(),
+                  python=platform.python_version(), sqlite=sqlite3.sqlite_version)
+    return result
+
+def summarize(records):
+    """records: list [scenario, step, mulai (epoch), ms, outcome, pesan] -> throughput, persentil, rasio error"""
+    if not records:
+        return {"summary": {"steps": 0}, "steps": {}}
+    started = min(r[2] for r in records)
+    finished = max(r[2] + r[3] / 1000 for r in records)
+    elapsed = max(finished - started, 1e-9)
+    steps = {}
+    messages = {}
+    for scenario, step, _, ms, outcome, message in records:
+        if message:
+            messages[message] = messages.get(message, 0) + 1
+        entry = steps.setdefault(f"{scenario}.{step}", {"durations": [], "outcomes": {}})
+        entry["durations"].append(ms)
+        entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+    stats = {}
+    for name, entry in sorted(steps.items()):
+        durations, count = entry["durations"], len(entry["durations"])
+        stats[name] = {
+            "count": count, "per_second": round(count / elapsed, 2),
+            **{f"p{p}_ms": round(_percentile(durations, p), 1) for p in (50, 90, 95, 99)},
+            "max_ms": round(max(durations), 1), "outcomes": entry["outcomes"],
+            "locked_rate": round(entry["outcomes"].get("locked", 0) / count, 4),
+            "error_rate": round(sum(v for k, v in entry["outcomes"].items() if k != "ok") / count, 4),
+        }
+    actions = [r for r in records if r[1] in ACTION_STEPS]
+    locked = sum(1 for r in records if r[4] == "locked")
+    errors = sum(1 for r in records if r[4] != "ok")
+    durations = [r[3] for r in records]
+    return {
+        "summary": {
+            "elapsed_seconds": round(elapsed, 1), "steps": len(records), "actions": len(actions),
+            "steps_per_second": round(len(records) / elapsed, 2),
+            "actions_per_second": round(len(actions) / elapsed, 2),
+            "p50_ms": round(_percentile(durations, 50), 1), "p95_ms": round(_percentile(durations, 95), 1),
+            "p99_ms": round(_percentile(durations, 99), 1),
+            "locked_rate": round(locked / len(records), 4), "error_rate": round(errors / len(records), 4),
+            "locked": locked, "errors": errors,
+        },
+        "steps": stats,
+        "top_errors": sorted(messages.items(), key=lambda item: item[1], reverse=True)[:10],
+    }
+
+def _print_result(result):
+    summary = result["summary"]
+    if not summary["steps"]:
+        print("❌ Tidak ada langkah yang tercatat (semua worker gagal?)")
+        return
+    print(f"\n📈 {summary['steps']} langkah / {summary['actions']} aksi dalam {summary['elapsed_seconds']} detik: "
+          f"{summary['steps_per_second']} langkah/s, {summary['actions_per_second']} aksi/s")
+    print(f"   latensi p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms; "
+          f"locked {summary['locked']} ({summary['locked_rate']:.2%}), error {summary['errors']} "
+          f"({summary['error_rate']:.2%})")
+    for name, stat in result["steps"].items():
+        print(f"   {name:<26} n={stat['count']:<5} p50 {stat['p50_ms']:>8} p95 {stat['p95_ms']:>8} "
+              f"p99 {stat['p99_ms']:>8} ms  locked {stat['locked_rate']:.2%}  error {stat['error_rate']:.2%}")
+    for message, count in result.get("top_errors", []):
+        print(f"   ⚠️ {count}x {message}")
+    if result.get("failed_workers"):
+        print(f"   ⚠️ {result['failed_workers']} worker gagal")
+
+def compare(result, baseline):
+    """Bandingkan p95 per langkah, throughput & rasio locked. Return list (metrik, lama, baru, regresi?)"""
+    rows = []
+    old, new = baseline["summary"], result["summary"]
+    rows.append(("actions_per_second", old["actions_per_second"], new["actions_per_second"],
+                 new["actions_per_second"] * REGRESSION_THRESHOLD < old["actions_per_second"]))
+    rows.append(("locked_rate", old["locked_rate"], new["locked_rate"], new["locked_rate"] > old["locked_rate"]))
+    for name, stat in result["steps"].items():
+        before = baseline["steps"].get(name)
+        if before:
+            rows.append((f"{name}.p95_ms", before["p95_ms"], stat["p95_ms"],
+                         stat["p95_ms"] > before["p95_ms"] * REGRESSION_THRESHOLD))
+    return rows
+
+# ==================== WORKER (satu proses, sesi berurutan) ====================
+
+ACTION_STEPS = {"submit", "approve", "bulk"}
+
+def _outcome(at, success_text=None):
+    """(outcome, pesan) dari elemen error / exception yang dirender rerun terakhir"""
+    messages = [str(e.message) for e in at.exception] + [str(e.value) for e in at.error]
+    if any(LOCKED in m for m in messages):
+        return "locked", LOCKED
+    if messages:
+        return "error", messages[0][:200]
+    if success_text and not any(success_text in str(s.value) for s in at.success):
+        return "error", f"tidak ada pesan sukses '{success_text}'"
+    return "ok", None
+
+def _find(elements, **attrs):
+    for element in elements:
+        if all(str(getattr(element, key, "")).startswith(value) for key, value in attrs.items()):
+            return element
+    return None
+
+class Session:
+    """Satu sesi browser: AppTest baru (session_state kosong) yang mencatat durasi tiap rerun"""
+
+    def __init__(self, scenario, records):
+        from streamlit.testing.v1 import AppTest
+        self.scenario = scenario
+        self.records = records
+        self.at = AppTest.from_file(MAIN_SCRIPT, default_timeout=APPTEST_TIMEOUT)
+
+    def step(self, name, action, success_text=None):
+        started = time.time()
+        try:
+            action()
+            outcome, message = _outcome(self.at, success_text)
+        except Exception as e:
+            message = f"{type(e).__name__}: {e}"[:200]
+            outcome = "locked" if LOCKED in message else "timeout" if "timed out" in message else "error"
+        self.records.append([self.scenario, name, started, (time.time() - started) * 1000, outcome, message])
+        return outcome == "ok"
+
+    def login(self, email):
+        at = self.at
+        if not self.step("home", at.run):
+            return False
+        _find(at.text_input, label="Email").input(email)
+        _find(at.text_input, label="Password").input(PASSWORD)
+        return self.step("login", lambda: _find(at.button, label="Login").click().run())
+
+    def open(self, menu):
+        return self.step("open", lambda: self.at.sidebar.radio[0].set_value(menu).run())
+
+def scenario_employee(session, rng, pools):
+    at = session.at
+    if not (session.login(rng.choice(pools["employee"])) and session.open("Submit Leave")):
+        return
+    start = date.today() + timedelta(days=rng.randint(7, 90))
+    at.selectbox(key="reason_select_leave").set_value("UNPAID_LEAVE")
+    at.date_input(key="start_date_leave").set_value(start)
+    at.date_input(key="end_date_leave").set_value(start + timedelta(days=rng.randint(0, 2)))
+    session.step("submit", lambda: at.button(key="submit_leave_primary_final").click().run(), "berhasil dikirim")
+
+def _approve(session, prefix):
+    button = _find(session.at.button, key=prefix)
+    if button is None:
+        session.records.append([session.scenario, "approve", time.time(), 0.0, "empty", None])
+        return
+    session.step("approve", lambda: button.click().run())
+
+def scenario_manager(session, rng, pools):
+    if session.login(rng.choice(pools["manager"])) and session.open("Pending (Manager)"):
+        _approve(session, "mgr_appr_")
+
+def scenario_hr_approve(session, rng, pools):
+    if session.login(rng.choice(pools["hr"])) and session.open("Pending (HR)"):
+        _approve(session, "hr_appr_")
+
+def scenario_hr_bulk(session, rng, pools):
+    if session.login(rng.choice(pools["hr"])) and session.open("Quotas"):
+        button = _find(session.at.button, label="➕ Add 1 Balance")
+        session.step("bulk", lambda: button.click().run())
+
+SCENARIOS = {"employee": scenario_employee, "manager": scenario_manager, "hr_approve": scenario_hr_approve,
+             "hr_bulk": scenario_hr_bulk}
+
+def worker(config):
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(config["seed"])
+    AppTest.from_file(MAIN_SCRIPT, default_timeout=APPTEST_TIMEOUT).run()  # import modul aplikasi (tidak diukur)
+    time.sleep(max(0.0, config["start_at"] - time.time()))
+    names = [name for name in config["mix"] if config["pools"].get("hr" if name.startswith("hr") else name)]
+    weights = [config["mix"][name] for name in names]
+    records = []
+    for _ in range(config["sessions"]):
+        if time.time() >= config["deadline"] or not names:
+            break
+        scenario = rng.choices(names, weights)[0]
+        SCENARIOS[scenario](Session(scenario, records), rng, config["pools"])
+        if config["think_ms"]:
+            time.sleep(rng.uniform(0.5, 1.5) * config["think_ms"] / 1000)
+    return records
+
+def _parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            sys.exit(f"Skenario tidak dikenal: {name} (pilihan: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--worker" in args:
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):  # print dari modul aplikasi jangan campur dengan JSON
+            records = worker(json.loads(_arg(args, "--worker", "")))
+        print(json.dumps(records))
+        sys.exit(0)
+
+    scale = args[0] if args and not args[0].startswith("--") else "small"
+    if scale not in SCALES:
+        sys.exit(f"Skala tidak dikenal: {scale} (pilihan: {', '.join(SCALES)})")
+    mix = _parse_mix(_arg(args, "--mix", "")) if "--mix" in args else None
+    result = run_load(scale, processes=_arg(args, "--processes", PROCESSES),
+                      sessions=_arg(args, "--sessions", SESSIONS), duration=_arg(args, "--duration", DURATION),
+                      mix=mix, think_ms=_arg(args, "--think-ms", 0), seed=_arg(args, "--seed", 42),
+                      with_jobs="--with-jobs" in args)
+    _print_result(result)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"load-{datetime.now():%Y%m%d-%H%M%S}-{result['commit'] or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n💾 Hasil: {path}")
+
+    baseline_path = _arg(args, "--compare", "")
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            rows = compare(result, json.load(f))
+        print(f"\n🔍 Dibanding {baseline_path}:")
+        for metric, old, new, regressed in rows:
+            print(f"   {'🔴' if regressed else '⚪'} {metric}: {old} -> {new}")
+        sys.exit(1 if any(row[3] for row in rows) else 0)
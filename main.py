@@ -3,6 +3,11 @@ import streamlit as st
 st.set_page_config(page_title="HR-MS CISTECH", layout="wide")
 
 # IMPORT LAINNYA SETELAH SET_PAGE_CONFIG
+import profiler
+import slowlog
+slowlog.install()
+# Wrap fungsi business/reports untuk profiler SEBELUM modul UI meng-import fungsinya
+profiler.instrument_modules("reports", "request_archive", "business")
 from business import get_db_connection
 from auth import login
 from ui_employee import (
@@ -13,11 +18,13 @@ from ui_manager import (
     page_manager_pending, page_manager_team
 )
 from ui_hr import (
-    page_hr_pending, page_hr_quotas, page_hr_users
+    page_hr_pending, page_hr_quotas, page_hr_users, page_hr_reports, page_hr_status, page_hr_profiler
 )
 from business import current_year
 from business import auto_increment_leave_balance
 auto_increment_leave_balance()
+import scheduler
+scheduler.ensure_started()
 import os
 
 # TAMBAHKAN IMPORT init_db DARI db.py
@@ -37,7 +44,10 @@ def sidebar_menu():
         elif user["role"] == "MANAGER":
             choice = st.radio("Menu", ["Dashboard", "Submit Leave", "Submit Change Off", "Pending (Manager)", "Team Requests"])
         elif user["role"] == "HR_ADMIN":
-            choice = st.radio("Menu", ["Pending (HR)", "Quotas", "Users"])
+            menu = ["Pending (HR)", "Quotas", "Users", "Reports", "Status"]
+            if st.query_params.get("perf") == "1":  # panel tersembunyi, buka dengan ?perf=1
+                menu.append("Performance")
+            choice = st.radio("Menu", menu)
         if st.button("Logout"):
             st.session_state.clear()
             st.rerun()
@@ -84,35 +94,43 @@ def main():
     
     choice = sidebar_menu()
     
-    if user["role"] == "EMPLOYEE":
-        if choice == "Dashboard":
-            page_employee_dashboard(user)
-        elif choice == "Submit Leave":
-            page_submit_leave(user)
-        elif choice == "Submit Change Off":
-            page_submit_changeoff(user)
-        elif choice == "My Requests":
-            page_my_requests(user)
+    # Satu rerun = satu record profiler (no-op jika profiler mati)
+    with profiler.run(f"{user['role']}:{choice}"):
+        if user["role"] == "EMPLOYEE":
+            if choice == "Dashboard":
+                page_employee_dashboard(user)
+            elif choice == "Submit Leave":
+                page_submit_leave(user)
+            elif choice == "Submit Change Off":
+                page_submit_changeoff(user)
+            elif choice == "My Requests":
+                page_my_requests(user)
     
-    elif user["role"] == "MANAGER":
-        if choice == "Dashboard":
-            page_employee_dashboard(user)
-        elif choice == "Submit Leave":
-            page_submit_leave(user)
-        elif choice == "Submit Change Off":
-            page_submit_changeoff(user)
-        elif choice == "Pending (Manager)":
-            page_manager_pending(user)
-        elif choice == "Team Requests":
-            page_manager_team(user)
+        elif user["role"] == "MANAGER":
+            if choice == "Dashboard":
+                page_employee_dashboard(user)
+            elif choice == "Submit Leave":
+                page_submit_leave(user)
+            elif choice == "Submit Change Off":
+                page_submit_changeoff(user)
+            elif choice == "Pending (Manager)":
+                page_manager_pending(user)
+            elif choice == "Team Requests":
+                page_manager_team(user)
     
-    elif user["role"] == "HR_ADMIN":
-        if choice == "Pending (HR)":
-            page_hr_pending(user)
-        elif choice == "Quotas":
-            page_hr_quotas(user)
-        elif choice == "Users":
-            page_hr_users(user)
+        elif user["role"] == "HR_ADMIN":
+            if choice == "Pending (HR)":
+                page_hr_pending(user)
+            elif choice == "Quotas":
+                page_hr_quotas(user)
+            elif choice == "Users":
+                page_hr_users(user)
+            elif choice == "Reports":
+                page_hr_reports(user)
+            elif choice == "Status":
+                page_hr_status(user)
+            elif choice == "Performance":
+                page_hr_profiler(user)
 
 if __name__ == "__main__":
     main()
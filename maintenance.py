@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import sqlite3
+from db import get_conn, DB_PATH
+from scheduler import in_quiet_hours
+
+# Maintenance rutin database SQLite (dijadwalkan scheduler.py):
+# - ANALYZE terarah untuk tabel yang jumlah row-nya sudah bergeser jauh dari statistik terakhir, lalu PRAGMA optimize
+# - incremental vacuum bertahap (auto_vacuum=INCREMENTAL) untuk mengembalikan halaman kosong sisa delete massal
+# - checkpoint WAL (jika database memakai WAL)
+# Langkah berat (konversi auto_vacuum lewat VACUUM penuh, vacuum tanpa batas, checkpoint TRUNCATE) hanya di jam sepi.
+INTERVAL_HOURS = float(os.environ.get("HRMS_MAINTENANCE_INTERVAL_HOURS", "1"))
+QUIET_HOURS = os.environ.get("HRMS_QUIET_HOURS", "1-5")  # jam WIB, format "mulai-selesai"
+ANALYZE_TABLES = ["users", "requests", "quotas", "request_rollups", "changeoff_details", "changelog",
+                  "attachments", "approvals", "notifications"]
+ANALYZE_DRIFT = 0.2  # ANALYZE ulang jika jumlah row berubah > 20% dari statistik
+ANALYSIS_LIMIT = 1000  # PRAGMA analysis_limit: ANALYZE cukup sampling, tidak scan penuh index besar
+VACUUM_STEP_PAGES = 500
+DAYTIME_VACUUM_STEPS = 4  # di luar jam sepi paling banyak 4 x 500 halaman per run
+VACUUM_STEP_SLEEP = 0.05
+
+AUTO_VACUUM_MODES = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+
+def _pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+def database_stats(conn=None):
+    """
+    Ukuran & fragmentasi database. Hit rate page cache per koneksi (sqlite3_db_status) tidak tersedia
+    dari modul sqlite3 Python, jadi yang dilaporkan adalah cakupan cache: berapa persen database muat di page cache.
+    """
+    own = conn is None
+    conn = conn or get_conn()
+    try:
+        page_size = _pragma(conn, "page_size")
+        page_count = _pragma(conn, "page_count")
+        freelist = _pragma(conn, "freelist_count")
+        cache_size = _pragma(conn, "cache_size")
+        cache_pages = cache_size if cache_size > 0 else -cache_size * 1024 // page_size
+        journal_mode = _pragma(conn, "journal_mode")
+        wal_path = f"{DB_PATH}-wal"
+        return {
+            "size_bytes": page_size * page_count,
+            "page_size": page_size,
+            "page_count": page_count,
+            "free_pages": freelist,
+            "free_bytes": freelist * page_size,
+            "fragmentation_pct": round(freelist * 100.0 / page_count, 2) if page_count else 0.0,
+            "auto_vacuum": AUTO_VACUUM_MODES.get(_pragma(conn, "auto_vacuum"), "?"),
+            "journal_mode": journal_mode,
+            "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            "cache_pages": cache_pages,
+            "cache_coverage_pct": round(min(100.0, cache_pages * 100.0 / page_count), 2) if page_count else 100.0,
+        }
+    finally:
+        if own:
+            conn.close()
+
+def _stat_rows(conn):
+    """Jumlah row per tabel menurut sqlite_stat1 (angka pertama kolom stat)"""
+    try:
+        rows = conn.execute("SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl").fetchall()
+    except sqlite3.OperationalError:
+        return {}  # belum pernah ANALYZE
+    return {row[0]: row[1] for row in rows}
+
+def targeted_analyze(conn):
+    """ANALYZE hanya tabel yang belum punya statistik atau jumlah row-nya bergeser > ANALYZE_DRIFT"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    stats = _stat_rows(conn)
+    analyzed = []
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    for table in ANALYZE_TABLES:
+        if table not in existing:
+            continue
+        rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        known = stats.get(table)
+        if rows == 0 and not known:
+            continue
+        if known is None or abs(rows - known) > max(known, 1) * ANALYZE_DRIFT:
+            conn.execute(f"ANALYZE {table}")
+            analyzed.append(table)
+    return analyzed
+
+def incremental_vacuum(conn, max_steps=None):
+    """Kembalikan halaman kosong ke OS per VACUUM_STEP_PAGES halaman (tiap langkah transaksi pendek)"""
+    released, steps = 0, 0
+    while max_steps is None or steps < max_steps:
+        free = _pragma(conn, "freelist_count")
+        if free == 0:
+            break
+        # executescript menjalankan pragma sampai selesai; execute() hanya satu step = satu halaman
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+        released += free - _pragma(conn, "freelist_count")
+        steps += 1
+        time.sleep(VACUUM_STEP_SLEEP)
+    return released
+
+def run_maintenance(quiet=None):
+    """Satu putaran maintenance. quiet=None: ditentukan dari HRMS_QUIET_HOURS. Return ringkasan before/after"""
+    quiet = in_quiet_hours(QUIET_HOURS) if quiet is None else quiet
+    started = time.time()
+    conn = get_conn()
+    conn.isolation_level = None  # tiap PRAGMA / ANALYZE transaksi sendiri, tidak menahan lock lama
+    try:
+        before = database_stats(conn)
+        result = {"quiet_hours": quiet, "before": before, "analyzed": targeted_analyze(conn)}
+        conn.execute("PRAGMA optimize")
+
+        if before["auto_vacuum"] == "INCREMENTAL":
+            result["pages_released"] = incremental_vacuum(conn, None if quiet else DAYTIME_VACUUM_STEPS)
+        elif quiet:
+            # Database lama dibuat dengan auto_vacuum=NONE: mode baru baru berlaku setelah VACUUM penuh (sekali saja)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            result["converted_auto_vacuum"] = True
+            result["pages_released"] = before["free_pages"]
+
+        if before["journal_mode"] == "wal":
+            mode = "TRUNCATE" if quiet else "PASSIVE"
+            busy, log_pages, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+            result["checkpoint"] = {"mode": mode, "busy": busy, "log_pages": log_pages, "checkpointed": checkpointed}
+
+        result["after"] = database_stats(conn)
+        result["seconds"] = round(time.time() - started, 2)
+        return result
+    finally:
+        conn.close()
+
+def summarize(result):
+    """Ringkasan hasil maintenance untuk job_state / halaman status"""
+    after = result["after"]
+    return {"size_bytes": after["size_bytes"], "fragmentation_pct": after["fragmentation_pct"],
+            "pages_released": result.get("pages_released", 0), "analyzed": result["analyzed"],
+            "quiet_hours": result["quiet_hours"]}
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+def _print_stats(label, stats):
+    print(f"   {label}: {_format_bytes(stats['size_bytes'])}, free {_format_bytes(stats['free_bytes'])} "
+          f"({stats['fragmentation_pct']}%), auto_vacuum={stats['auto_vacuum']}, journal={stats['journal_mode']}, "
+          f"cache {stats['cache_coverage_pct']}% dari database")
+
+if __name__ == "__main__":
+    # python maintenance.py [--stats] [--quiet-now]
+    args = sys.argv[1:]
+    if "--stats" in args:
+        _print_stats("database", database_stats())
+    else:
+        from scheduler import run_job
+        result = run_job("maintenance", lambda: run_maintenance(True if "--quiet-now" in args else None), summarize)
+        print(f"🧰 Maintenance selesai ({result['seconds']} detik, jam sepi: {result['quiet_hours']})")
+        _print_stats("sebelum", result["before"])
+        _print_stats("sesudah", result["after"])
+        print(f"   ANALYZE: {', '.join(result['analyzed']) or '-'}; halaman dilepas: {result.get('pages_released', 0)}")
@@ -0,0 +1,194 @@
+import os
+import sys
+import csv
+import json
+from datetime import datetime
+from db import get_conn, get_job_state, set_job_state
+from request_archive import iter_partitions
+
+# Feed perubahan (change-data feed) untuk integrasi payroll.
+# Trigger di requests / quotas menulis ke tabel changelog dengan seq yang naik terus (monotonic).
+# Consumer meminta "semua perubahan sejak token T" (T = seq terakhir yang sudah diproses) dan hanya
+# menerima delta: biaya satu sync sebanding jumlah perubahan, bukan seluruh riwayat.
+DROP_DIR = os.environ.get("HRMS_PAYROLL_DROP_DIR", os.path.join("data", "payroll_feed"))
+BATCH_SIZE = 5000
+STATE_PREFIX = "payroll_feed."
+
+# Kategori request yang dibutuhkan payroll (insert request lain tidak dikirim; update-nya dikirim sebagai delete)
+PAYROLL_CATEGORIES = {"UNPAID_LEAVE", "SICK", "CHANGEOFF_EARNED", "CHANGEOFF_USED"}
+
+CSV_COLUMNS = ["seq", "entity", "op", "id", "user_id", "user_nik", "category", "type", "reason", "status",
+               "start_date", "end_date", "days", "change_off_days", "year", "leave_total", "leave_used",
+               "changeoff_earned", "changeoff_used", "updated_at"]
+
+def request_category(row) -> str:
+    if row["type"] == "CHANGEOFF":
+        return "CHANGEOFF_EARNED"
+    reason = row["reason"] or ""
+    if reason == "CHANGEOFF":
+        return "CHANGEOFF_USED"
+    if reason.startswith("SICK"):
+        return "SICK"
+    if reason == "UNPAID_LEAVE":
+        return "UNPAID_LEAVE"
+    return "LEAVE"
+
+def _request_query(schema, count):
+    return f"""
+        SELECT r.id, r.user_id, u.nik AS user_nik, r.type, r.reason, r.status, r.start_date, r.end_date,
+               CAST(julianday(date(r.end_date)) - julianday(date(r.start_date)) AS INTEGER) + 1 AS days,
+               r.change_off_days, r.updated_at
+        FROM {schema}.requests r LEFT JOIN main.users u ON u.id = r.user_id
+        WHERE r.id IN ({",".join("?" * count)})
+    """
+
+def _fetch_rows(conn, entity, ids):
+    """
+    State terkini untuk sekumpulan id (satu query IN per batch). Request yang tidak ada di partisi hot
+    dicari di file arsip (request_archive): dipindah ke arsip bukan berarti dihapus.
+    """
+    if not ids:
+        return {}
+    if entity == "requests":
+        rows = {}
+        for schema in iter_partitions(conn):
+            missing = [i for i in ids if i not in rows]
+            if not missing:
+                break
+            rows.update((row["id"], dict(row))
+                        for row in conn.execute(_request_query(schema, len(missing)), missing).fetchall())
+        return rows
+    query = f"""
+        SELECT q.id, q.user_id, u.nik AS user_nik, q.year, q.leave_total, q.leave_used,
+               q.changeoff_earned, q.changeoff_used, q.updated_at
+        FROM quotas q LEFT JOIN users u ON u.id = q.user_id
+        WHERE q.id IN ({",".join("?" * len(ids))})
+    """
+    return {row["id"]: dict(row) for row in conn.execute(query, list(ids))}
+
+def changes_since(token=0, limit=BATCH_SIZE, payroll_only=True):
+    """
+    Perubahan dengan seq > token (maksimal `limit` entri changelog).
+    Beberapa perubahan pada row yang sama dipadatkan jadi satu record berisi state terakhir.
+    Return (records, next_token). next_token == token berarti tidak ada perubahan baru.
+    """
+    token = int(token or 0)
+    conn = get_conn()
+    try:
+        log = conn.execute(
+            "SELECT seq, entity, entity_id, op FROM changelog WHERE seq > ? ORDER BY seq LIMIT ?",
+            (token, limit),
+        ).fetchall()
+        if not log:
+            return [], token
+
+        latest = {}
+        for entry in log:
+            latest[(entry["entity"], entry["entity_id"])] = entry
+        rows = {
+            entity: _fetch_rows(conn, entity, [eid for (ent, eid) in latest if ent == entity])
+            for entity in ("requests", "quotas")
+        }
+    finally:
+        conn.close()
+
+    records = []
+    for (entity, entity_id), entry in sorted(latest.items(), key=lambda item: item[1]["seq"]):
+        row = rows.get(entity, {}).get(entity_id)
+        op = entry["op"] if row is not None else "D"  # row sudah tidak ada -> kirim sebagai delete
+        record = {"seq": entry["seq"], "entity": entity, "op": op, "id": entity_id}
+        if row is not None:
+            record.update(row)
+            if entity == "requests":
+                record["category"] = request_category(row)
+                if payroll_only and record["category"] not in PAYROLL_CATEGORIES:
+                    if entry["op"] == "I":
+                        continue
+                    # Update ke kategori non-payroll: request ini bisa saja sebelumnya SICK / UNPAID_LEAVE /
+                    # CHANGEOFF_* dan sudah dikirim, jadi consumer harus menghapusnya (delete id yang belum
+                    # pernah diterima cukup diabaikan consumer)
+                    record = {"seq": entry["seq"], "entity": entity, "op": "D", "id": entity_id,
+                              "category": record["category"]}
+        records.append(record)
+    return records, log[-1]["seq"]
+
+def _write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + "\n")
+
+def _write_csv(path, records):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(records)
+
+def export_changes(since=None, consumer="payroll", fmt="jsonl", payroll_only=True, drop_dir=DROP_DIR):
+    """
+    Tulis semua delta sejak token ke drop dir (satu file per batch) dan simpan token terakhir consumer.
+    since=None: lanjut dari token tersimpan untuk consumer ini.
+    Return ringkasan: token awal/akhir, jumlah record, file yang ditulis.
+    """
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError("Format harus jsonl atau csv")
+    state_key = f"{STATE_PREFIX}{consumer}"
+    token = int(since if since is not None else get_job_state(state_key, 0))
+    result = {"consumer": consumer, "from_token": token, "to_token": token, "records": 0, "files": []}
+    os.makedirs(drop_dir, exist_ok=True)
+    writer = _write_jsonl if fmt == "jsonl" else _write_csv
+
+    while True:
+        records, next_token = changes_since(token, payroll_only=payroll_only)
+        if next_token == token:
+            break
+        if records:
+            path = os.path.join(drop_dir, f"{consumer}_{token + 1:012d}_{next_token:012d}.{fmt}")
+            tmp_path = f"{path}.part"
+            writer(tmp_path, records)
+            os.replace(tmp_path, path)  # consumer tidak pernah melihat file setengah jadi
+            result["files"].append(path)
+            result["records"] += len(records)
+        token = next_token
+        set_job_state(state_key, token)
+
+    result["to_token"] = token
+    return result
+
+def consumer_tokens():
+    """Token terakhir tiap consumer yang pernah export: {nama consumer: token}"""
+    conn = get_conn()
+    rows = conn.execute("SELECT name, value FROM job_state WHERE name LIKE ?", (f"{STATE_PREFIX}%",)).fetchall()
+    conn.close()
+    return {row["name"][len(STATE_PREFIX):]: int(row["value"] or 0) for row in rows}
+
+def prune_changelog(before_token: int):
+    """
+    Hapus entri changelog yang sudah diproses semua consumer (seq <= before_token).
+    before_token diklem ke token consumer paling lambat: entri yang belum dibaca consumer mana pun tidak
+    pernah dihapus. Return (jumlah entri terhapus, token yang benar-benar dipakai).
+    """
+    tokens = consumer_tokens()
+    token = min([int(before_token)] + list(tokens.values()))
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM changelog WHERE seq <= ?", (token,))
+    deleted = cur.rowcount
+    conn.commit()
+    conn.close()
+    return deleted, token
+
+if __name__ == "__main__":
+    # python payroll_feed.py [--since T] [--consumer NAME] [--format jsonl|csv] [--all-requests]
+    args = sys.argv[1:]
+
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args else default
+
+    summary = export_changes(
+        since=option("--since"),
+        consumer=option("--consumer", "payroll"),
+        fmt=option("--format", "jsonl"),
+        payroll_only="--all-requests" not in args,
+    )
+    print(f"💸 Payroll feed [{summary['consumer']}] token {summary['from_token']} -> {summary['to_token']}: "
+          f"{summary['records']} record, {len(summary['files'])} file ({datetime.now():%H:%M:%S})")
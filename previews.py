@@ -0,0 +1,144 @@
+import os
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from attachment_store import UPLOAD_DIR, walk_files
+from attachment_archive import is_archived, member_view
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow ikut terpasang bersama streamlit, tapi tetap opsional
+    Image = None
+
+try:
+    import fitz  # PyMuPDF - render halaman pertama PDF
+except ImportError:
+    fitz = None
+
+# Cache preview (thumbnail gambar / halaman pertama PDF) di disk, key = hash konten
+PREVIEW_DIR = os.path.join(UPLOAD_DIR, ".previews")
+PREVIEW_MAX_PX = int(os.environ.get("HRMS_PREVIEW_MAX_PX", "900"))
+PREVIEW_QUALITY = int(os.environ.get("HRMS_PREVIEW_QUALITY", "70"))
+CACHE_MAX_BYTES = int(os.environ.get("HRMS_PREVIEW_CACHE_MB", "256")) * 1024 * 1024
+
+IMAGE_TYPES = {"image/jpeg", "image/png"}
+PDF_TYPES = {"application/pdf"}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="preview")
+_pending = set()
+_failed = set()  # hash yang gagal dirender (file rusak): tidak diantrikan ulang sampai proses restart
+_lock = threading.Lock()
+
+def preview_path(sha256: str) -> str:
+    return os.path.join(PREVIEW_DIR, sha256[:2], f"{sha256}.jpg")
+
+def can_preview(mime_type: str) -> bool:
+    if Image is None:
+        return False
+    if mime_type in IMAGE_TYPES:
+        return True
+    return mime_type in PDF_TYPES and fitz is not None
+
+def get_preview(attachment: dict):
+    """Path preview jika sudah ada di cache (dan tandai sebagai baru dipakai untuk LRU), else None"""
+    path = preview_path(attachment["sha256"])
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+def _source(path: str):
+    """File asli: path biasa, atau stream dari member pack arsip"""
+    if is_archived(path):
+        return io.BytesIO(member_view(path))
+    return path
+
+def _render(attachment: dict):
+    """Render gambar preview dari file asli, return PIL Image"""
+    source = _source(attachment["path"])
+    if attachment["mime_type"] in PDF_TYPES:
+        doc = fitz.open(stream=source.getvalue(), filetype="pdf") if isinstance(source, io.BytesIO) else fitz.open(source)
+        with doc:
+            page = doc.load_page(0)
+            zoom = PREVIEW_MAX_PX / max(page.rect.width, page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.open(io.BytesIO(pix.tobytes("png")))
+    img = Image.open(source)
+    img.draft("RGB", (PREVIEW_MAX_PX, PREVIEW_MAX_PX))  # decode JPEG langsung di resolusi kecil
+    return img
+
+def generate_preview(attachment: dict):
+    """Buat preview JPEG terkompresi untuk satu attachment (idempotent)"""
+    if not can_preview(attachment["mime_type"]):
+        return None
+    path = preview_path(attachment["sha256"])
+    if os.path.exists(path):
+        return path
+    img = _render(attachment)
+    img.thumbnail((PREVIEW_MAX_PX, PREVIEW_MAX_PX))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.part"
+    img.save(tmp_path, "JPEG", quality=PREVIEW_QUALITY, optimize=True)
+    os.replace(tmp_path, path)
+    evict_cache()
+    return path
+
+def preview_failed(attachment: dict) -> bool:
+    return attachment["sha256"] in _failed
+
+def _run(attachment: dict):
+    try:
+        generate_preview(attachment)
+    except Exception as e:
+        print(f"⚠️  Preview gagal untuk {attachment['path']}: {e}")
+        with _lock:
+            _failed.add(attachment["sha256"])
+    finally:
+        with _lock:
+            _pending.discard(attachment["sha256"])
+
+def schedule_preview(attachment: dict):
+    """Antrikan pembuatan preview di background thread (tidak memblokir UI). False jika tidak bisa / sudah gagal"""
+    if not can_preview(attachment["mime_type"]):
+        return False
+    with _lock:
+        if attachment["sha256"] in _failed:
+            return False
+        if attachment["sha256"] in _pending:
+            return True
+        _pending.add(attachment["sha256"])
+    _executor.submit(_run, dict(attachment))
+    return True
+
+def evict_cache(max_bytes: int = None):
+    """Hapus preview yang paling lama tidak dipakai (LRU berdasarkan mtime) sampai di bawah batas ukuran"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(PREVIEW_DIR):
+        return 0
+    entries = []
+    total = 0
+    for entry in walk_files(PREVIEW_DIR):
+        if entry.name.endswith(".jpg"):
+            try:
+                st_info = entry.stat()
+            except FileNotFoundError:
+                continue  # dihapus evict_cache di thread lain
+            entries.append((st_info.st_mtime, st_info.st_size, entry.path))
+            total += st_info.st_size
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    target = int(max_bytes * 0.9)  # sisakan ruang supaya tidak evict setiap kali generate
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
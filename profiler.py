@@ -0,0 +1,284 @@
+import os
+import re
+import sys
+import math
+import time
+import inspect
+import sqlite3
+import functools
+import importlib
+import threading
+from contextlib import contextmanager
+from collections import deque
+
+# Profiler per rerun Streamlit.
+# main.py membungkus tiap page dengan profiler.run(...); fungsi modul business/reports di-wrap instrument_modules()
+# dan semua statement SQL dari get_conn() dicatat lewat ProfiledConnection / ProfiledCursor.
+# Hasil tiap rerun masuk ring buffer (RING_SIZE run terakhir) dan ditampilkan di panel Performance HR.
+# Saat profiler mati: get_conn() memakai koneksi sqlite3 biasa dan wrapper fungsi hanya mengecek satu flag.
+RING_SIZE = int(os.environ.get("HRMS_PROFILER_RING_SIZE", "500"))
+N_PLUS_ONE_THRESHOLD = 10  # statement yang sama >= 10x dalam satu rerun dianggap pola N+1
+
+_state = {"enabled": os.environ.get("HRMS_PROFILER", "0") == "1"}
+_local = threading.local()
+_runs = deque(maxlen=RING_SIZE)
+_listeners = []  # fn(sql, params, ms) untuk tiap statement selesai (mis. slow query log)
+
+def is_enabled() -> bool:
+    return _state["enabled"]
+
+def set_enabled(enabled: bool):
+    _state["enabled"] = bool(enabled)
+
+def add_listener(fn):
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+def remove_listener(fn):
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+def reset():
+    _runs.clear()
+
+# ==================== SQL ====================
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """SQL ternormalisasi: literal -> ?, IN (?, ?, ...) -> IN (?...), whitespace dirapatkan"""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("(?...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+def _origin():
+    """Frame pemanggil pertama di luar profiler/sqlite3: (modul, fungsi, baris)"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename != _THIS_FILE and "sqlite3" not in filename:
+            return frame.f_globals.get("__name__", "?"), frame.f_code.co_name, frame.f_lineno
+        frame = frame.f_back
+    return None
+
+_THIS_FILE = _origin.__code__.co_filename
+
+def statement_origin():
+    """Untuk listener: pemanggil execute() dari statement yang sedang dilaporkan ("modul.fungsi:baris").
+    Diambil saat execute, karena statement bisa baru selesai jauh sesudahnya (fetch terakhir / __del__ oleh GC)"""
+    origin = getattr(_local, "origin", None)
+    return f"{origin[0]}.{origin[1]}:{origin[2]}" if origin else None
+
+def _record_statement(sql, params, ms, origin=None):
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run["sql_count"] += 1
+        run["sql_ms"] += ms
+        stat = run["statements"].setdefault(fingerprint(sql), [0, 0.0])
+        stat[0] += 1
+        stat[1] += ms
+    if not _listeners:
+        return
+    _local.origin = origin
+    try:
+        for listener in _listeners:
+            listener(sql, params, ms)
+    finally:
+        _local.origin = None
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor yang mengukur waktu execute + fetch per statement"""
+    _statement = None
+
+    def _finish(self):
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            _record_statement(*statement)
+
+    def _add(self, started):
+        if self._statement is not None:
+            self._statement[2] += (time.perf_counter() - started) * 1000
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        origin = _origin() if _listeners else None
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._statement = [sql, parameters, (time.perf_counter() - started) * 1000, origin]
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        origin = _origin() if _listeners else None
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._statement = [sql, None, (time.perf_counter() - started) * 1000, origin]
+            self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(started)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(started)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(started)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+class ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    # Shortcut conn.execute() tidak selalu lewat cursor() (tergantung versi Python), jadi di-override juga
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connection_factory():
+    """Factory untuk sqlite3.connect: koneksi ter-instrumentasi hanya jika profiler / listener aktif"""
+    return ProfiledConnection if (_state["enabled"] or _listeners) else sqlite3.Connection
+
+# ==================== PAGE & FUNGSI ====================
+
+@contextmanager
+def run(page: str):
+    """Catat satu rerun page (durasi total, SQL, fungsi yang dipanggil) ke ring buffer"""
+    if not _state["enabled"]:
+        yield
+        return
+    record = {"page": page, "started_at": time.time(), "ms": 0.0, "sql_count": 0, "sql_ms": 0.0,
+              "statements": {}, "calls": {}}
+    _local.run = record
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["ms"] = (time.perf_counter() - started) * 1000
+        _local.run = None
+        _runs.append(record)
+
+def timed(fn, label=None):
+    """Wrap fungsi supaya durasi tiap panggilan tercatat di rerun yang sedang berjalan"""
+    if getattr(fn, "__profiled__", False):
+        return fn
+    label = label or f"{fn.__module__}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        record = getattr(_local, "run", None) if _state["enabled"] else None
+        if record is None:
+            return fn(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stat = record["calls"].setdefault(label, [0, 0.0])
+            stat[0] += 1
+            stat[1] += (time.perf_counter() - started) * 1000
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+def instrument_modules(*names):
+    """
+    Import modul (berurutan) lalu wrap semua fungsi publik yang didefinisikan di modul itu.
+    Harus dipanggil sebelum modul UI di-import, karena `from x import f` menyalin referensi fungsi.
+    """
+    for name in names:
+        module = importlib.import_module(name)
+        for attr, obj in list(vars(module).items()):
+            if inspect.isfunction(obj) and obj.__module__ == module.__name__ and not attr.startswith("_"):
+                setattr(module, attr, timed(obj))
+
+# ==================== STATISTIK ====================
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))  # nearest rank
+    return ordered[index]
+
+def page_stats():
+    """Per page: jumlah rerun, p50/p95/max durasi, rata-rata jumlah SQL"""
+    pages = {}
+    for record in list(_runs):
+        pages.setdefault(record["page"], []).append(record)
+    stats = []
+    for page, records in pages.items():
+        durations = [r["ms"] for r in records]
+        stats.append({
+            "page": page, "runs": len(records),
+            "p50_ms": round(_percentile(durations, 50), 1), "p95_ms": round(_percentile(durations, 95), 1),
+            "max_ms": round(max(durations), 1),
+            "avg_sql": round(sum(r["sql_count"] for r in records) / len(records), 1),
+            "avg_sql_ms": round(sum(r["sql_ms"] for r in records) / len(records), 1),
+        })
+    return sorted(stats, key=lambda s: s["p95_ms"], reverse=True)
+
+def call_stats():
+    """Per fungsi: jumlah panggilan dan p50/p95 total durasi per rerun"""
+    calls = {}
+    for record in list(_runs):
+        for label, (count, ms) in record["calls"].items():
+            entry = calls.setdefault(label, {"calls": 0, "per_run": []})
+            entry["calls"] += count
+            entry["per_run"].append(ms)
+    stats = [{"function": label, "calls": entry["calls"], "runs": len(entry["per_run"]),
+              "p50_ms": round(_percentile(entry["per_run"], 50), 1),
+              "p95_ms": round(_percentile(entry["per_run"], 95), 1)}
+             for label, entry in calls.items()]
+    return sorted(stats, key=lambda s: s["p95_ms"], reverse=True)
+
+def n_plus_one_offenders(threshold=N_PLUS_ONE_THRESHOLD):
+    """Statement yang dieksekusi >= threshold kali dalam satu rerun, dikelompokkan per page"""
+    offenders = {}
+    for record in list(_runs):
+        for sql, (count, ms) in record["statements"].items():
+            if count < threshold:
+                continue
+            entry = offenders.setdefault((record["page"], sql), {"runs": 0, "max_count": 0, "total_ms": 0.0})
+            entry["runs"] += 1
+            entry["max_count"] = max(entry["max_count"], count)
+            entry["total_ms"] += ms
+    stats = [{"page": page, "sql": sql, "runs": e["runs"], "max_per_run": e["max_count"],
+              "total_ms": round(e["total_ms"], 1)} for (page, sql), e in offenders.items()]
+    return sorted(stats, key=lambda s: s["max_per_run"], reverse=True)
+
+def slowest_runs(limit=20):
+    records = sorted(list(_runs), key=lambda r: r["ms"], reverse=True)[:limit]
+    return [{"page": r["page"], "started_at": r["started_at"], "ms": round(r["ms"], 1),
+             "sql_count": r["sql_count"], "sql_ms": round(r["sql_ms"], 1)} for r in records]
+
+def run_count() -> int:
+    return len(_runs)
@@ -0,0 +1,166 @@
+import os
+import time
+import tempfile
+from datetime import datetime
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+from db import get_report_conn
+from reports import summary_query, semester_query, period_query, history_parts
+from request_archive import attach_archives
+
+# Export laporan ke Excel secara streaming: baris dibaca dari cursor SQLite per chunk dan langsung
+# ditulis ke workbook openpyxl mode write-only di file sementara. Memory tetap konstan berapa pun
+# jumlah barisnya; halaman Streamlit cukup memberi file handle ke st.download_button.
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "hrms-exports")
+CHUNK_SIZE = 1000
+MAX_AGE_SECONDS = 3600  # file export lama dibersihkan setiap kali export baru dibuat
+
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill("solid", fgColor="2563EB")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center", wrap_text=True)
+TITLE_FONT = Font(bold=True, size=14, color="2563EB")
+
+# Label kolom yang sama untuk semua laporan (kolom lain: snake_case -> Title Case)
+COLUMN_LABELS = {
+    "user_id": "User ID", "user_name": "Nama", "user_email": "Email", "user_nik": "NIK",
+    "user_division": "Divisi", "co_earned": "CO Earned", "co_used": "CO Used", "co_balance": "CO Balance",
+    "earned_co": "CO Earned", "used_co": "CO Used", "balance_co": "CO Balance",
+    "co_used_days": "CO Used (Hari)", "co_earned_days": "CO Earned (Hari)", "co_status": "CO Status",
+    "request_id": "Request ID",
+}
+WIDE_COLUMNS = {"user_name": 28, "user_email": 30, "keterangan": 40, "reason": 18, "status": 18}
+DEFAULT_WIDTH = 14
+
+def column_label(name: str) -> str:
+    return COLUMN_LABELS.get(name, name.replace("_", " ").title())
+
+def iter_rows(query: str, params=(), chunk_size=CHUNK_SIZE, archive_year=None):
+    """
+    Generator (columns, rows) dari cursor SQLite, diambil per chunk dengan fetchmany.
+    archive_year: file arsip request tahun itu di-ATTACH read-only dulu (lihat reports.history_parts)
+    """
+    conn = get_report_conn()
+    try:
+        if archive_year is not None:
+            attach_archives(conn, [archive_year], readonly=True)
+        cur = conn.execute(query, params)
+        columns = [d[0] for d in cur.description]
+        yield columns, None
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        conn.close()
+
+def iter_parts(parts, chunk_size=CHUNK_SIZE):
+    """Seperti iter_rows untuk beberapa bagian query [(archive_year, (query, params))] yang kolomnya sama"""
+    for index, (archive_year, (query, params)) in enumerate(parts):
+        stream = iter_rows(query, params, chunk_size, archive_year)
+        columns, _ = next(stream)
+        if index == 0:
+            yield columns, None
+        for item in stream:
+            yield item
+
+def _header_cells(ws, columns):
+    cells = []
+    for name in columns:
+        cell = WriteOnlyCell(ws, value=column_label(name))
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGNMENT
+        cells.append(cell)
+    return cells
+
+def write_sheet(wb, title: str, parts, heading: str = None):
+    """Tambah satu sheet ke workbook write-only dari bagian query [(archive_year, (query, params))]. Return jumlah baris"""
+    ws = wb.create_sheet(title=title[:31])
+    stream = iter_parts(parts)
+    columns, _ = next(stream)
+
+    # Lebar kolom & freeze pane harus diset sebelum baris pertama ditulis (mode write-only)
+    for idx, name in enumerate(columns, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = WIDE_COLUMNS.get(name, DEFAULT_WIDTH)
+    header_row = 1
+    if heading:
+        title_cell = WriteOnlyCell(ws, value=heading)
+        title_cell.font = TITLE_FONT
+        ws.append([title_cell])
+        header_row = 2
+    ws.freeze_panes = f"A{header_row + 1}"
+    ws.append(_header_cells(ws, columns))
+
+    count = 0
+    for _, rows in stream:
+        for row in rows:
+            ws.append(list(row))
+        count += len(rows)
+    return count
+
+def _cleanup_old_exports():
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - MAX_AGE_SECONDS
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+def export_workbook(sheets, prefix="report"):
+    """
+    sheets: list of (sheet_title, (query, params), heading); (query, params) boleh diganti list bagian
+    [(archive_year, (query, params))] seperti hasil reports.history_parts.
+    Tulis workbook ke file sementara dan return (path, jumlah baris total).
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _cleanup_old_exports()
+    wb = Workbook(write_only=True)
+    total = 0
+    for title, source, heading in sheets:
+        parts = source if isinstance(source, list) else [(None, source)]
+        total += write_sheet(wb, title, parts, heading)
+    fd, path = tempfile.mkstemp(prefix=f"{prefix}_", suffix=".xlsx", dir=EXPORT_DIR)
+    os.close(fd)
+    wb.save(path)
+    return path, total
+
+def _generated_at():
+    return datetime.now().strftime("%d %b %Y %H:%M")
+
+def export_summary(year: int):
+    return export_workbook([
+        (f"Summary {year}", summary_query(year), f"Quota Summary {year} • dibuat {_generated_at()}"),
+    ], prefix=f"summary_{year}")
+
+def export_semester(semester: int, year: int):
+    return export_workbook([
+        (f"Semester {semester} {year}", semester_query(semester, year),
+         f"Semester {semester} Report {year} • dibuat {_generated_at()}"),
+    ], prefix=f"semester{semester}_{year}")
+
+def export_period(start_period: int, end_period: int):
+    return export_workbook([
+        (f"{start_period}-{end_period}", period_query(start_period, end_period),
+         f"Period Report {start_period} - {end_period} • dibuat {_generated_at()}"),
+    ], prefix=f"period_{start_period}_{end_period}")
+
+def export_history(year: int = None):
+    label = year if year is not None else "All"
+    return export_workbook([
+        (f"History {label}", history_parts(year), f"Request History {label} • dibuat {_generated_at()}"),
+    ], prefix=f"history_{label}")
+
+def export_yearly(year: int):
+    """Paket lengkap untuk payroll / audit: summary, dua semester, dan riwayat request setahun"""
+    return export_workbook([
+        (f"Summary {year}", summary_query(year), f"Quota Summary {year} • dibuat {_generated_at()}"),
+        (f"Semester 1 {year}", semester_query(1, year), f"Semester 1 Report {year}"),
+        (f"Semester 2 {year}", semester_query(2, year), f"Semester 2 Report {year}"),
+        (f"History {year}", history_parts(year), f"Request History {year}"),
+    ], prefix=f"yearly_{year}")
@@ -0,0 +1,222 @@
+from datetime import date
+from db import get_report_conn, to_epoch
+from request_archive import archive_years, requests_source
+
+# Laporan HR dihitung dari tabel request_rollups (agregat per user per bulan YYYYMM) yang diupdate
+# oleh trigger di tabel requests. Semua laporan periode = SUM rollup dalam rentang period,
+# jadi tidak perlu scan / strftime di seluruh tabel requests.
+# Setiap laporan punya fungsi *_query() -> (sql, params) yang dipakai bersama oleh tampilan
+# DataFrame dan export Excel streaming (report_export.py).
+# Semua query laporan dibaca lewat get_report_conn() (snapshot read-only), tidak bersaing dengan approval.
+
+# Agregat rollup per user untuk rentang period [?, ?]
+ROLLUP_TOTALS = """
+    SELECT
+        user_id,
+        SUM(request_count) AS total_requests,
+        SUM(CASE WHEN status = 'APPROVED' THEN request_count ELSE 0 END) AS approved_requests,
+        SUM(CASE WHEN status LIKE 'PENDING%' THEN request_count ELSE 0 END) AS pending_requests,
+        SUM(CASE WHEN status = 'REJECTED' THEN request_count ELSE 0 END) AS rejected_requests,
+        SUM(CASE WHEN status = 'APPROVED' AND type = 'LEAVE' AND reason = 'PERSONAL' THEN days ELSE 0 END) AS leave_days,
+        SUM(CASE WHEN status = 'APPROVED' AND type = 'LEAVE' AND reason LIKE 'SICK%' THEN days ELSE 0 END) AS sick_days,
+        SUM(CASE WHEN status = 'APPROVED' AND type = 'LEAVE' AND reason = 'UNPAID_LEAVE' THEN days ELSE 0 END) AS unpaid_days,
+        SUM(CASE WHEN status = 'APPROVED' AND type = 'LEAVE' AND reason = 'CHANGEOFF' THEN days ELSE 0 END) AS co_used_days,
+        SUM(CASE WHEN status = 'APPROVED' AND type = 'CHANGEOFF' THEN co_days ELSE 0 END) AS co_earned_days
+    FROM request_rollups
+    WHERE period BETWEEN ? AND ?
+    GROUP BY user_id
+"""
+
+ROLLUP_COLUMNS = ["total_requests", "approved_requests", "pending_requests", "rejected_requests",
+                  "leave_days", "sick_days", "unpaid_days", "co_used_days", "co_earned_days"]
+
+BULAN = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli",
+         "Agustus", "September", "Oktober", "November", "Desember"]
+
+def to_period(year: int, month: int) -> int:
+    """(2025, 3) -> 202503"""
+    return year * 100 + month
+
+def semester_periods(semester: int, year: int):
+    """Semester 1 = Jan-Jun, semester 2 = Jul-Des"""
+    if semester == 1:
+        return to_period(year, 1), to_period(year, 6)
+    return to_period(year, 7), to_period(year, 12)
+
+def _rollup_columns_sql(alias="t"):
+    return ",\n        ".join(f"COALESCE({alias}.{c}, 0) AS {c}" for c in ROLLUP_COLUMNS)
+
+def _read(query_and_params):
+    import pandas as pd  # lazy: export Excel / CLI cukup memakai *_query() tanpa pandas
+    query, params = query_and_params
+    conn = get_report_conn()
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return df
+
+def period_query(start_period: int, end_period: int, active_only=False):
+    query = f"""
+    SELECT
+        u.id as user_id,
+        u.name as user_name,
+        u.nik as user_nik,
+        u.division as user_division,
+        {_rollup_columns_sql()}
+    FROM users u
+    LEFT JOIN ({ROLLUP_TOTALS}) t ON t.user_id = u.id
+    {"WHERE u.is_active = 1" if active_only else ""}
+    ORDER BY u.name
+    """
+    return query, (start_period, end_period)
+
+def summary_query(year: int):
+    query = f"""
+    SELECT s.*,
+        CASE
+            WHEN s.leave_balance >= 8 THEN 'Excellent'
+            WHEN s.leave_balance >= 4 THEN 'Good'
+            WHEN s.leave_balance >= 1 THEN 'Low'
+            ELSE 'Critical'
+        END as leave_status,
+        CASE
+            WHEN s.co_balance >= 5 THEN 'Excellent'
+            WHEN s.co_balance >= 3 THEN 'Good'
+            WHEN s.co_balance >= 1 THEN 'Low'
+            ELSE 'No Balance'
+        END as co_status,
+        CASE
+            WHEN s.sick_balance >= 4 THEN 'Sufficient'
+            WHEN s.sick_balance >= 2 THEN 'Moderate'
+            ELSE 'Low'
+        END as sick_status
+    FROM (
+        SELECT
+            u.id as user_id,
+            u.name as user_name,
+            u.email as user_email,
+            u.division as user_division,
+            u.nik as user_nik,
+            ? as year,
+            COALESCE(q.leave_total, 0) as leave_total,
+            COALESCE(q.leave_used, 0) as leave_used,
+            COALESCE(q.leave_total, 0) - COALESCE(q.leave_used, 0) as leave_balance,
+            COALESCE(q.changeoff_earned, 0) as co_earned,
+            COALESCE(q.changeoff_used, 0) as co_used,
+            COALESCE(q.changeoff_earned, 0) - COALESCE(q.changeoff_used, 0) as co_balance,
+            u.sick_balance as sick_balance,
+            {_rollup_columns_sql()}
+        FROM users u
+        LEFT JOIN quotas q ON u.id = q.user_id AND q.year = ?
+        LEFT JOIN ({ROLLUP_TOTALS}) t ON t.user_id = u.id
+    ) s
+    ORDER BY s.user_name
+    """
+    return query, (year, year, to_period(year, 1), to_period(year, 12))
+
+def semester_query(semester: int, year: int):
+    start_period, end_period = semester_periods(semester, year)
+    query = f"""
+    SELECT
+        u.id as user_id,
+        u.name as user_name,
+        u.nik as user_nik,
+        u.division as user_division,
+        ? as year,
+        'Semester ' || ? as semester,
+        COALESCE(q.leave_total, 0) as total_leave,
+        COALESCE(q.leave_used, 0) as used_leave,
+        COALESCE(q.leave_total, 0) - COALESCE(q.leave_used, 0) as balance_leave,
+        COALESCE(q.changeoff_earned, 0) as earned_co,
+        COALESCE(q.changeoff_used, 0) as used_co,
+        COALESCE(q.changeoff_earned, 0) - COALESCE(q.changeoff_used, 0) as balance_co,
+        u.sick_balance as sick_balance,
+        {_rollup_columns_sql()}
+    FROM users u
+    LEFT JOIN quotas q ON u.id = q.user_id AND q.year = ?
+    LEFT JOIN ({ROLLUP_TOTALS}) t ON t.user_id = u.id
+    ORDER BY u.name
+    """
+    return query, (year, semester, year, start_period, end_period)
+
+HISTORY_SOURCE_COLUMNS = """id, user_id, type, reason, start_date, end_date, hours, change_off_days, status,
+    keterangan, manager_at, hr_at, created_at, start_ts"""
+
+def history_query(start_ts=None, end_ts=None, archive_year=None):
+    """
+    Riwayat request dengan start_ts di [start_ts, end_ts) (None = tanpa batas), urut tanggal mulai.
+    archive_year: request di file arsip tahun itu ikut di-UNION ALL (harus sudah di-ATTACH sebagai cold_YYYY)
+    """
+    filters, params = [], []
+    if start_ts is not None:
+        filters.append("r.start_ts >= ?")
+        params.append(start_ts)
+    if end_ts is not None:
+        # start_ts NULL ikut segmen paling awal (urutan ascending SQLite: NULL duluan)
+        filters.append("r.start_ts < ?" if start_ts is not None else "(r.start_ts < ? OR r.start_ts IS NULL)")
+        params.append(end_ts)
+    where = ("WHERE " + " AND ".join(filters)) if filters else ""
+    source = "requests"
+    if archive_year is not None:
+        source = requests_source(["main", f"cold_{archive_year}"], HISTORY_SOURCE_COLUMNS)
+    query = f"""
+    SELECT
+        r.id as request_id,
+        u.name as user_name,
+        u.nik as user_nik,
+        u.division as user_division,
+        r.type as type,
+        r.reason as reason,
+        r.start_date as start_date,
+        r.end_date as end_date,
+        r.hours as hours,
+        r.change_off_days as change_off_days,
+        r.status as status,
+        r.keterangan as keterangan,
+        r.manager_at as manager_at,
+        r.hr_at as hr_at,
+        r.created_at as created_at
+    FROM {source} r
+    LEFT JOIN users u ON u.id = r.user_id
+    {where}
+    ORDER BY r.start_ts, r.id
+    """
+    return query, tuple(params)
+
+def history_parts(year: int = None):
+    """
+    Riwayat request (semua tahun jika year None) termasuk yang sudah dipindah ke file arsip, dipecah per
+    segmen tahun: list (tahun arsip yang harus di-ATTACH atau None, (sql, params)), urut tanggal mulai.
+    File arsip dibuat per tahun start_date, jadi tiap segmen cukup meng-ATTACH paling banyak satu file.
+    """
+    archived = sorted(archive_years())
+    if year is not None:
+        archive_year = year if year in archived else None
+        return [(archive_year, history_query(to_epoch(date(year, 1, 1)), to_epoch(date(year + 1, 1, 1)),
+                                             archive_year))]
+    parts, start = [], None
+    for archive_year in archived:
+        year_start, year_end = to_epoch(date(archive_year, 1, 1)), to_epoch(date(archive_year + 1, 1, 1))
+        parts.append((None, history_query(start, year_start)))
+        parts.append((archive_year, history_query(year_start, year_end, archive_year)))
+        start = year_end
+    parts.append((None, history_query(start, None)))
+    return parts
+
+def get_period_report(start_period: int, end_period: int, active_only=False):
+    """
+    Rekap request per user untuk periode custom (inklusif), mis. get_period_report(202501, 202503).
+    Bulan dihitung dari start_date request.
+    """
+    return _read(period_query(start_period, end_period, active_only))
+
+def get_user_quota_summary(year=None):
+    """Get summary report of all users' quotas for the year"""
+    if year is None:
+        year = date.today().year
+    return _read(summary_query(year))
+
+def get_semester_report(semester=1, year=None):
+    """Get detailed report per semester"""
+    if year is None:
+        year = date.today().year
+    return _read(semester_query(semester, year))
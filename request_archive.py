@@ -0,0 +1,295 @@
+import os
+import re
+import sys
+import glob
+import sqlite3
+from datetime import date
+from db import get_conn, to_epoch, DATA_DIR, EPOCH_COLUMNS, _rollup_select, _ro_uri
+
+# Partisi hot/cold untuk tabel requests. Request final (APPROVED/REJECTED) yang lebih tua dari N tahun
+# dipindah ke data/archive_YYYY.db (per tahun start_date) dan hanya di-ATTACH saat dibutuhkan.
+# Rollup laporan tetap di database utama, jadi summary/semester tahun lama tetap lengkap; history API
+# (request_history) menggabungkan partisi hot dan cold secara transparan saat user membuka halaman lama.
+ARCHIVE_AFTER_YEARS = int(os.environ.get("HRMS_ARCHIVE_AFTER_YEARS", "2"))
+FINAL_STATUSES = ("APPROVED", "REJECTED")
+ARCHIVE_RE = re.compile(r"archive_(\d{4})\.db$")
+MAX_ATTACHED = 9  # batas default SQLite 10 database ter-attach (termasuk temp)
+STATE_MAX_CREATED = "request_archive.max_created_ts"
+
+HISTORY_COLUMNS = """
+    r.id, r.user_id, r.type, r.start_date, r.end_date, r.reason, r.keterangan, r.hours, r.change_off_days,
+    r.status, r.file_uploaded, r.timesheet_path, r.manager_at, r.hr_id, r.hr_at, r.created_at, r.updated_at,
+    r.created_at_ts
+"""
+
+def archive_db_path(year: int) -> str:
+    return os.path.join(DATA_DIR, f"archive_{year}.db")
+
+def archive_years():
+    """Tahun yang sudah punya file arsip, terbaru dulu"""
+    years = []
+    for path in glob.glob(os.path.join(DATA_DIR, "archive_*.db")):
+        match = ARCHIVE_RE.search(path)
+        if match:
+            years.append(int(match.group(1)))
+    return sorted(years, reverse=True)
+
+def attach_archives(conn, years=None, readonly=False):
+    """
+    ATTACH file arsip ke koneksi sebagai cold_YYYY. Return list nama schema yang ter-attach.
+    Lebih dari MAX_ATTACHED tahun -> ValueError; pakai iter_partitions untuk membaca semua arsip.
+    readonly: ATTACH lewat URI mode=ro (koneksi harus dibuka dengan uri=True, mis. get_report_conn)
+    """
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    years = archive_years() if years is None else list(years)
+    missing = [year for year in years if f"cold_{year}" not in attached]
+    if len(attached) - 2 + len(missing) > MAX_ATTACHED:  # main & temp tidak dihitung
+        raise ValueError(f"Maksimal {MAX_ATTACHED} file arsip ter-attach sekaligus ({len(years)} diminta)")
+    schemas = []
+    for year in years:
+        schema = f"cold_{year}"
+        if schema not in attached:
+            path = _ro_uri(archive_db_path(year)) if readonly else archive_db_path(year)
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        schemas.append(schema)
+    return schemas
+
+def iter_partitions(conn, years=None, readonly=False):
+    """
+    Yield nama schema partisi requests: "main" dulu, lalu cold_YYYY (terbaru dulu) yang punya tabel requests.
+    File arsip di-ATTACH per batch MAX_ATTACHED dan di-DETACH sebelum batch berikutnya, jadi jumlah tahun
+    arsip tidak dibatasi slot ATTACH SQLite. Cursor pada schema cold harus selesai dibaca sebelum lanjut.
+    """
+    yield "main"
+    years = archive_years() if years is None else list(years)
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    for i in range(0, len(years), MAX_ATTACHED):
+        batch = years[i:i + MAX_ATTACHED]
+        schemas = attach_archives(conn, batch, readonly)
+        try:
+            for schema in schemas:
+                if conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'requests'").fetchone():
+                    yield schema
+        finally:
+            try:
+                for schema in schemas:
+                    if schema not in attached:
+                        conn.execute(f"DETACH DATABASE {schema}")
+            except sqlite3.ProgrammingError:
+                pass  # koneksi sudah ditutup pemanggil (generator ditinggal di tengah jalan)
+
+def requests_source(schemas, columns):
+    """Sub-query FROM: kolom `columns` dari tabel requests di beberapa partisi (main / cold_YYYY) di-UNION ALL"""
+    return "(" + " UNION ALL ".join(f"SELECT {columns} FROM {schema}.requests" for schema in schemas) + ")"
+
+def _ensure_archive_schema(conn, schema):
+    """Schema arsip = kolom requests (tanpa kolom generated) + kolom epoch + changeoff_details"""
+    columns = [f"{row[1]} {row[2]}" + (" PRIMARY KEY" if row[5] else "")
+               for row in conn.execute("PRAGMA main.table_info(requests)")]
+    columns += [f"{name} INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', {source}) AS INTEGER)) VIRTUAL"
+                for name, source in EPOCH_COLUMNS.items()]
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.requests ({', '.join(columns)})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_requests_user_created ON requests(user_id, created_at_ts)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_requests_created_at_ts ON requests(created_at_ts)")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.changeoff_details (
+            request_id INTEGER PRIMARY KEY,
+            location TEXT,
+            pic TEXT,
+            activities_json TEXT
+        )
+    """)
+
+def _year_candidates(conn, cutoff_year):
+    placeholders = ",".join("?" * len(FINAL_STATUSES))
+    rows = conn.execute(f"""
+        SELECT CAST(strftime('%Y', start_date) AS INTEGER) AS year, COUNT(*) AS requests
+        FROM requests
+        WHERE start_ts < ? AND status IN ({placeholders})
+        GROUP BY year
+        ORDER BY year
+    """, (to_epoch(date(cutoff_year, 1, 1)), *FINAL_STATUSES)).fetchall()
+    return [(row["year"], row["requests"]) for row in rows if row["year"]]
+
+def _archive_year(conn, year):
+    """Pindahkan request final satu tahun ke archive_YYYY.db dalam satu transaksi"""
+    schema = f"cold_{year}"
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (archive_db_path(year),))
+    try:
+        _ensure_archive_schema(conn, schema)
+        columns = ", ".join(row[1] for row in conn.execute("PRAGMA main.table_info(requests)"))
+        placeholders = ",".join("?" * len(FINAL_STATUSES))
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        cur.execute("DROP TABLE IF EXISTS temp.moved_requests")
+        cur.execute(f"""
+            CREATE TEMP TABLE moved_requests AS
+            SELECT id FROM main.requests
+            WHERE start_ts >= ? AND start_ts < ? AND status IN ({placeholders})
+        """, (to_epoch(date(year, 1, 1)), to_epoch(date(year + 1, 1, 1)), *FINAL_STATUSES))
+        last_seq = cur.execute("SELECT COALESCE(MAX(seq), 0) FROM main.changelog").fetchone()[0]
+
+        cur.execute(f"""
+            INSERT OR REPLACE INTO {schema}.requests ({columns})
+            SELECT {columns} FROM main.requests WHERE id IN (SELECT id FROM temp.moved_requests)
+        """)
+        moved = cur.rowcount
+        cur.execute(f"""
+            INSERT OR REPLACE INTO {schema}.changeoff_details
+            SELECT * FROM main.changeoff_details WHERE request_id IN (SELECT id FROM temp.moved_requests)
+        """)
+        cur.execute("DELETE FROM main.requests WHERE id IN (SELECT id FROM temp.moved_requests)")
+
+        # DELETE di atas memicu trigger rollup & changelog. Arsip bukan penghapusan: kontribusi rollup
+        # dikembalikan dan entri changelog dari pemindahan ini dibuang (payroll tidak melihat delete palsu).
+        cur.execute(f"""
+            INSERT INTO main.request_rollups (user_id, period, type, reason, status, request_count, days, co_days)
+            SELECT user_id, period, type, reason, status, COUNT(*), SUM(days), SUM(co_days)
+            FROM (SELECT {_rollup_select('r')} FROM {schema}.requests r
+                  WHERE r.id IN (SELECT id FROM temp.moved_requests))
+            WHERE period IS NOT NULL
+            GROUP BY user_id, period, type, reason, status
+            ON CONFLICT(user_id, period, type, reason, status) DO UPDATE SET
+                request_count = request_count + excluded.request_count,
+                days = days + excluded.days,
+                co_days = co_days + excluded.co_days
+        """)
+        cur.execute("DELETE FROM main.changelog WHERE seq > ?", (last_seq,))
+        max_created = cur.execute(f"SELECT MAX(created_at_ts) FROM {schema}.requests").fetchone()[0]
+        cur.execute("""
+            INSERT INTO main.job_state (name, value, updated_at) VALUES (?, ?, datetime('now'))
+            ON CONFLICT(name) DO UPDATE SET
+                value = MAX(CAST(COALESCE(value, 0) AS INTEGER), CAST(excluded.value AS INTEGER)),
+                updated_at = excluded.updated_at
+        """, (STATE_MAX_CREATED, max_created or 0))
+        cur.execute("DROP TABLE temp.moved_requests")
+        conn.commit()
+        return moved
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(f"DETACH DATABASE {schema}")
+
+def archive_requests(older_than_years=ARCHIVE_AFTER_YEARS, dry_run=False):
+    """
+    Pindahkan request final dengan start_date sebelum (tahun ini - N) ke file arsip per tahun.
+    Return ringkasan per tahun: {tahun: jumlah request}.
+    """
+    cutoff_year = date.today().year - older_than_years
+    conn = get_conn()
+    conn.isolation_level = None  # transaksi diatur manual (BEGIN/COMMIT) supaya ATTACH bisa di luar transaksi
+    try:
+        candidates = _year_candidates(conn, cutoff_year)
+        result = {"cutoff_year": cutoff_year, "dry_run": dry_run, "years": dict(candidates)}
+        if dry_run:
+            return result
+        for year, _ in candidates:
+            result["years"][year] = _archive_year(conn, year)
+        return result
+    finally:
+        conn.close()
+
+def _archive_max_created(conn):
+    row = conn.execute("SELECT value FROM job_state WHERE name = ?", (STATE_MAX_CREATED,)).fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+def request_history(user_id=None, manager_id=None, request_type=None, status=None, before=None, limit=50):
+    """
+    Riwayat request terbaru dulu dengan keyset pagination.
+    status dicocokkan sebagai prefix (mis. "PENDING" -> PENDING_MANAGER / PENDING_HR).
+    before: cursor (created_at_ts, id) dari halaman sebelumnya.
+    Partisi hot dibaca dulu; file arsip baru di-ATTACH jika halaman ini bisa berisi request yang lebih tua
+    dari request terbaru di arsip. Return (list dict, cursor berikutnya atau None).
+    """
+    filters, params = [], []
+    if user_id is not None:
+        filters.append("r.user_id = ?")
+        params.append(user_id)
+    if manager_id is not None:
+        filters.append("r.user_id IN (SELECT id FROM main.users WHERE manager_id = ?)")
+        params.append(manager_id)
+    if request_type:
+        filters.append("r.type = ?")
+        params.append(request_type)
+    if status:
+        filters.append("r.status LIKE ?")
+        params.append(f"{status}%")
+    if before is not None:
+        # Row value comparison -> range scan di index (user_id, created_at_ts)
+        filters.append("(r.created_at_ts, r.id) < (?, ?)")
+        params.extend(before)
+    where = ("WHERE " + " AND ".join(filters)) if filters else ""
+
+    def select(schema):
+        # ORDER BY + LIMIT per partisi: tiap partisi cukup membaca `limit` row teratas dari index-nya
+        return f"""SELECT * FROM (
+            SELECT {HISTORY_COLUMNS}, '{schema}' AS partition FROM {schema}.requests r {where}
+            ORDER BY r.created_at_ts DESC, r.id DESC LIMIT ?)"""
+
+    conn = get_conn()
+    try:
+        rows = [dict(r) for r in conn.execute(select("main"), (*params, limit))]
+        archive_max = _archive_max_created(conn)
+        hot_complete = len(rows) == limit and (rows[-1]["created_at_ts"] or 0) > (archive_max or 0)
+        if archive_max is not None and not hot_complete:
+            for schema in iter_partitions(conn):
+                if schema != "main":
+                    rows += [dict(r) for r in conn.execute(select(schema), (*params, limit))]
+            rows.sort(key=lambda r: (r["created_at_ts"] or 0, r["id"]), reverse=True)
+            rows = rows[:limit]
+    finally:
+        conn.close()
+
+    users = {}
+    if rows:
+        conn = get_conn()
+        ids = sorted({r["user_id"] for r in rows})
+        placeholders = ",".join("?" * len(ids))
+        users = {u["id"]: dict(u) for u in conn.execute(f"""
+            SELECT u.id, u.name, u.division, m.email AS manager_email, m.name AS manager_name
+            FROM users u LEFT JOIN users m ON m.id = u.manager_id
+            WHERE u.id IN ({placeholders})
+        """, ids)}
+        conn.close()
+    for row in rows:
+        user = users.get(row["user_id"], {})
+        row["employee_name"] = user.get("name")
+        row["employee_division"] = user.get("division")
+        row["manager_email"] = user.get("manager_email")
+        row["manager_name"] = user.get("manager_name")
+    next_cursor = (rows[-1]["created_at_ts"], rows[-1]["id"]) if len(rows) == limit else None
+    return rows, next_cursor
+
+def get_archived_changeoff_details(request_ids):
+    """Detail change off untuk request yang sudah dipindah ke file arsip"""
+    ids = [int(i) for i in request_ids]
+    if not ids or not archive_years():
+        return {}
+    conn = get_conn()
+    try:
+        placeholders = ",".join("?" * len(ids))
+        details = {}
+        for schema in iter_partitions(conn):
+            if schema == "main":
+                continue
+            try:
+                for row in conn.execute(f"""
+                    SELECT request_id, location, pic, activities_json
+                    FROM {schema}.changeoff_details WHERE request_id IN ({placeholders})
+                """, ids).fetchall():
+                    details.setdefault(row["request_id"], dict(row))
+            except sqlite3.OperationalError:
+                continue  # file arsip belum punya tabel
+        return details
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    # python request_archive.py [--years N] [--dry-run]
+    args = sys.argv[1:]
+    years = int(args[args.index("--years") + 1]) if "--years" in args else ARCHIVE_AFTER_YEARS
+    summary = archive_requests(years, dry_run="--dry-run" in args)
+    print(f"🗄️ Archive request sebelum {summary['cutoff_year']} {'(dry run)' if summary['dry_run'] else ''}")
+    for year, count in summary["years"].items():
+        print(f"   {year}: {count} request -> {archive_db_path(year)}")
@@ -0,0 +1,97 @@
+import json
+import time
+import threading
+from datetime import datetime
+import pytz
+from db import get_job_state, set_job_state, refresh_report_snapshot, REPORT_SNAPSHOT_MAX_AGE
+
+# Scheduler job background sederhana: satu daemon thread per proses yang mengecek job terdaftar tiap CHECK_EVERY
+# detik. Waktu & hasil run terakhir disimpan di job_state (<nama>.last_run / <nama>.last_result), jadi jadwal
+# tetap jalan benar walau aplikasi restart, dan hasilnya bisa ditampilkan di halaman status HR.
+CHECK_EVERY = 60  # detik
+TIMEZONE = pytz.timezone("Asia/Jakarta")
+
+_jobs = {}
+_lock = threading.Lock()
+_thread = None
+
+def register(name, fn, interval_seconds, summary=None):
+    """
+    Daftarkan job. interval_seconds <= 0 = job dimatikan.
+    summary: fungsi opsional hasil -> dict kecil yang disimpan sebagai last_result.
+    """
+    if interval_seconds > 0:
+        _jobs[name] = {"fn": fn, "interval": interval_seconds, "summary": summary}
+
+def in_quiet_hours(spec: str, now=None) -> bool:
+    """spec "1-5" = jam 01:00 sampai sebelum 05:00 WIB (boleh melewati tengah malam, mis. "22-4")"""
+    if not spec:
+        return False
+    start, end = (int(part) for part in spec.split("-"))
+    hour = (now or datetime.now(TIMEZONE)).hour
+    return start <= hour < end if start <= end else (hour >= start or hour < end)
+
+def registered_jobs():
+    """Nama & interval (detik) job yang terdaftar"""
+    return {name: job["interval"] for name, job in _jobs.items()}
+
+def last_result(name):
+    """Hasil run terakhir suatu job (dict) atau None"""
+    raw = get_job_state(f"{name}.last_result")
+    return json.loads(raw) if raw else None
+
+def run_job(name, fn=None, summary=None):
+    """Jalankan satu job sekarang dan catat hasilnya di job_state"""
+    job = _jobs.get(name, {})
+    fn = fn or job["fn"]
+    summary = summary or job.get("summary")
+    started = time.time()
+    set_job_state(f"{name}.last_run", int(started))
+    try:
+        result = fn()
+    except Exception as e:
+        set_job_state(f"{name}.last_result", json.dumps({
+            "ok": False, "error": str(e)[:500], "at": datetime.utcnow().isoformat(),
+        }))
+        raise
+    record = {"ok": True, "seconds": round(time.time() - started, 2), "at": datetime.utcnow().isoformat()}
+    if summary:
+        record.update(summary(result))
+    set_job_state(f"{name}.last_result", json.dumps(record, default=str))
+    return result
+
+def _due(name, job) -> bool:
+    last_run = int(get_job_state(f"{name}.last_run", 0) or 0)
+    return time.time() - last_run >= job["interval"]
+
+def _loop():
+    while True:
+        for name, job in list(_jobs.items()):
+            try:
+                if _due(name, job):
+                    run_job(name)
+            except Exception as e:
+                print(f"❌ Job {name} gagal: {e}")  # sudah tercatat di job_state, job lain tetap jalan
+        time.sleep(CHECK_EVERY)
+
+def _register_default_jobs():
+    import backup
+    import maintenance
+    import integrity
+    register("backup", backup.run_backup, backup.INTERVAL_HOURS * 3600, backup.summarize)
+    register("maintenance", maintenance.run_maintenance, maintenance.INTERVAL_HOURS * 3600, maintenance.summarize)
+    register("integrity", integrity.run_integrity_checks, integrity.INTERVAL_HOURS * 3600, integrity.summarize)
+    # Snapshot laporan di-refresh di background sebelum kedaluwarsa, jadi request laporan jarang menyalin sendiri
+    if REPORT_SNAPSHOT_MAX_AGE > 0:
+        register("report_snapshot", lambda: refresh_report_snapshot(force=True),
+                 max(REPORT_SNAPSHOT_MAX_AGE - CHECK_EVERY, CHECK_EVERY), lambda path: {"path": path})
+
+def ensure_started():
+    """Jalankan scheduler sekali per proses (daemon thread)"""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _register_default_jobs()
+            _thread = threading.Thread(target=_loop, name="hrms-scheduler", daemon=True)
+            _thread.start()
+    return _thread
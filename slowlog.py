@@ -0,0 +1,161 @@
+import os
+import re
+import sys
+import json
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+import profiler
+from db import DB_PATH, DATA_DIR, _ro_uri
+from request_archive import attach_archives
+
+# Slow query log: statement yang lebih lama dari SLOW_QUERY_MS ditulis ke JSONL (data/logs/slow_queries.jsonl)
+# beserta bentuk parameter (tipe, bukan nilai), fungsi pemanggil, dan EXPLAIN QUERY PLAN.
+# Statement dikelompokkan per fingerprint (profiler.fingerprint): kemunculan pertama ditulis lengkap dengan plan,
+# berikutnya hanya counter agregat yang ditulis ulang saat jumlahnya mencapai 2, 4, 8, ... supaya log tidak membanjir.
+# Memakai listener profiler, jadi bekerja walau panel profiler sendiri dimatikan - tapi selama aktif semua koneksi
+# get_conn() ter-instrumentasi, karena itu opt-in (HRMS_SLOW_QUERY_MS=200). EXPLAIN dan penulisan file dikerjakan
+# satu thread background, bukan di thread request user.
+SLOW_QUERY_MS = float(os.environ.get("HRMS_SLOW_QUERY_MS", "0"))  # <= 0 = slow query log mati
+LOG_DIR = os.environ.get("HRMS_LOG_DIR", os.path.join(DATA_DIR, "logs"))
+LOG_PATH = os.path.join(LOG_DIR, "slow_queries.jsonl")
+MAX_BYTES = int(os.environ.get("HRMS_SLOW_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+BACKUP_COUNT = 5  # slow_queries.jsonl.1 ... .5
+QUEUE_SIZE = 1000  # entry yang menunggu ditulis; jika penuh, entry baru dibuang
+
+_lock = threading.Lock()
+_aggregates = {}  # fingerprint -> counter
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_thread = None
+_ARCHIVE_SCHEMA_RE = re.compile(r"\bcold_(\d{4})\.")
+
+def param_shape(params):
+    """Bentuk parameter tanpa nilai: ["int", "str(12)", "None"] atau {"nama": "int"}"""
+    def shape(value):
+        if value is None:
+            return "None"
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}({len(value)})"
+        return type(value).__name__
+    if params is None:
+        return "executemany"
+    if isinstance(params, dict):
+        return {key: shape(value) for key, value in params.items()}
+    return [shape(value) for value in params]
+
+def explain(sql, params=()):
+    """EXPLAIN QUERY PLAN lewat koneksi read-only terpisah. Return list detail plan atau pesan error"""
+    conn = sqlite3.connect(_ro_uri(DB_PATH), uri=True, timeout=0.5)  # jangan menahan request user lama
+    try:
+        years = sorted({int(year) for year in _ARCHIVE_SCHEMA_RE.findall(sql)})
+        if years:
+            attach_archives(conn, years, readonly=True)  # query history lintas partisi arsip
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        return [row[3] for row in rows]
+    except sqlite3.Error as e:
+        # mis. tabel temp yang hanya ada di koneksi asal
+        return [f"error: {e}"]
+    finally:
+        conn.close()
+
+def _rotate():
+    if not os.path.exists(LOG_PATH) or os.path.getsize(LOG_PATH) < MAX_BYTES:
+        return
+    for index in range(BACKUP_COUNT - 1, 0, -1):
+        if os.path.exists(f"{LOG_PATH}.{index}"):
+            os.replace(f"{LOG_PATH}.{index}", f"{LOG_PATH}.{index + 1}")
+    os.replace(LOG_PATH, f"{LOG_PATH}.1")
+
+def _write(entry):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    _rotate()
+    with open(LOG_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, default=str) + "\n")
+
+def _drain():
+    """Thread background: EXPLAIN untuk entry pertama per fingerprint, lalu tulis ke log sesuai urutan masuk"""
+    while True:
+        entry, params = _queue.get()
+        try:
+            if entry["type"] == "slow_query":
+                entry["plan"] = explain(entry["sql"], params) if params is not None else None
+                with _lock:
+                    _aggregates[entry["fingerprint"]]["plan"] = entry["plan"]
+            with _lock:
+                _write(entry)
+        except Exception as e:
+            print(f"⚠️ Slow query log gagal: {e}")
+
+def record(sql, params, ms):
+    """Listener profiler: dipanggil untuk setiap statement yang selesai"""
+    if ms < SLOW_QUERY_MS:
+        return
+    try:
+        key = profiler.fingerprint(sql)
+        now = datetime.utcnow().isoformat()
+        with _lock:
+            agg = _aggregates.get(key)
+            first = agg is None
+            if first:
+                agg = _aggregates[key] = {"fingerprint": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                          "first_seen": now, "last_seen": now, "caller": None, "plan": None}
+            agg["count"] += 1
+            agg["total_ms"] += ms
+            agg["max_ms"] = max(agg["max_ms"], ms)
+            agg["last_seen"] = now
+            count = agg["count"]
+        if not first and count & (count - 1):
+            return  # bukan pangkat dua: cukup update counter di memori
+        entry = {"type": "slow_query" if first else "aggregate", "at": now, "fingerprint": key,
+                 "ms": round(ms, 1), "count": count, "total_ms": round(agg["total_ms"], 1),
+                 "max_ms": round(agg["max_ms"], 1), "caller": profiler.statement_origin(),
+                 "params": param_shape(params)}
+        if first:
+            entry["sql"] = sql.strip()
+            agg["caller"] = entry["caller"]
+        _queue.put_nowait((entry, params))
+    except queue.Full:
+        pass  # log tertinggal jauh; lebih baik kehilangan entry daripada menahan request user
+    except Exception as e:
+        print(f"⚠️ Slow query log gagal: {e}")  # logging tidak boleh mengganggu request user
+
+def aggregates():
+    """Counter agregat per fingerprint sejak proses start, urut total durasi"""
+    with _lock:
+        stats = [dict(agg, total_ms=round(agg["total_ms"], 1), max_ms=round(agg["max_ms"], 1),
+                      avg_ms=round(agg["total_ms"] / agg["count"], 1)) for agg in _aggregates.values()]
+    return sorted(stats, key=lambda s: s["total_ms"], reverse=True)
+
+def install():
+    """Pasang listener (sekali per proses, hanya jika HRMS_SLOW_QUERY_MS > 0).
+    Harus sebelum koneksi dibuat, karena factory dipilih saat connect"""
+    global _thread
+    if SLOW_QUERY_MS <= 0:
+        return
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_drain, name="slow-query-log", daemon=True)
+            _thread.start()
+    profiler.add_listener(record)
+
+def read_log(limit=None):
+    """Entry dari file log aktif (terbaru di akhir)"""
+    if not os.path.exists(LOG_PATH):
+        return []
+    with open(LOG_PATH, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return entries[-limit:] if limit else entries
+
+if __name__ == "__main__":
+    # python slowlog.py [N]: ringkasan per fingerprint dari log aktif
+    latest = {}
+    for entry in read_log():
+        merged = latest.setdefault(entry["fingerprint"], {})
+        merged.update({k: v for k, v in entry.items() if v is not None})
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for entry in sorted(latest.values(), key=lambda e: e["total_ms"], reverse=True)[:limit]:
+        print(f"🐢 {entry['count']}x, total {entry['total_ms']} ms, max {entry['max_ms']} ms — {entry.get('caller')}")
+        print(f"   {entry['fingerprint'][:200]}")
+        for step in entry.get("plan") or []:
+            print(f"   ↳ {step}")
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+from datetime import date, datetime, timedelta
+from db import get_conn, DB_PATH, create_rollup_triggers, create_changelog_triggers, rebuild_rollups, set_job_state
+from attachment_store import content_path
+from synthetic_params import generator_params
+
+# Generator organisasi sintetis (deterministik per seed) untuk benchmark & uji beban:
+# ribuan user dalam hierarki direktur -> manager -> karyawan, kuota beberapa tahun, dan sampai jutaan
+# request leave / change off. Lampiran memakai STUB_FILES file PDF kecil yang dipakai bersama (seperti file
+# dedup di storage content-addressed), ditulis ke UPLOAD_DIR supaya preview di halaman approval tetap jalan.
+# Menulis ke database HRMS_DB_PATH, jadi selalu jalankan dengan path terpisah:
+#   HRMS_DB_PATH=data/bench/database.db python synthetic_org.py --users 2000 --requests 200000
+BATCH_SIZE = 10000
+DIVISIONS = ["Engineering", "Operations", "Finance", "Sales", "Marketing", "Support", "Legal", "Procurement"]
+FIRST_NAMES = ["Agus", "Budi", "Citra", "Dewi", "Eko", "Fitri", "Gilang", "Hana", "Indra", "Joko", "Kartika",
+               "Lestari", "Made", "Nadia", "Oki", "Putri", "Rizki", "Sari", "Teguh", "Wulan", "Yusuf", "Zahra"]
+LAST_NAMES = ["Pratama", "Saputra", "Wijaya", "Santoso", "Hidayat", "Kusuma", "Nugroho", "Lubis", "Siregar",
+              "Halim", "Gunawan", "Setiawan", "Purnama", "Rahman", "Tanjung", "Harahap"]
+LEAVE_REASONS = [("PERSONAL", 0.55), ("SICK", 0.25), ("CHANGEOFF", 0.12), ("UNPAID_LEAVE", 0.08)]
+CHANGEOFF_SHARE = 0.3  # porsi request bertipe CHANGEOFF (lembur / dinas), sisanya LEAVE
+PENDING_WINDOW_DAYS = 21  # request yang mulai dalam 3 minggu terakhir periode masih bisa pending
+TRIGGERS_OFF = ["trg_requests_rollup_insert", "trg_requests_changelog_i", "trg_quotas_changelog_i"]
+PASSWORD = "password123"
+STUB_FILES = 64
+
+def _ensure_empty(cur, force):
+    count = cur.execute("SELECT COUNT(*) FROM requests").fetchone()[0]
+    count += cur.execute("SELECT COUNT(*) FROM users WHERE email != 'admin@company.com'").fetchone()[0]
+    if count and not force:
+        raise RuntimeError(f"Database {DB_PATH} sudah berisi data; pakai path lain atau --force untuk menimpa")
+    for table in ("requests", "changeoff_details", "quotas", "attachments", "attachment_aliases",
+                  "request_attachment_names", "notifications", "approvals", "request_rollups", "changelog"):
+        cur.execute(f"DELETE FROM {table}")
+    cur.execute("DELETE FROM users WHERE email != 'admin@company.com'")
+
+def _build_users(rng, total):
+    """Hierarki: ~1% HR, ~2% direktur (MANAGER tanpa atasan), ~10% manager, sisanya karyawan"""
+    password_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    n_hr = max(1, total // 100)
+    n_directors = max(1, total // 50)
+    n_managers = max(1, total // 10)
+    users = []
+    for index in range(total):
+        if index < n_hr:
+            role, division = "HR_ADMIN", "HR"
+        elif index < n_hr + n_directors + n_managers:
+            role, division = "MANAGER", DIVISIONS[index % len(DIVISIONS)]
+        else:
+            role, division = "EMPLOYEE", None
+        join = date(2015, 1, 1) + timedelta(days=rng.randrange(3650))
+        users.append({
+            "email": f"user{index:07d}@synthetic.test",
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}",
+            "role": role, "division": division, "password_hash": password_hash,
+            "join_date": join.isoformat(), "nik": f"SYN{index:07d}",
+            "sick_balance": rng.randint(0, 6), "is_active": 1 if rng.random() > 0.03 else 0,
+        })
+    return users, n_hr, n_directors
+
+def _insert_users(cur, rng, total):
+    users, n_hr, n_directors = _build_users(rng, total)
+    now = datetime.utcnow().isoformat()
+    cur.executemany("""
+        INSERT INTO users (email, name, role, password_hash, division, join_date, nik, sick_balance, is_active,
+                           created_at, updated_at)
+        VALUES (:email, :name, :role, :password_hash, :division, :join_date, :nik, :sick_balance, :is_active,
+                :now, :now)
+    """, [dict(user, now=now) for user in users])
+    ids = [row[0] for row in cur.execute(
+        "SELECT id FROM users WHERE email LIKE '%@synthetic.test' ORDER BY email")]
+    directors = ids[n_hr:n_hr + n_directors]
+    managers = [i for i, u in zip(ids, users) if u["role"] == "MANAGER"][n_directors:]
+    employees = [i for i, u in zip(ids, users) if u["role"] == "EMPLOYEE"]
+
+    # Manager -> direktur (divisi ikut direktur), karyawan -> manager
+    updates = []
+    division_of = {}
+    for director in directors:
+        division_of[director] = DIVISIONS[director % len(DIVISIONS)]
+    for manager in managers:
+        director = rng.choice(directors)
+        division_of[manager] = division_of[director]
+        updates.append((director, division_of[manager], manager))
+    for employee in employees:
+        manager = rng.choice(managers or directors)
+        updates.append((manager, division_of[manager], employee))
+    cur.executemany("UPDATE users SET manager_id = ?, division = ? WHERE id = ?", updates)
+    return {"hr": ids[:n_hr], "directors": directors, "managers": managers, "employees": employees}
+
+def _insert_quotas(cur, rng, user_ids, first_year, end_year):
+    now = datetime.utcnow().isoformat()
+    rows = []
+    for user_id in user_ids:
+        for year in range(first_year, end_year + 1):
+            leave_total = rng.randint(8, 12)
+            earned = rng.randint(0, 6)
+            rows.append((user_id, year, leave_total, rng.randint(0, leave_total), earned,
+                         rng.randint(0, earned), now, now))
+    cur.executemany("""
+        INSERT INTO quotas (user_id, year, leave_total, leave_used, changeoff_earned, changeoff_used,
+                            created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    return len(rows)
+
+def _stub_pdf(index):
+    """PDF satu halaman minimal (valid) berisi teks "Lampiran sintetis #index" """
+    text = f"BT /F1 18 Tf 72 720 Td (Lampiran sintetis #{index}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(text), text),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def _write_stubs(cur):
+    """Tulis file lampiran stub + metadata attachments. Return list path"""
+    now = datetime.utcnow().isoformat()
+    rows = []
+    for index in range(STUB_FILES):
+        data = _stub_pdf(index)
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = content_path(sha256, ".pdf")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        rows.append((sha256, path, len(data), "application/pdf", f"lampiran_{index}.pdf", now))
+    cur.executemany("""
+        INSERT OR IGNORE INTO attachments (sha256, path, size, mime_type, original_name, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    return [row[1] for row in rows]
+
+def _pick_reason(rng):
+    roll = rng.random()
+    for reason, share in LEAVE_REASONS:
+        if roll < share:
+            return reason
+        roll -= share
+    return LEAVE_REASONS[0][0]
+
+def _request_rows(rng, requesters, stub_paths, total, first_day, span_days, last_day):
+    """Generator tuple (request, changeoff_detail | None), berurutan per tanggal pengajuan"""
+    for index in range(total):
+        user_id = rng.choice(requesters)
+        start = first_day + timedelta(days=int(index * span_days / total) + rng.randrange(3))
+        created = datetime.combine(start, datetime.min.time()) - timedelta(days=rng.randint(1, 14),
+                                                                           minutes=rng.randrange(1440))
+        if rng.random() < CHANGEOFF_SHARE:
+            kind, reason = "CHANGEOFF", None
+            end = start + timedelta(days=rng.randint(0, 3))
+            hours = rng.choice([8, 8, 16, 24, 32])
+            co_days = hours // 8
+        else:
+            kind, reason = "LEAVE", _pick_reason(rng)
+            end = start + timedelta(days=rng.choice([0, 0, 0, 1, 1, 2, 4]))
+            hours, co_days = None, 0
+
+        if (last_day - start).days < PENDING_WINDOW_DAYS and rng.random() < 0.6:
+            status = rng.choice(["PENDING_MANAGER", "PENDING_HR"])
+        else:
+            status = "APPROVED" if rng.random() < 0.85 else "REJECTED"
+        decided = (created + timedelta(hours=rng.randint(2, 72))).isoformat()
+
+        attachment = rng.choice(stub_paths) if kind == "CHANGEOFF" or reason == "SICK" else None
+        request = (user_id, kind, start.isoformat(), end.isoformat(), reason, hours, co_days, status,
+                   1 if attachment else 0, attachment,
+                   decided if status != "PENDING_MANAGER" else None,
+                   decided if status in ("APPROVED", "REJECTED") else None,
+                   created.isoformat(), decided if status != "PENDING_MANAGER" else created.isoformat())
+        detail = None
+        if kind == "CHANGEOFF":
+            detail = (rng.choice(["Jakarta", "Bandung", "Surabaya", "Balikpapan", "Site Client"]),
+                      f"PIC {rng.choice(LAST_NAMES)}",
+                      json.dumps([{"date": start.isoformat(), "activity": "Maintenance sistem", "hours": hours}]))
+        yield request, detail
+
+def _insert_requests(cur, rng, people, total, first_year, end_year):
+    hr_ids = people["hr"]
+    requesters = people["employees"] + people["managers"]
+    first_day, last_day = date(first_year, 1, 1), date(end_year, 12, 31)
+    span_days = (last_day - first_day).days - 4
+    stub_paths = _write_stubs(cur)
+    inserted = 0
+    batch = []
+    for row in _request_rows(rng, requesters, stub_paths, total, first_day, span_days, last_day):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            inserted += _flush_requests(cur, rng, batch, hr_ids)
+            batch = []
+            print(f"   {inserted}/{total} request", end="\r", flush=True)
+    if batch:
+        inserted += _flush_requests(cur, rng, batch, hr_ids)
+    print()
+    return inserted
+
+def _flush_requests(cur, rng, batch, hr_ids):
+    first_id = cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM requests").fetchone()[0]
+    cur.executemany("""
+        INSERT INTO requests (id, user_id, type, start_date, end_date, reason, hours, change_off_days, status,
+                              file_uploaded, timesheet_path, manager_at, hr_at, created_at, updated_at, hr_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(first_id + i,) + request + (rng.choice(hr_ids) if request[11] else None,)
+          for i, (request, _) in enumerate(batch)])
+    cur.executemany("INSERT INTO changeoff_details (request_id, location, pic, activities_json) VALUES (?, ?, ?, ?)",
+                    [(first_id + i,) + detail for i, (_, detail) in enumerate(batch) if detail])
+    return len(batch)
+
+def generate(users=2000, years=3, requests=200000, seed=42, end_year=2025, force=False):
+    """
+    Isi database HRMS_DB_PATH dengan organisasi sintetis. Output identik untuk parameter & seed yang sama
+    (kecuali kolom created_at users/quotas). Return ringkasan jumlah row.
+    """
+    started = time.time()
+    rng = random.Random(seed)
+    first_year = end_year - years + 1
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        _ensure_empty(cur, force)
+        # Bulk load tanpa trigger per row; rollup dihitung ulang sekali di akhir, changelog tidak perlu
+        for trigger in TRIGGERS_OFF:
+            cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        people = _insert_users(cur, rng, users)
+        quota_rows = _insert_quotas(cur, rng, [i for ids in people.values() for i in ids], first_year, end_year)
+        request_rows = _insert_requests(cur, rng, people, requests, first_year, end_year)
+        create_rollup_triggers(cur)
+        create_changelog_triggers(cur)
+        rebuild_rollups(cur)
+        set_job_state("synthetic_org.params", json.dumps(generator_params(users, years, requests, seed, end_year)), cur)
+        conn.commit()
+        cur.execute("ANALYZE")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {"users": users, "managers": len(people["managers"]) + len(people["directors"]),
+            "quotas": quota_rows, "requests": request_rows, "first_year": first_year, "end_year": end_year,
+            "seconds": round(time.time() - started, 1)}
+
+def _arg(args, name, default):
+    return type(default)(args[args.index(name) + 1]) if name in args else default
+
+if __name__ == "__main__":
+    # HRMS_DB_PATH=<path> python synthetic_org.py [--users N] [--years N] [--requests N] [--seed N]
+    #                                             [--end-year YYYY] [--force]
+    args = sys.argv[1:]
+    summary = generate(users=_arg(args, "--users", 2000), years=_arg(args, "--years", 3),
+                       requests=_arg(args, "--requests", 200000), seed=_arg(args, "--seed", 42),
+                       end_year=_arg(args, "--end-year", 2025), force="--force" in args)
+    print(f"🏢 {DB_PATH}: {summary['users']} user ({summary['managers']} manager), {summary['quotas']} kuota, "
+          f"{summary['requests']} request {summary['first_year']}-{summary['end_year']} "
+          f"({summary['seconds']} detik)")
@@ -0,0 +1,7 @@
+# Versi & parameter generator organisasi sintetis. Sengaja tanpa import db (yang langsung menjalankan
+# init_db pada HRMS_DB_PATH), supaya benchmark bisa mengecek cache database dasar tanpa menyentuh database asli.
+GENERATOR_VERSION = 2
+
+def generator_params(users, years, requests, seed, end_year):
+    return {"version": GENERATOR_VERSION, "users": users, "years": years, "requests": requests,
+            "seed": seed, "end_year": end_year}
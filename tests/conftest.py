@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Database & upload di folder sementara; harus di-set sebelum modul aplikasi (db) pertama kali di-import
+_TMP = tempfile.mkdtemp(prefix="hrms-test-")
+os.environ.setdefault("HRMS_DB_PATH", os.path.join(_TMP, "database.db"))
+os.environ.setdefault("HRMS_UPLOAD_DIR", os.path.join(_TMP, "uploads"))
+os.environ.setdefault("HRMS_BACKUP_INTERVAL_HOURS", "0")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
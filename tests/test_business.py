@@ -0,0 +1,54 @@
+import uuid
+import multiprocessing
+from datetime import datetime
+import business
+from db import get_conn
+
+def _pending_hr_leave(days=3):
+    """Karyawan baru + quota tahun ini + satu request cuti PERSONAL yang menunggu HR. Return (user_id, request_id)"""
+    now = datetime.utcnow().isoformat()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("""INSERT INTO users(email, name, role, password_hash, created_at, updated_at)
+                   VALUES (?, 'Test Employee', 'EMPLOYEE', '-', ?, ?)""", (f"{uuid.uuid4().hex}@test.local", now, now))
+    user_id = cur.lastrowid
+    cur.execute("""INSERT INTO quotas (user_id, year, leave_total, leave_used, changeoff_earned, changeoff_used,
+                                       created_at, updated_at)
+                   VALUES (?, ?, 12, 0, 0, 0, ?, ?)""", (user_id, datetime.utcnow().year, now, now))
+    cur.execute("""INSERT INTO requests (user_id, type, start_date, end_date, reason, status, created_at, updated_at)
+                   VALUES (?, 'LEAVE', '2025-03-03', ?, 'PERSONAL', 'PENDING_HR', ?, ?)""",
+                (user_id, f"2025-03-{2 + days:02d}", now, now))
+    request_id = cur.lastrowid
+    conn.commit()
+    conn.close()
+    return user_id, request_id
+
+def _decide(barrier, results, request_id):
+    barrier.wait()
+    try:
+        business.set_hr_decision(1, request_id, True)
+        results.put("ok")
+    except ValueError:
+        results.put("conflict")
+    except Exception as e:
+        results.put(f"error: {e}")
+
+def test_concurrent_hr_decisions_deduct_quota_once():
+    ctx = multiprocessing.get_context("fork")
+    for _ in range(5):
+        user_id, request_id = _pending_hr_leave(days=3)
+        barrier, results = ctx.Barrier(2), ctx.Queue()
+        workers = [ctx.Process(target=_decide, args=(barrier, results, request_id)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        assert sorted(results.get(timeout=5) for _ in workers) == ["conflict", "ok"]
+
+        conn = get_conn()
+        status = conn.execute("SELECT status FROM requests WHERE id = ?", (request_id,)).fetchone()["status"]
+        used = conn.execute("SELECT leave_used FROM quotas WHERE user_id = ? AND year = ?",
+                            (user_id, datetime.utcnow().year)).fetchone()["leave_used"]
+        conn.close()
+        assert status == "APPROVED"
+        assert used == 3
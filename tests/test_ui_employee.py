@@ -0,0 +1,42 @@
+import os
+import uuid
+from datetime import date, timedelta
+from streamlit.testing.v1 import AppTest
+from conftest import REPO_DIR
+from models import create_user
+
+def _employee():
+    email = f"employee-{uuid.uuid4().hex[:8]}@test.local"
+    create_user(email, "Test Employee", "EMPLOYEE", "secret", None, "Engineering")
+    return email
+
+def _login(email):
+    at = AppTest.from_file(os.path.join(REPO_DIR, "main.py"), default_timeout=30)
+    at.run()
+    at.text_input[0].input(email)
+    at.text_input[1].input("secret")
+    next(b for b in at.button if b.label == "Login").click()
+    at.run()
+    assert not at.exception
+    return at
+
+def test_submit_changeoff_keeps_dates_across_reruns():
+    at = _login(_employee())
+    at.sidebar.radio[0].set_value("Submit Change Off")
+    at.run()
+    assert not at.exception
+    assert at.date_input(key="departure_date_co").value == date.today()
+
+    # Rerun kedua (interaksi pertama user) dulu crash: widget dapat value=None
+    at.date_input(key="return_date_co").set_value(date.today() + timedelta(days=2))
+    at.run()
+    assert not at.exception
+    assert at.date_input(key="departure_date_co").value == date.today()
+    assert at.date_input(key="return_date_co").value == date.today() + timedelta(days=2)
+    assert [t.value.strftime("%H:%M") for t in at.time_input] == ["08:00", "17:00"] * 3
+
+    at.time_input(key="end_time_1").set_value(at.time_input(key="start_time_1").value.replace(hour=19))
+    at.run()
+    assert not at.exception
+    assert at.time_input(key="end_time_1").value.hour == 19
+    assert at.time_input(key="end_time_0").value.hour == 17
@@ -0,0 +1,191 @@
+import io
+import os
+import re
+from datetime import datetime, date, time, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# Ekstraksi aktivitas harian dari timesheet XLSX / DOCX yang diupload untuk Change Off.
+# Hasil berformat sama dengan activities_json: tanggal, waktu_mulai, waktu_selesai, aktivitas.
+HEADER_KEYWORDS = {
+    "tanggal": ["tanggal", "tgl", "date", "hari/tanggal"],
+    "waktu_mulai": ["waktu mulai", "jam mulai", "mulai", "start time", "start", "jam masuk", "masuk", "time in", "from",
+                    "jam", "waktu", "time", "jam kerja"],  # kolom rentang "08:00 - 17:00"
+    "waktu_selesai": ["waktu selesai", "jam selesai", "selesai", "end time", "end", "finish", "jam keluar", "keluar",
+                      "time out", "until"],
+    "aktivitas": ["aktivitas", "kegiatan", "activity", "activities", "deskripsi", "description",
+                  "pekerjaan", "uraian", "task", "detail"],
+}
+HEADER_SCAN_ROWS = 20      # header dicari di 20 baris pertama
+MAX_EMPTY_ROWS = 50        # berhenti jika ketemu 50 baris kosong berturut-turut
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d %B %Y", "%d %b %Y"]
+TIME_RE = re.compile(r"(\d{1,2})[:.](\d{2})")
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="timesheet")
+
+def _norm_header(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+def _match_header(cells):
+    """Cari kolom tanggal/mulai/selesai/aktivitas dari satu baris header. Return dict kolom->index atau None"""
+    columns = {}
+    for idx, cell in enumerate(cells):
+        text = _norm_header(cell)
+        if not text:
+            continue
+        for field, keywords in HEADER_KEYWORDS.items():
+            if field in columns:
+                continue
+            # Keyword pendek harus sama persis, keyword panjang cukup terkandung di header
+            if any(text == k or (len(k) > 5 and k in text) for k in keywords):
+                columns[field] = idx
+                break
+    if "tanggal" in columns and ("waktu_mulai" in columns or "aktivitas" in columns):
+        return columns
+    return None
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or "").strip()
+    if not text:
+        return None
+    # Buang nama hari di depan, misal "Senin, 01/09/2025"
+    if "," in text:
+        text = text.split(",", 1)[1].strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text.split(" ")[0] if fmt.count(" ") == 0 else text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def _to_time(value):
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, time):
+        return value
+    if isinstance(value, (int, float)) and 0 <= value < 1:
+        # Excel menyimpan jam sebagai pecahan hari
+        minutes = int(round(value * 24 * 60))
+        return time(minutes // 60 % 24, minutes % 60)
+    match = TIME_RE.search(str(value or ""))
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour < 24 and minute < 60:
+            return time(hour, minute)
+    return None
+
+def _time_range(value):
+    """Sel berisi rentang '08:00 - 17:00' -> (mulai, selesai)"""
+    found = TIME_RE.findall(str(value or ""))
+    if len(found) >= 2:
+        return _to_time(":".join(found[0])), _to_time(":".join(found[1]))
+    return None, None
+
+def hours_between(start: str, end: str) -> float:
+    """Jam kerja dari 'HH:MM' ke 'HH:MM' (lewat tengah malam dihitung hari berikutnya)"""
+    start_dt = datetime.strptime(start, "%H:%M")
+    end_dt = datetime.strptime(end, "%H:%M")
+    if end_dt < start_dt:
+        end_dt += timedelta(days=1)
+    return (end_dt - start_dt).total_seconds() / 3600
+
+def _rows_to_activities(rows):
+    """Ubah baris tabel (list of cells) menjadi list aktivitas, mulai dari header yang dikenali"""
+    columns = None
+    activities = []
+    empty_streak = 0
+    for row_idx, cells in enumerate(rows):
+        cells = list(cells)
+        if columns is None:
+            if row_idx >= HEADER_SCAN_ROWS:
+                break
+            columns = _match_header(cells)
+            continue
+        if not any(c not in (None, "") for c in cells):
+            empty_streak += 1
+            if empty_streak >= MAX_EMPTY_ROWS:
+                break
+            continue
+        empty_streak = 0
+
+        def cell(field):
+            idx = columns.get(field)
+            return cells[idx] if idx is not None and idx < len(cells) else None
+
+        day = _to_date(cell("tanggal"))
+        if not day:
+            continue
+        start, end = _to_time(cell("waktu_mulai")), _to_time(cell("waktu_selesai"))
+        if start and not end:
+            start, end = _time_range(cell("waktu_mulai"))
+        description = cell("aktivitas")
+        activities.append({
+            "tanggal": day.isoformat(),
+            "waktu_mulai": start.strftime("%H:%M") if start else None,
+            "waktu_selesai": end.strftime("%H:%M") if end else None,
+            "aktivitas": str(description).strip() if description not in (None, "") else "",
+        })
+    return activities
+
+def parse_xlsx(data: bytes):
+    """Baca XLSX secara streaming (read_only) - tiap sheet dicoba sampai ketemu tabel aktivitas"""
+    from openpyxl import load_workbook
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            activities = _rows_to_activities(ws.iter_rows(values_only=True))
+            if activities:
+                return activities
+    finally:
+        wb.close()
+    return []
+
+def parse_docx(data: bytes):
+    """Telusuri tabel-tabel di DOCX, ambil tabel pertama yang punya header aktivitas"""
+    from docx import Document
+    doc = Document(io.BytesIO(data))
+    for table in doc.tables:
+        rows = ([c.text for c in row.cells] for row in table.rows)
+        activities = _rows_to_activities(rows)
+        if activities:
+            return activities
+    return []
+
+def parse_timesheet(data: bytes, filename: str):
+    """Parse timesheet berdasarkan ekstensi file. Return list aktivitas (urut tanggal, satu per hari)"""
+    ext = (os.path.splitext(filename)[1] or "").lower()
+    if ext == ".xlsx":
+        activities = parse_xlsx(data)
+    elif ext == ".docx":
+        activities = parse_docx(data)
+    else:
+        return []
+    # Satu entri per tanggal (entri pertama yang dipakai)
+    by_date = {}
+    for activity in activities:
+        by_date.setdefault(activity["tanggal"], activity)
+    return [by_date[k] for k in sorted(by_date)]
+
+def submit_parse(data: bytes, filename: str):
+    """Jalankan parsing di worker thread, return Future"""
+    return _executor.submit(parse_timesheet, data, filename)
+
+def cross_check_hours(typed_activities, parsed_activities, tolerance=0.25):
+    """Bandingkan jam yang diketik dengan jam di timesheet. Return list pesan selisih per tanggal"""
+    parsed = {a["tanggal"]: a for a in parsed_activities if a["waktu_mulai"] and a["waktu_selesai"]}
+    mismatches = []
+    for activity in typed_activities:
+        ref = parsed.get(activity["tanggal"])
+        if not ref:
+            continue
+        typed = hours_between(activity["waktu_mulai"], activity["waktu_selesai"])
+        expected = hours_between(ref["waktu_mulai"], ref["waktu_selesai"])
+        if abs(typed - expected) > tolerance:
+            mismatches.append(
+                f"{activity['tanggal']}: diisi {typed:.1f} jam, timesheet {expected:.1f} jam "
+                f"({ref['waktu_mulai']}-{ref['waktu_selesai']})"
+            )
+    return mismatches
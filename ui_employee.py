@@ -5,14 +5,20 @@ from business import (
     list_users, list_managers, create_user, update_user, delete_user,
     user_quota, upsert_quota, delete_quota, hr_pending, set_hr_decision,
     current_year, get_employees_by_manager, delete_user_force,
-    hr_reset_quotas_incremental, hr_reset_quotas_to_zero
+    hr_reset_quotas_incremental, hr_reset_quotas_to_zero, with_changeoff_details
 )
 from file_utils import preview_file
+from attachment_store import set_upload_name
 import json
 from db import get_conn
 import pytz
 from datetime import datetime
 import time
+import os
+from timesheet_parser import submit_parse, cross_check_hours
+from request_archive import request_history
+
+HISTORY_PAGE_SIZE = 50
 
 # ==============================================
 # UTILITY FUNCTIONS
@@ -56,7 +62,7 @@ def get_user_requests_history(user_id):
             JOIN users u ON r.user_id = u.id
             LEFT JOIN users m ON u.manager_id = m.id
             WHERE r.user_id = ?
-            ORDER BY r.created_at DESC
+            ORDER BY r.created_at_ts DESC, r.id DESC
         """, conn, params=(user_id,))
         conn.close()
         return df
@@ -116,6 +122,66 @@ def get_user_profile(user_id):
         st.error(f"Error getting user profile: {e}")
         return {}
 
+def widget_default(key, default):
+    """
+    Isi default widget lewat session_state (hanya jika belum ada, misal sudah diisi dari timesheet).
+    Widget-nya cukup dirender dengan key=, tanpa value=, supaya identitas widget tetap sama antar rerun.
+    """
+    st.session_state.setdefault(key, default)
+
+@st.fragment(run_every=0.5)
+def timesheet_parse_status():
+    """Status parsing; hanya fragment ini yang dicek ulang, seluruh halaman dirender ulang setelah selesai"""
+    job = st.session_state.get("timesheet_parse")
+    if job and job["future"].done():
+        st.rerun()
+    st.info("⏳ Membaca timesheet...")
+
+def timesheet_activities(file):
+    """
+    Parse timesheet XLSX/DOCX di worker thread dan isi otomatis form aktivitas (sekali per file).
+    Return (aktivitas hasil parsing, masih_parsing).
+    """
+    if not file or os.path.splitext(file.name)[1].lower() not in (".xlsx", ".docx"):
+        st.session_state.pop("timesheet_parse", None)
+        return [], False
+
+    job = st.session_state.get("timesheet_parse")
+    if not job or job["file_id"] != file.file_id:
+        job = {"file_id": file.file_id, "future": submit_parse(file.getvalue(), file.name), "applied": False}
+        st.session_state["timesheet_parse"] = job
+
+    future = job["future"]
+    if not future.done():
+        timesheet_parse_status()
+        return [], True
+    try:
+        activities = future.result()
+    except Exception as e:
+        st.warning(f"Timesheet tidak bisa dibaca otomatis: {e}")
+        return [], False
+    if not activities:
+        st.info("Tidak ditemukan tabel aktivitas di timesheet. Silakan isi manual.")
+        return [], False
+
+    if not job["applied"]:
+        # Isi widget sebelum dirender: tanggal, jam dan deskripsi per hari
+        first = date.fromisoformat(activities[0]["tanggal"])
+        last = date.fromisoformat(activities[-1]["tanggal"])
+        st.session_state["departure_date_co"] = first
+        st.session_state["return_date_co"] = last
+        for activity in activities:
+            day = (date.fromisoformat(activity["tanggal"]) - first).days
+            if activity["waktu_mulai"]:
+                st.session_state[f"start_time_{day}"] = datetime.strptime(activity["waktu_mulai"], "%H:%M").time()
+            if activity["waktu_selesai"]:
+                st.session_state[f"end_time_{day}"] = datetime.strptime(activity["waktu_selesai"], "%H:%M").time()
+            if activity["aktivitas"]:
+                st.session_state[f"activity_{day}"] = activity["aktivitas"]
+        job["applied"] = True
+        st.success(f"📄 {len(activities)} hari aktivitas terisi otomatis dari timesheet. Silakan periksa kembali.")
+    return activities, False
+
 def quota_kanban(q: dict, title_prefix: str = ""):
     """Display quota information in kanban style"""
     c1, c2, c3, c4 = st.columns(4)
@@ -335,9 +401,9 @@ def page_submit_leave(user):
             cur.execute("""
                 INSERT INTO requests(
                     user_id, type, start_date, end_date, reason, status,
-                    created_at, updated_at, file_uploaded, keterangan
+                    created_at, updated_at, file_uploaded, timesheet_path, keterangan
                 )
-                VALUES(?,?,?,?,?,?,?,?,?,?)
+                VALUES(?,?,?,?,?,?,?,?,?,?,?)
             """, (
                 user["id"],
                 'LEAVE',
@@ -348,8 +414,11 @@ def page_submit_leave(user):
                 now,
                 now,
                 1 if medical_path else 0,
+                medical_path,
                 keterangan if keterangan and keterangan.strip() else None
             ))
+            if medical_path:
+                set_upload_name(cur.lastrowid, medical_letter.name, cur)
             conn.commit()
             conn.close()
             
@@ -372,16 +441,25 @@ def page_submit_changeoff(user):
         for idx, req in changeoff_history.iterrows():
             status_icon = "✅" if req["status"] == "APPROVED" else "⏳" if "PENDING" in req["status"] else "❌"
             st.sidebar.info(f"{status_icon} CHANGEOFF - {req['status']}\n"
-                           f"Tanggal: {format_date_for_display(req.get('departure_date', ''))} to {format_date_for_display(req.get('return_date', ''))}\n"
+                           f"Tanggal: {format_date_for_display(req.get('start_date', ''))} to {format_date_for_display(req.get('end_date', ''))}\n"
                            f"Jam: {req.get('hours', 0)} hours")
     else:
         st.sidebar.info("Belum ada history change off")
 
+    # Timesheet diupload di awal: XLSX/DOCX dibaca otomatis untuk mengisi tanggal & aktivitas
+    file = st.file_uploader("Upload Timesheet*", type=["pdf", "jpg", "png", "docx", "xlsx"], key="timesheet_co",
+                            help="Timesheet XLSX/DOCX akan dibaca otomatis untuk mengisi detail aktivitas")
+    if file:
+        st.success("✅ File telah diupload")
+    parsed_activities, _ = timesheet_activities(file)
+
+    widget_default("departure_date_co", date.today())
+    widget_default("return_date_co", date.today())
     col1, col2 = st.columns(2)
     with col1:
-        departure_date = st.date_input("Tanggal Keberangkatan*", date.today(), key="departure_date_co")
+        departure_date = st.date_input("Tanggal Keberangkatan*", key="departure_date_co")
     with col2:
-        return_date = st.date_input("Tanggal Kepulangan*", date.today(), key="return_date_co")
+        return_date = st.date_input("Tanggal Kepulangan*", key="return_date_co")
 
     total_days = (return_date - departure_date).days + 1
     if total_days <= 0:
@@ -410,19 +488,13 @@ def page_submit_changeoff(user):
         current_date = departure_date + timedelta(days=day)
         st.markdown(f"### Hari {day + 1} - {current_date.strftime('%A, %d %B %Y')}")
         
+        widget_default(f"start_time_{day}", datetime.strptime("08:00", "%H:%M").time())
+        widget_default(f"end_time_{day}", datetime.strptime("17:00", "%H:%M").time())
         col3, col4 = st.columns(2)
         with col3:
-            start_time = st.time_input(
-                f"Waktu Mulai* - Hari {day+1}",
-                value=datetime.strptime("08:00", "%H:%M").time(),
-                key=f"start_time_{day}"
-            )
+            start_time = st.time_input(f"Waktu Mulai* - Hari {day+1}", key=f"start_time_{day}")
         with col4:
-            end_time = st.time_input(
-                f"Waktu Selesai* - Hari {day+1}",
-                value=datetime.strptime("17:00", "%H:%M").time(),
-                key=f"end_time_{day}"
-            )
+            end_time = st.time_input(f"Waktu Selesai* - Hari {day+1}", key=f"end_time_{day}")
         
         activity_desc = st.text_area(
             f"Detail Aktivitas* - Hari {day+1}",
@@ -470,9 +542,13 @@ def page_submit_changeoff(user):
                f"- **Change Off yang akan diperoleh: {eligible_days} hari** (aturan baru)\n"
                f"- Perhitungan lama: {int(total_hours/8)} hari ({total_hours:.1f} jam ÷ 8)")
 
-    file = st.file_uploader("Upload Timesheet*", type=["pdf", "jpg", "png", "docx", "xlsx"], key="timesheet_co")
-    if file:
-        st.success("✅ File telah diupload")
+        # Cek silang jam yang diisi dengan jam di timesheet
+        if parsed_activities:
+            mismatches = cross_check_hours(activities_data, parsed_activities)
+            if mismatches:
+                st.warning("⚠️ Jam yang diisi berbeda dengan timesheet:\n- " + "\n- ".join(mismatches))
+            else:
+                st.caption("✅ Jam yang diisi sesuai dengan timesheet")
 
     if st.button("Submit Change Off", type="primary", key="submit_co_btn"):
         if not require_manager_assigned(user):
@@ -519,31 +595,33 @@ def page_submit_changeoff(user):
             # PERBAIKAN: Query INSERT yang benar dengan semua kolom
             cur.execute("""
                 INSERT INTO requests(
-                    user_id, type, start_date, end_date, departure_date, return_date, 
-                    hours, change_off_days, reason, status, timesheet_path, location, pic, 
-                    activities_json, created_at, updated_at, file_uploaded, keterangan
+                    user_id, type, start_date, end_date,
+                    hours, change_off_days, reason, status, timesheet_path,
+                    created_at, updated_at, file_uploaded, keterangan
                 )
-                VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)
             """, (
                 user["id"], 
                 'CHANGEOFF', 
                 departure_date.isoformat(),      # start_date = departure_date
                 return_date.isoformat(),         # end_date = return_date
-                departure_date.isoformat(),      # departure_date
-                return_date.isoformat(),         # return_date
                 total_hours,                     # hours
                 change_off_days,                 # change_off_days (NEW)
                 'CHANGEOFF',                     # reason
                 'PENDING_MANAGER',               # status
                 path,                           # timesheet_path
-                location,                       # location
-                pic,                            # pic
-                activities_json,                # activities_json
                 now,                            # created_at
                 now,                            # updated_at
                 1,                              # file_uploaded
                 keterangan if keterangan and keterangan.strip() else None  # keterangan
             ))
+            request_id = cur.lastrowid
+            # Detail lebar (lokasi, PIC, aktivitas harian) disimpan terpisah dari requests
+            cur.execute("""
+                INSERT INTO changeoff_details(request_id, location, pic, activities_json)
+                VALUES(?,?,?,?)
+            """, (request_id, location, pic, activities_json))
+            set_upload_name(request_id, file.name, cur)
             conn.commit()
             conn.close()
             
@@ -560,33 +638,33 @@ def page_my_requests(user):
     """Halaman history requests karyawan"""
     st.header("My Requests History")
     
-    # Dapatkan data requests
-    conn = get_conn()
-    df = pd.read_sql_query("""
-        SELECT r.*, u.name as employee_name, m.email as manager_email, m.name as manager_name
-        FROM requests r
-        JOIN users u ON r.user_id = u.id
-        LEFT JOIN users m ON u.manager_id = m.id
-        WHERE r.user_id=?
-        ORDER BY r.created_at DESC
-    """, conn, params=(user["id"],))
-    conn.close()
-    
-    if df.empty:
-        st.info("Belum ada request.")
-        return
-
     # Filter options
     filter_type = st.selectbox("Filter by Type", ["ALL", "LEAVE", "CHANGEOFF"], key="filter_type_select")
     filter_status = st.selectbox("Filter by Status", ["ALL", "PENDING", "APPROVED", "REJECTED"], key="filter_status_select")
 
-    # Apply filters
-    if filter_type != "ALL":
-        df = df[df["type"] == filter_type]
-    if filter_status != "ALL":
-        df = df[df["status"].str.contains(filter_status, case=False)]
+    # Dapatkan data requests per halaman keyset (request lama di file arsip hanya dibaca saat diminta).
+    # Halaman pertama selalu dibaca ulang; halaman lama yang sudah dimuat disimpan di session_state bersama
+    # cursor-nya, jadi "muat lebih lama" hanya membaca satu halaman berikutnya (bukan ulang dari atas)
+    filters = dict(
+        user_id=user["id"],
+        request_type=None if filter_type == "ALL" else filter_type,
+        status=None if filter_status == "ALL" else filter_status,
+    )
+    rows, next_cursor = request_history(**filters, limit=HISTORY_PAGE_SIZE)
+    older = st.session_state.get("my_requests_older")
+    older_rows = older["rows"] if older and older["filters"] == filters else []
+    if older_rows:
+        shown = {r["id"] for r in rows}
+        rows += [r for r in older_rows if r["id"] not in shown]
+        next_cursor = older["cursor"]
+    df = pd.DataFrame(rows)
+
+    if df.empty:
+        st.info("Belum ada request.")
+        return
 
-    # Display requests
+    # Display requests (detail change off di-join hanya untuk row yang ditampilkan)
+    df = with_changeoff_details(df)
     for idx, r in df.iterrows():
         status_icon = "✅" if r["status"] == "APPROVED" else "⏳" if "PENDING" in r["status"] else "❌"
         with st.expander(f"{status_icon} {r['type']} - {r['status']} - ID: {r['id']}", expanded=False):
@@ -690,4 +768,11 @@ Best regards,
             # Tampilkan file jika ada
             if r.get('file_uploaded', 0) and r.get('timesheet_path'):
                 st.info("Attached File:")
-                preview_file(r['timesheet_path'], key_prefix=f"req_{r['id']}", user_role=user["role"])
\ No newline at end of file
+                preview_file(r['timesheet_path'], key_prefix=f"req_{r['id']}", user_role=user["role"],
+                             request_id=r['id'])
+
+    if next_cursor is not None:
+        if st.button("⬇️ Muat request lebih lama", key="my_requests_more", use_container_width=True):
+            more, cursor = request_history(**filters, before=next_cursor, limit=HISTORY_PAGE_SIZE)
+            st.session_state["my_requests_older"] = {"filters": filters, "rows": older_rows + more, "cursor": cursor}
+            st.rerun()
\ No newline at end of file
@@ -2,16 +2,27 @@ import streamlit as st
 import pandas as pd
 from business import (
     list_users, list_managers, create_user, update_user, delete_user,
-    user_quota, upsert_quota, delete_quota, current_year,
+    user_quota, upsert_quota, delete_quota, current_year, set_hr_decision,
     get_employees_by_manager, delete_user_force,
-    hr_reset_quotas_incremental, hr_reset_quotas_to_zero
+    hr_reset_quotas_incremental, hr_reset_quotas_to_zero, with_changeoff_details
 )
 from file_utils import preview_file
+from reports import get_user_quota_summary, get_semester_report, get_period_report, to_period
+from report_export import export_summary, export_semester, export_period, export_history, export_yearly
+from approval_letters import generate_letters, month_range
+from hr_deck import build_deck
 from ui_employee import quota_kanban
-from db import get_conn
+from db import get_conn, refresh_report_snapshot, report_snapshot_time, get_job_state
+from integrity import run_integrity_checks, get_health, summarize as integrity_summary
+from maintenance import database_stats
+from scheduler import run_job, last_result
+from user_import import import_users, error_report_csv, template_csv
+import profiler
+import slowlog
 import pytz
 from datetime import date, datetime, timedelta
 import json
+import os
 
 # Style CSS Modern
 st.markdown("""
@@ -111,7 +122,7 @@ def get_hr_pending_requests():
             FROM requests r
             JOIN users u ON u.id = r.user_id
             WHERE r.status = 'PENDING_HR'
-            ORDER BY r.created_at DESC
+            ORDER BY r.created_at_ts DESC, r.id DESC
         """, conn)
         conn.close()
         return df
@@ -120,112 +131,11 @@ def get_hr_pending_requests():
         return pd.DataFrame()
 
 def set_hr_decision_new(hr_id, request_id, approve):
-    """Set HR decision - UPDATED VERSION dengan change_off_days"""
+    """Set HR decision dari halaman HR (logika quota di business.set_hr_decision, dipakai juga oleh API)"""
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        
-        # Get request details
-        cursor.execute("SELECT * FROM requests WHERE id = ?", (request_id,))
-        request = cursor.fetchone()
-        if not request:
-            raise Exception("Request tidak ditemukan")
-        
-        # Update status
-        new_status = 'APPROVED' if approve else 'REJECTED'
-        now = datetime.now().isoformat()
-        
-        cursor.execute("""
-            UPDATE requests 
-            SET status = ?, hr_id = ?, hr_at = ?, updated_at = ?
-            WHERE id = ?
-        """, (new_status, hr_id, now, now, request_id))
-        
-        # Update quotas if approved
-        if approve:
-            user_id = request["user_id"]
-            year = datetime.fromisoformat(request["created_at"]).year
-            
-            if request["type"] == "LEAVE" and request["reason"] == "PERSONAL":
-                # Deduct leave balance for personal leave
-                start_date = datetime.fromisoformat(request["start_date"]).date()
-                end_date = datetime.fromisoformat(request["end_date"]).date()
-                days = (end_date - start_date).days + 1
-                
-                # Get current quota
-                cursor.execute("SELECT * FROM quotas WHERE user_id = ? AND year = ?", (user_id, year))
-                quota = cursor.fetchone()
-                
-                if quota:
-                    new_used = quota["leave_used"] + days
-                    cursor.execute("""
-                        UPDATE quotas 
-                        SET leave_used = ?, updated_at = ?
-                        WHERE user_id = ? AND year = ?
-                    """, (new_used, now, user_id, year))
-                else:
-                    # Create new quota if doesn't exist
-                    cursor.execute("""
-                        INSERT INTO quotas (user_id, year, leave_total, leave_used, changeoff_earned, changeoff_used, created_at, updated_at)
-                        VALUES (?, ?, 12, ?, 0, 0, ?, ?)
-                    """, (user_id, year, days, now, now))
-                
-            elif request["type"] == "CHANGEOFF":
-                # PERBAIKAN: Gunakan change_off_days dengan aturan baru
-                if request["change_off_days"] and request["change_off_days"] > 0:
-                    # Gunakan perhitungan baru: setiap hari > 8 jam = 1 hari change off
-                    days_earned = request["change_off_days"]
-                else:
-                    # Fallback ke perhitungan lama untuk data existing
-                    hours = request["hours"] if request["hours"] is not None else 0
-                    days_earned = int(hours / 8) if hours > 0 else 0
-                
-                cursor.execute("SELECT * FROM quotas WHERE user_id = ? AND year = ?", (user_id, year))
-                quota = cursor.fetchone()
-                
-                if quota:
-                    new_earned = quota["changeoff_earned"] + days_earned
-                    cursor.execute("""
-                        UPDATE quotas 
-                        SET changeoff_earned = ?, updated_at = ?
-                        WHERE user_id = ? AND year = ?
-                    """, (new_earned, now, user_id, year))
-                else:
-                    # Create new quota if doesn't exist
-                    cursor.execute("""
-                        INSERT INTO quotas (user_id, year, leave_total, leave_used, changeoff_earned, changeoff_used, created_at, updated_at)
-                        VALUES (?, ?, 12, 0, ?, 0, ?, ?)
-                    """, (user_id, year, days_earned, now, now))
-            
-            elif request["type"] == "LEAVE" and request["reason"] == "CHANGEOFF":
-                # Handle CHANGEOFF reason in LEAVE type - deduct changeoff balance
-                start_date = datetime.fromisoformat(request["start_date"]).date()
-                end_date = datetime.fromisoformat(request["end_date"]).date()
-                days = (end_date - start_date).days + 1
-                
-                cursor.execute("SELECT * FROM quotas WHERE user_id = ? AND year = ?", (user_id, year))
-                quota = cursor.fetchone()
-                
-                if quota:
-                    new_co_used = quota["changeoff_used"] + days
-                    cursor.execute("""
-                        UPDATE quotas 
-                        SET changeoff_used = ?, updated_at = ?
-                        WHERE user_id = ? AND year = ?
-                    """, (new_co_used, now, user_id, year))
-                else:
-                    # Create new quota if doesn't exist
-                    cursor.execute("""
-                        INSERT INTO quotas (user_id, year, leave_total, leave_used, changeoff_earned, changeoff_used, created_at, updated_at)
-                        VALUES (?, ?, 12, 0, 0, ?, ?, ?)
-                    """, (user_id, year, days, now, now))
-        
-        conn.commit()
-        conn.close()
-        return True
-        
+        return set_hr_decision(hr_id, request_id, approve)
     except Exception as e:
-        st.error(f"Error setting HR decision: {e}")
+        st.error(str(e))
         return False
 
 def update_user_sick_balance(user_id, new_balance):
@@ -237,7 +147,7 @@ def update_user_sick_balance(user_id, new_balance):
             UPDATE users 
             SET sick_balance = ?, updated_at = ?
             WHERE id = ?
-        """, (new_balance, datetime.now().isoformat(), user_id))
+        """, (new_balance, datetime.utcnow().isoformat(), user_id))
         conn.commit()
         conn.close()
         return True
@@ -248,6 +158,40 @@ def update_user_sick_balance(user_id, new_balance):
 # ==============================================
 # PAGE FUNCTIONS
 # ==============================================
+def bulk_import_section():
+    """Import user massal dari CSV / XLSX (dry run dulu, lalu import)"""
+    with st.expander("📥 Bulk Import Users (CSV / XLSX)", expanded=False):
+        st.caption("Kolom: nik, email, name, role, division, manager_email, join_date, probation_date, "
+                   "permanent_date, sick_balance, password. Manager boleh ada di file yang sama.")
+        st.download_button("📄 Download Template CSV", data=template_csv(), file_name="hrms_users_template.csv",
+                           mime="text/csv", key="bulk_import_template")
+        uploaded = st.file_uploader("File users", type=["csv", "xlsx"], key="bulk_import_file")
+        default_password = st.text_input("Default password (untuk row tanpa password)", type="password",
+                                         key="bulk_import_password")
+        col1, col2 = st.columns(2)
+        dry_run = col1.button("🔍 Dry Run (validasi saja)", key="btn_bulk_dry_run", use_container_width=True,
+                              disabled=uploaded is None)
+        run = col2.button("💾 Import", key="btn_bulk_import", type="primary", use_container_width=True,
+                          disabled=uploaded is None)
+        if uploaded is None or not (dry_run or run):
+            return
+        try:
+            uploaded.seek(0)
+            result = import_users(uploaded, filename=uploaded.name, dry_run=dry_run,
+                                  default_password=default_password or None)
+        except Exception as e:
+            st.error(f"❌ Import gagal, tidak ada user yang disimpan: {e}")
+            return
+        if result["dry_run"]:
+            st.info(f"🔍 {result['valid']}/{result['rows']} row valid ({result['seconds']} detik). Belum ada yang disimpan.")
+        else:
+            st.success(f"✅ {result['imported']}/{result['rows']} user diimport ({result['seconds']} detik)")
+        if result["errors"]:
+            st.warning(f"⚠️ {len(result['errors'])} row gagal validasi dan dilewati")
+            st.dataframe(pd.DataFrame(result["errors"]), use_container_width=True, hide_index=True)
+            st.download_button("📥 Download Error Report", data=error_report_csv(result["errors"]),
+                               file_name="hrms_import_errors.csv", mime="text/csv", key="bulk_import_errors")
+
 def page_hr_users(user):
     st.markdown('<div class="main-header">👥 Users Management</div>', unsafe_allow_html=True)
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -369,6 +313,8 @@ def page_hr_users(user):
                     del st.query_params["scroll"]
                 st.rerun()
 
+    bulk_import_section()
+
     st.markdown('<div class="sub-header">📋 Users List</div>', unsafe_allow_html=True)
     if users_df.empty:
         st.info("No users found.")
@@ -724,6 +670,7 @@ def page_hr_pending(user):
     if status_filter != "SEMUA":
         df = df[df["status"] == status_filter]
 
+    df = with_changeoff_details(df)
     for _, r in df.iterrows():
         # Tentukan ikon berdasarkan status
         if r["status"] == "PENDING_HR":
@@ -863,7 +810,8 @@ def page_hr_pending(user):
             # Tampilkan file jika ada
             if r.get('file_uploaded', 0) and r.get('timesheet_path'):
                 st.info("📎 Attached File:")
-                preview_file(r['timesheet_path'], key_prefix=f"hr_req_{r['id']}", user_role=user["role"])
+                preview_file(r['timesheet_path'], key_prefix=f"hr_req_{r['id']}", user_role=user["role"],
+                             request_id=r['id'])
 
             # Tombol Approve/Reject hanya untuk status pending
             if r["status"] == "PENDING_HR":
@@ -880,4 +828,228 @@ def page_hr_pending(user):
                     if st.button(f"❌ Reject", key=f"hr_rej_{r['id']}", use_container_width=True):
                         if set_hr_decision_new(int(user["id"]), int(r["id"]), False):
                             st.warning("❌ Rejected.")
-                            st.rerun()
\ No newline at end of file
+                            st.rerun()
+
+# ==============================================
+# REPORTS PAGE
+# ==============================================
+
+def export_download(label, export_fn, key, *args):
+    """Tombol generate export Excel (streaming ke file sementara) lalu tombol download file-nya"""
+    state_key = f"export_{key}"
+    if st.button(f"⚙️ Generate {label}", key=f"gen_{key}", use_container_width=True):
+        with st.spinner("Menyiapkan file Excel..."):
+            path, rows = export_fn(*args)
+        st.session_state[state_key] = {"path": path, "rows": rows}
+
+    export = st.session_state.get(state_key)
+    if export and os.path.exists(export["path"]):
+        st.caption(f"📄 {export['rows']} baris • {os.path.getsize(export['path']) / 1024:.0f} KB")
+        with open(export["path"], "rb") as f:
+            st.download_button(
+                f"📥 Download {label}",
+                data=f,
+                file_name=f"hrms_{key}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key=f"dl_{key}",
+                use_container_width=True,
+            )
+
+def page_hr_reports(user):
+    """Halaman laporan HR: summary tahunan, semester, periode custom, dan riwayat request"""
+    st.markdown('<div class="main-header">📈 Reports</div>', unsafe_allow_html=True)
+
+    year = st.number_input("Tahun", min_value=2000, max_value=2100, value=current_year(), step=1, key="report_year")
+    c_info, c_refresh = st.columns([4, 1])
+    with c_refresh:
+        if st.button("🔄 Refresh data", key="refresh_report_snapshot", use_container_width=True):
+            refresh_report_snapshot(force=True)
+    snapshot_at = report_snapshot_time()
+    if snapshot_at:
+        with c_info:
+            st.caption(f"Data laporan per {datetime.fromtimestamp(snapshot_at, pytz.timezone('Asia/Jakarta')):%d %b %Y %H:%M} WIB "
+                       "(snapshot read-only, diperbarui otomatis tiap beberapa menit)")
+    tab_summary, tab_semester, tab_period, tab_history, tab_letters, tab_deck = st.tabs(
+        ["📊 Quota Summary", "🗓️ Semester", "📅 Periode Custom", "📜 History", "📄 Surat Persetujuan",
+         "📽️ HR Review Deck"]
+    )
+
+    with tab_summary:
+        df = get_user_quota_summary(int(year))
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        c1, c2 = st.columns(2)
+        with c1:
+            export_download("Summary Excel", export_summary, f"summary_{year}", int(year))
+        with c2:
+            export_download("Paket Tahunan (Summary + Semester + History)", export_yearly, f"yearly_{year}", int(year))
+
+    with tab_semester:
+        semester = st.radio("Semester", [1, 2], horizontal=True, key="report_semester",
+                            format_func=lambda s: "Semester 1 (Jan-Jun)" if s == 1 else "Semester 2 (Jul-Des)")
+        df = get_semester_report(semester, int(year))
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        export_download("Semester Excel", export_semester, f"semester{semester}_{year}", semester, int(year))
+
+    with tab_period:
+        c1, c2 = st.columns(2)
+        with c1:
+            start_month = st.selectbox("Dari bulan", list(range(1, 13)), key="report_start_month")
+        with c2:
+            end_month = st.selectbox("Sampai bulan", list(range(1, 13)), index=11, key="report_end_month")
+        if end_month < start_month:
+            st.warning("Bulan akhir harus setelah bulan awal.")
+        else:
+            start_period, end_period = to_period(int(year), start_month), to_period(int(year), end_month)
+            df = get_period_report(start_period, end_period)
+            st.dataframe(df, use_container_width=True, hide_index=True)
+            export_download("Period Excel", export_period, f"period_{start_period}_{end_period}", start_period, end_period)
+
+    with tab_history:
+        # Riwayat bisa sangat besar: tidak ditampilkan penuh, langsung di-export secara streaming
+        all_years = st.checkbox("Semua tahun", key="report_history_all")
+        history_year = None if all_years else int(year)
+        st.info("Riwayat request di-export langsung ke Excel tanpa dimuat ke tabel di halaman ini.")
+        export_download("History Excel", export_history, f"history_{history_year or 'all'}", history_year)
+
+    with tab_letters:
+        st.caption("Satu surat DOCX per request yang sudah APPROVED oleh HR, dikumpulkan dalam satu file ZIP.")
+        mode = st.radio("Mode", ["Per bulan approval", "Incremental (sejak generate terakhir)"],
+                        horizontal=True, key="letters_mode")
+        letter_month = None
+        if mode == "Per bulan approval":
+            letter_month = st.selectbox("Bulan", list(range(1, 13)), index=date.today().month - 1, key="letters_month")
+        if st.button("⚙️ Generate Surat", key="gen_letters", use_container_width=True):
+            with st.spinner("Membuat surat persetujuan..."):
+                if letter_month:
+                    start, end = month_range(int(year), letter_month)
+                    result = generate_letters(start, end)
+                else:
+                    result = generate_letters(incremental=True)
+            st.session_state["export_letters"] = result
+
+        result = st.session_state.get("export_letters")
+        if result:
+            if not result["zip"]:
+                st.info("Tidak ada request approved baru untuk dibuatkan surat.")
+            elif os.path.exists(result["zip"]):
+                st.caption(f"📄 {result['letters']} surat • {result['seconds']} detik")
+                with open(result["zip"], "rb") as f:
+                    st.download_button("📥 Download ZIP Surat", data=f, file_name=os.path.basename(result["zip"]),
+                                       mime="application/zip", key="dl_letters", use_container_width=True)
+
+    with tab_deck:
+        st.caption("Deck review bulanan: utilisasi cuti per divisi, change off earned vs used, SLA approval, "
+                   "dan periode absen tertinggi.")
+        deck_month = st.selectbox("Bulan", list(range(1, 13)), index=date.today().month - 1, key="deck_month")
+        if st.button("⚙️ Generate Deck", key="gen_deck", use_container_width=True):
+            with st.spinner("Membuat deck..."):
+                st.session_state["export_deck"] = build_deck(int(year), deck_month)
+
+        deck = st.session_state.get("export_deck")
+        if deck and os.path.exists(deck["path"]):
+            st.caption(f"📽️ {'Dipakai ulang dari cache' if deck['cached'] else 'Dibuat baru'} • {deck['seconds']} detik")
+            with open(deck["path"], "rb") as f:
+                st.download_button("📥 Download Deck", data=f, file_name=os.path.basename(deck["path"]),
+                                   mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                                   key="dl_deck", use_container_width=True)
+
+def page_hr_status(user):
+    """Halaman status sistem: hasil cek integritas data, job terjadwal, dan ukuran database"""
+    st.markdown('<div class="main-header">🩺 System Status</div>', unsafe_allow_html=True)
+    tz = pytz.timezone('Asia/Jakarta')
+
+    st.subheader("Integritas Data")
+    c1, c2 = st.columns(2)
+    with c1:
+        if st.button("▶️ Jalankan cek sekarang", key="run_integrity", use_container_width=True):
+            with st.spinner("Menjalankan cek integritas..."):
+                run_job("integrity", run_integrity_checks, integrity_summary)
+    with c2:
+        if st.button("🧹 Perbaiki data yatim", key="fix_integrity", use_container_width=True):
+            with st.spinner("Membersihkan data yatim..."):
+                run_job("integrity", lambda: run_integrity_checks(fix=True), integrity_summary)
+            st.success("Data yatim sudah dibersihkan.")
+
+    health = get_health()
+    if health:
+        icons = {"ok": "✅", "warn": "⚠️", "error": "❌"}
+        st.dataframe(pd.DataFrame([{
+            "Cek": row["label"],
+            "Status": f"{icons.get(row['status'], '')} {row['status']}",
+            "Jumlah": row["value"],
+            "Detail": row["detail"],
+            "Dicek (WIB)": datetime.fromisoformat(row["checked_at"]).replace(tzinfo=pytz.utc)
+                            .astimezone(tz).strftime('%d %b %Y %H:%M'),
+        } for row in health]), use_container_width=True, hide_index=True)
+    else:
+        st.info("Cek integritas belum pernah dijalankan.")
+
+    st.subheader("Job Terjadwal")
+    jobs = []
+    for name in ("backup", "maintenance", "integrity", "report_snapshot"):
+        last_run = get_job_state(f"{name}.last_run")
+        result = last_result(name) or {}
+        details = {k: v for k, v in result.items() if k not in ("ok", "at", "seconds", "error")}
+        jobs.append({
+            "Job": name,
+            "Terakhir (WIB)": datetime.fromtimestamp(int(last_run), tz).strftime('%d %b %Y %H:%M') if last_run else "-",
+            "Status": "-" if not result else ("✅ ok" if result.get("ok") else f"❌ {result.get('error', '')}"),
+            "Durasi (detik)": result.get("seconds", "-"),
+            "Detail": json.dumps(details, default=str) if details else "",
+        })
+    st.dataframe(pd.DataFrame(jobs), use_container_width=True, hide_index=True)
+
+    st.subheader("Database")
+    stats = database_stats()
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Ukuran", f"{stats['size_bytes'] / 1024 / 1024:.1f} MB")
+    m2.metric("Fragmentasi", f"{stats['fragmentation_pct']}%", help=f"{stats['free_pages']} halaman kosong")
+    m3.metric("Cakupan page cache", f"{stats['cache_coverage_pct']}%")
+    st.caption(f"auto_vacuum={stats['auto_vacuum']} • journal_mode={stats['journal_mode']} • "
+               f"page_size={stats['page_size']}")
+
+def page_hr_profiler(user):
+    """Panel performa (tersembunyi, ?perf=1): page paling lambat, pola N+1, dan p50/p95 per fungsi"""
+    st.markdown('<div class="main-header">⏱️ Performance</div>', unsafe_allow_html=True)
+
+    enabled = st.toggle("Profiler aktif", value=profiler.is_enabled(), key="profiler_enabled",
+                        help="Saat mati, koneksi database tidak di-instrumentasi dan overhead praktis nol.")
+    if enabled != profiler.is_enabled():
+        profiler.set_enabled(enabled)
+        st.rerun()
+    c1, c2 = st.columns([4, 1])
+    c1.caption(f"{profiler.run_count()} rerun terakhir di ring buffer (maks {profiler.RING_SIZE}).")
+    if c2.button("🗑️ Reset", key="profiler_reset", use_container_width=True):
+        profiler.reset()
+        st.rerun()
+
+    slow = slowlog.aggregates()
+    if slow:
+        st.subheader(f"Slow query (≥ {slowlog.SLOW_QUERY_MS:g} ms sejak proses start)")
+        st.dataframe(pd.DataFrame(slow)[["count", "total_ms", "avg_ms", "max_ms", "caller", "fingerprint"]],
+                     use_container_width=True, hide_index=True)
+        st.caption(f"Detail & EXPLAIN QUERY PLAN: {slowlog.LOG_PATH}")
+    elif slowlog.SLOW_QUERY_MS <= 0:
+        st.caption("Slow query log mati. Aktifkan dengan HRMS_SLOW_QUERY_MS (mis. 200) lalu restart aplikasi.")
+
+    if not profiler.run_count():
+        st.info("Belum ada data. Aktifkan profiler lalu buka beberapa halaman.")
+        return
+
+    st.subheader("Latensi per Page")
+    st.dataframe(pd.DataFrame(profiler.page_stats()), use_container_width=True, hide_index=True)
+
+    st.subheader(f"Pola N+1 (statement sama ≥ {profiler.N_PLUS_ONE_THRESHOLD}x per rerun)")
+    offenders = profiler.n_plus_one_offenders()
+    if offenders:
+        st.dataframe(pd.DataFrame(offenders), use_container_width=True, hide_index=True)
+    else:
+        st.success("Tidak ada pola N+1 terdeteksi.")
+
+    st.subheader("Fungsi business / reports")
+    st.dataframe(pd.DataFrame(profiler.call_stats()), use_container_width=True, hide_index=True)
+
+    st.subheader("Rerun paling lambat")
+    slowest = pd.DataFrame(profiler.slowest_runs())
+    slowest["started_at"] = pd.to_datetime(slowest["started_at"], unit="s", utc=True).dt.tz_convert("Asia/Jakarta")
+    st.dataframe(slowest, use_container_width=True, hide_index=True)
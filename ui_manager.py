@@ -5,6 +5,10 @@ from file_utils import preview_file
 from datetime import datetime
 import pytz
 from db import get_conn
+from business import with_changeoff_details
+from request_archive import request_history
+
+HISTORY_PAGE_SIZE = 50
 
 # Fungsi konversi waktu (sama seperti di ui_employee.py)
 def convert_to_local_time(utc_string, user_timezone='Asia/Jakarta'):
@@ -44,7 +48,7 @@ def get_manager_pending_requests(manager_id):
             FROM requests r
             JOIN users u ON u.id = r.user_id
             WHERE r.status = 'PENDING_MANAGER' AND u.manager_id = ?
-            ORDER BY r.created_at DESC
+            ORDER BY r.created_at_ts DESC, r.id DESC
         """, conn, params=(manager_id,))
         conn.close()
         return df
@@ -100,7 +104,8 @@ def page_manager_pending(user):
     if df.empty:
         st.info("Tidak ada request menunggu Manager.")
         return
-    
+
+    df = with_changeoff_details(df)
     for _, r in df.iterrows():
         status_icon = "⏳" if "PENDING" in str(r["status"]) else "✅" if r["status"] == "APPROVED" else "❌"
         status_text = f"{status_icon} [{r['type']}] {r['employee_name']} • Div {r.get('employee_division','-')} • Status: {r['status']} • ID: {r['id']}"
@@ -215,7 +220,8 @@ def page_manager_pending(user):
             # Tampilkan file jika ada
             if r.get('file_uploaded', 0) and r.get('timesheet_path'):
                 st.info("📎 Attached File:")
-                preview_file(r['timesheet_path'], key_prefix=f"mgr_req_{r['id']}", user_role=user["role"])
+                preview_file(r['timesheet_path'], key_prefix=f"mgr_req_{r['id']}", user_role=user["role"],
+                             request_id=r['id'])
 
             # Tombol Approve/Reject
             c1, c2 = st.columns(2)
@@ -234,30 +240,32 @@ def page_manager_team(user):
     """Halaman history team requests"""
     st.header("📊 HISTORY Team Requests")
     
-    conn = get_conn()
-    df = pd.read_sql_query("""
-        SELECT r.*, u.name as employee_name, u.division as employee_division
-        FROM requests r 
-        JOIN users u ON u.id = r.user_id
-        WHERE u.manager_id = ?
-        ORDER BY r.created_at DESC
-    """, conn, params=(user["id"],))
-    conn.close()
-    
-    if df.empty:
-        st.info("Belum ada request dari tim.")
-        return
-
     # Filter options seperti di employee
     filter_type = st.selectbox("Filter by Type", ["ALL", "LEAVE", "CHANGEOFF"], key="mgr_filter_type")
     filter_status = st.selectbox("Filter by Status", ["ALL", "PENDING", "APPROVED", "REJECTED"], key="mgr_filter_status")
 
-    # Apply filters
-    if filter_type != "ALL":
-        df = df[df["type"] == filter_type]
-    if filter_status != "ALL":
-        df = df[df["status"].str.contains(filter_status, case=False, na=False)]
+    # History tim dibaca per halaman keyset, bukan seluruh riwayat tim sekaligus.
+    # Halaman pertama selalu dibaca ulang; halaman lama yang sudah dimuat disimpan di session_state bersama
+    # cursor-nya, jadi "muat lebih lama" hanya membaca satu halaman berikutnya (bukan ulang dari atas)
+    filters = dict(
+        manager_id=user["id"],
+        request_type=None if filter_type == "ALL" else filter_type,
+        status=None if filter_status == "ALL" else filter_status,
+    )
+    rows, next_cursor = request_history(**filters, limit=HISTORY_PAGE_SIZE)
+    older = st.session_state.get("mgr_team_older")
+    older_rows = older["rows"] if older and older["filters"] == filters else []
+    if older_rows:
+        shown = {r["id"] for r in rows}
+        rows += [r for r in older_rows if r["id"] not in shown]
+        next_cursor = older["cursor"]
+    df = pd.DataFrame(rows)
+
+    if df.empty:
+        st.info("Belum ada request dari tim.")
+        return
 
+    df = with_changeoff_details(df)
     for _, r in df.iterrows():
         status_icon = "✅" if r["status"] == "APPROVED" else "⏳" if "PENDING" in str(r["status"]) else "❌"
         with st.expander(f"{status_icon} {r['type']} - {r['status']} - {r['employee_name']} - ID: {r['id']}", expanded=False):
@@ -310,4 +318,11 @@ def page_manager_team(user):
             # Tampilkan file jika ada
             if r.get('file_uploaded', 0) and r.get('timesheet_path'):
                 st.info("📎 Attached File:")
-                preview_file(r['timesheet_path'], key_prefix=f"mgr_hist_{r['id']}", user_role=user["role"])
\ No newline at end of file
+                preview_file(r['timesheet_path'], key_prefix=f"mgr_hist_{r['id']}", user_role=user["role"],
+                             request_id=r['id'])
+
+    if next_cursor is not None:
+        if st.button("⬇️ Muat request lebih lama", key="mgr_team_more", use_container_width=True):
+            more, cursor = request_history(**filters, before=next_cursor, limit=HISTORY_PAGE_SIZE)
+            st.session_state["mgr_team_older"] = {"filters": filters, "rows": older_rows + more, "cursor": cursor}
+            st.rerun()
\ No newline at end of file
@@ -0,0 +1,285 @@
+import io
+import os
+import re
+import csv
+import sys
+import time
+import hashlib
+from datetime import date, datetime
+from db import get_conn
+
+# Import user massal dari CSV / XLSX (onboarding satu anak perusahaan sekaligus).
+# Row dibaca streaming (csv.reader / openpyxl read_only), divalidasi terhadap index di memori
+# (email, NIK, manager yang sudah ada di DB + yang ada di file), lalu semua row valid di-INSERT dengan
+# executemany dalam satu transaksi. Row yang tidak valid dilewati dan dilaporkan per baris.
+# Manager boleh berada di file yang sama (di atas maupun di bawah karyawannya): manager_id diisi setelah insert.
+COLUMNS = ["nik", "email", "name", "role", "division", "manager_email", "join_date", "probation_date",
+           "permanent_date", "sick_balance", "password"]
+REQUIRED = ["nik", "email", "name"]
+ROLES = ("EMPLOYEE", "MANAGER", "HR_ADMIN")
+MAX_SICK_BALANCE = 6
+LOOKUP_CHUNK = 500  # jumlah parameter per IN (...) saat membaca id user baru
+PROGRESS_EVERY = 1000  # row
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+def _header(name):
+    return re.sub(r"\s+", "_", str(name or "").strip().lower())
+
+def _cell(value):
+    """Nilai sel -> str tanpa spasi ('' untuk kosong); angka bulat dari Excel tanpa '.0'"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip()
+
+def iter_rows(source, filename=None):
+    """
+    Yield (nomor baris, dict kolom) dari CSV atau XLSX. source = path atau file-like (mis. upload Streamlit).
+    Nomor baris mengikuti spreadsheet: header = baris 1.
+    """
+    name = (filename or getattr(source, "name", None) or (source if isinstance(source, str) else "")).lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = [_header(h) for h in next(rows, [])]
+            for number, values in enumerate(rows, start=2):
+                if values and any(v not in (None, "") for v in values):
+                    yield number, {h: _cell(v) for h, v in zip(header, values) if h}
+        finally:
+            workbook.close()
+        return
+    if isinstance(source, str):
+        f = open(source, encoding="utf-8-sig", newline="")
+    else:
+        f = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(f)
+        header = [_header(h) for h in next(reader, [])]
+        for values in reader:
+            if any(v.strip() for v in values):
+                yield reader.line_num, {h: _cell(v) for h, v in zip(header, values) if h}
+    finally:
+        if isinstance(source, str):
+            f.close()
+        else:
+            f.detach()  # jangan tutup file upload milik pemanggil
+
+def _load_indexes(conn):
+    """Email (lowercase) -> (id, role) dan set NIK dari user yang sudah ada"""
+    emails, niks = {}, set()
+    for row in conn.execute("SELECT id, email, role, nik FROM users"):
+        emails[row["email"].strip().lower()] = (row["id"], row["role"])
+        if row["nik"]:
+            niks.add(str(row["nik"]).strip())
+    return emails, niks
+
+def _parse_date(value, column, errors):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10]).isoformat()
+    except ValueError:
+        errors.append(f"{column} '{value}' bukan tanggal YYYY-MM-DD")
+        return None
+
+def _validate(row, existing_emails, existing_niks, seen_emails, seen_niks, default_password):
+    """Row mentah -> (record siap insert, list error)"""
+    errors = [f"{column} wajib diisi" for column in REQUIRED if not row.get(column)]
+    email = row.get("email", "").lower()
+    nik = row.get("nik", "")
+    if email:
+        if not _EMAIL_RE.match(email):
+            errors.append(f"email '{email}' tidak valid")
+        elif email in existing_emails:
+            errors.append(f"email '{email}' sudah terdaftar")
+        elif email in seen_emails:
+            errors.append(f"email '{email}' duplikat dengan baris {seen_emails[email]}")
+    if nik:
+        if nik in existing_niks:
+            errors.append(f"NIK '{nik}' sudah terdaftar")
+        elif nik in seen_niks:
+            errors.append(f"NIK '{nik}' duplikat dengan baris {seen_niks[nik]}")
+    role = (row.get("role") or "EMPLOYEE").upper()
+    if role not in ROLES:
+        errors.append(f"role '{role}' harus salah satu dari {', '.join(ROLES)}")
+    sick_balance = MAX_SICK_BALANCE
+    if row.get("sick_balance"):
+        try:
+            sick_balance = int(float(row["sick_balance"]))
+            if not 0 <= sick_balance <= MAX_SICK_BALANCE:
+                errors.append(f"sick_balance harus 0-{MAX_SICK_BALANCE}")
+        except ValueError:
+            errors.append(f"sick_balance '{row['sick_balance']}' bukan angka")
+    password = row.get("password") or default_password
+    if not password:
+        errors.append("password wajib diisi (atau pakai default password)")
+    record = {
+        "email": email, "name": row.get("name", ""), "role": role, "nik": nik,
+        "division": row.get("division") or None,
+        "manager_email": row.get("manager_email", "").lower() or None,
+        "join_date": _parse_date(row.get("join_date"), "join_date", errors),
+        "probation_date": _parse_date(row.get("probation_date"), "probation_date", errors),
+        "permanent_date": _parse_date(row.get("permanent_date"), "permanent_date", errors),
+        "sick_balance": sick_balance, "password": password,
+    }
+    return record, errors
+
+def _resolve_managers(valid, existing_emails, failed):
+    """
+    Cek manager_email setiap record: harus user MANAGER yang sudah ada atau record MANAGER valid di file ini.
+    Record yang manager-nya gagal ikut gagal, diulang sampai stabil (rantai direktur -> manager -> karyawan).
+    """
+    changed = True
+    while changed:
+        changed = False
+        in_file = {r["email"]: r for r in valid.values()}
+        for number, record in list(valid.items()):
+            manager = record["manager_email"]
+            if not manager:
+                continue
+            if manager in in_file:
+                role = in_file[manager]["role"]
+            elif manager in existing_emails:
+                role = existing_emails[manager][1]
+            else:
+                role = None
+            if role == "MANAGER" and manager != record["email"]:
+                continue
+            if role is None:
+                message = f"manager '{manager}' tidak ditemukan"
+                if manager in failed:
+                    message = f"manager '{manager}' gagal diimport (baris {failed[manager]})"
+            elif manager == record["email"]:
+                message = "manager tidak boleh diri sendiri"
+            else:
+                message = f"manager '{manager}' rolenya {role}, bukan MANAGER"
+            yield number, record, message
+            del valid[number]
+            failed[record["email"]] = number
+            changed = True
+
+def _insert(conn, records, existing_emails):
+    now = datetime.utcnow().isoformat()
+    hashes = {}  # password yang sama (mis. default) cukup di-hash sekali
+    for record in records:
+        password = record["password"]
+        if password not in hashes:
+            hashes[password] = hashlib.sha256(password.encode()).hexdigest()
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.executemany("""
+            INSERT INTO users (email, name, role, password_hash, manager_id, division, join_date, probation_date,
+                               permanent_date, sick_balance, nik, is_active, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+        """, ((r["email"], r["name"], r["role"], hashes[r["password"]],
+               existing_emails[r["manager_email"]][0] if r["manager_email"] in existing_emails else None,
+               r["division"], r["join_date"], r["probation_date"], r["permanent_date"], r["sick_balance"],
+               r["nik"], now, now) for r in records))
+
+        # manager yang ada di file yang sama: id-nya baru diketahui setelah insert
+        pending = [r for r in records if r["manager_email"] and r["manager_email"] not in existing_emails]
+        if pending:
+            emails = sorted({r["email"] for r in records})
+            ids = {}
+            for start in range(0, len(emails), LOOKUP_CHUNK):
+                chunk = emails[start:start + LOOKUP_CHUNK]
+                ids.update(cur.execute(f"SELECT email, id FROM users WHERE email IN ({','.join('?' * len(chunk))})",
+                                       chunk).fetchall())
+            cur.executemany("UPDATE users SET manager_id = ? WHERE id = ?",
+                            [(ids[r["manager_email"]], ids[r["email"]]) for r in pending])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def import_users(source, filename=None, dry_run=False, default_password=None, progress=None):
+    """
+    Import user dari CSV/XLSX. Return dict ringkasan:
+    {"rows", "valid", "imported", "errors": [{"row", "email", "nik", "error"}], "dry_run", "seconds"}
+    dry_run: hanya validasi, database tidak diubah.
+    progress: callback opsional (tahap, jumlah row) tiap PROGRESS_EVERY row dan di akhir tiap tahap.
+    """
+    started = time.perf_counter()
+    conn = get_conn()
+    conn.isolation_level = None  # transaksi dikontrol manual (BEGIN IMMEDIATE)
+    try:
+        existing_emails, existing_niks = _load_indexes(conn)
+        valid, errors, failed = {}, [], {}
+        seen_emails, seen_niks = {}, {}
+        total = 0
+        for number, row in iter_rows(source, filename):
+            total += 1
+            record, row_errors = _validate(row, existing_emails, existing_niks, seen_emails, seen_niks,
+                                           default_password)
+            # email / NIK dicatat walau row gagal, supaya duplikat berikutnya tetap terdeteksi
+            if record["email"]:
+                seen_emails.setdefault(record["email"], number)
+            if record["nik"]:
+                seen_niks.setdefault(record["nik"], number)
+            if row_errors:
+                errors.append({"row": number, "email": record["email"], "nik": record["nik"],
+                               "error": "; ".join(row_errors)})
+                failed.setdefault(record["email"], number)
+            else:
+                valid[number] = record
+            if progress and total % PROGRESS_EVERY == 0:
+                progress("validasi", total)
+        if progress:
+            progress("validasi", total)
+        for number, record, message in _resolve_managers(valid, existing_emails, failed):
+            errors.append({"row": number, "email": record["email"], "nik": record["nik"], "error": message})
+        errors.sort(key=lambda e: e["row"])
+
+        records = [valid[number] for number in sorted(valid)]
+        if records and not dry_run:
+            _insert(conn, records, existing_emails)
+            if progress:
+                progress("insert", len(records))
+    finally:
+        conn.close()
+    return {"rows": total, "valid": len(records), "imported": 0 if dry_run else len(records),
+            "errors": errors, "dry_run": dry_run, "seconds": round(time.perf_counter() - started, 3)}
+
+def error_report_csv(errors) -> bytes:
+    """Laporan error per baris sebagai CSV (untuk download / file di samping input)"""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=["row", "email", "nik", "error"])
+    writer.writeheader()
+    writer.writerows(errors)
+    return out.getvalue().encode("utf-8-sig")
+
+def template_csv() -> bytes:
+    return (",".join(COLUMNS) + "\n").encode("utf-8-sig")
+
+def _arg(args, name, default=None):
+    if name in args:
+        return args[args.index(name) + 1]
+    return default
+
+if __name__ == "__main__":
+    # python user_import.py users.csv|users.xlsx [--dry-run] [--default-password X] [--report errors.csv]
+    args = sys.argv[1:]
+    if not args or args[0].startswith("--"):
+        print("Usage: python user_import.py <file.csv|file.xlsx> [--dry-run] [--default-password X] "
+              "[--report errors.csv]")
+        sys.exit(2)
+    path = args[0]
+    result = import_users(path, dry_run="--dry-run" in args, default_password=_arg(args, "--default-password"))
+    label = "valid (dry run, tidak disimpan)" if result["dry_run"] else "diimport"
+    print(f"✅ {result['valid']}/{result['rows']} user {label} dalam {result['seconds']} detik")
+    if result["errors"]:
+        report = _arg(args, "--report", os.path.splitext(path)[0] + ".errors.csv")
+        with open(report, "wb") as f:
+            f.write(error_report_csv(result["errors"]))
+        print(f"⚠️ {len(result['errors'])} baris gagal, detail di {report}")
+        for error in result["errors"][:10]:
+            print(f"   baris {error['row']}: {error['error']}")
+        sys.exit(1)